@@ -0,0 +1,275 @@
+"""ddbtools 客户端开销基准测试
+
+使用 ddbtools.testing.FakeSession 离线运行, 不需要 DolphinDB 服务器。
+
+    python bench/benchmarks.py                  # 运行并与基准结果比较
+    python bench/benchmarks.py --save-baseline  # 运行并保存为新的基准结果
+    python bench/benchmarks.py --scale 0.1 -k dbdf
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from ddbtools import BaseCRUD, Comparator, DBDf, Filter, SessionPool, get_all_dbs
+from ddbtools.testing import FakeSession, make_attribute_frame, patch_table_upserter
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+
+class AttrCRUD(BaseCRUD):
+    key_cols = ["datetime", "code", "attribute"]
+
+
+class BarCRUD(BaseCRUD):
+    key_cols = ["code", "date"]
+
+
+# 每个数据档位返回 (准备函数, 被测函数, 处理行数)
+def profile_filter_build(scale: float):
+    n = int(200_000 * scale)
+    dt = datetime(2023, 1, 1)
+
+    def run(_):
+        for i in range(n // 4):
+            Filter("code", value="000001.SZ")
+            Filter("price", Comparator.gt, i)
+            Filter("date", Comparator.lt, dt)
+            Filter("code", Comparator.like, ["00", "60"])
+
+    return (lambda: None), run, n
+
+
+def profile_dbdf_40col(scale: float):
+    n = int(200_000 * scale)
+    rng = np.random.default_rng(0)
+    session = FakeSession()
+    col_types, data = {}, {}
+    dates = pd.date_range("2000-01-01", periods=n, freq="min").strftime("%Y-%m-%d")
+    for i in range(8):
+        col_types[f"d{i}"] = "DATE"
+        data[f"d{i}"] = dates
+        col_types[f"s{i}"] = "SYMBOL"
+        data[f"s{i}"] = rng.choice(["AAPL", "MSFT", "IBM", "GOOG"], n).astype(object)
+        col_types[f"f{i}"] = "DOUBLE"
+        data[f"f{i}"] = rng.standard_normal(n)
+        col_types[f"l{i}"] = "LONG"
+        data[f"l{i}"] = rng.integers(0, 1000, n)
+        col_types[f"b{i}"] = "BOOL"
+        data[f"b{i}"] = rng.choice(["true", "false", "是", "否"], n).astype(object)
+    frame = pd.DataFrame(data)
+    session.add_table("dfs://bench", "wide", frame.head(0), col_types=col_types)
+
+    def run(_):
+        DBDf(session, "dfs://bench", "wide", frame)
+
+    return (lambda: None), run, n
+
+
+def _attr_session(scale: float):
+    n_dates = max(int(250 * scale), 1)
+    session = FakeSession()
+    data = make_attribute_frame(n_dates, 400, 10)
+    session.add_table(
+        "dfs://bench",
+        "attr_bench",
+        data,
+        col_types={"datetime": "DATE"},
+        partition_columns=["datetime", "attribute"],
+    )
+    return session, data
+
+
+def profile_get_attr_panel(scale: float):
+    session, data = _attr_session(scale)
+    crud = AttrCRUD("dfs://bench", "attr_bench")
+
+    def run(_):
+        crud.get(session)
+
+    return (lambda: None), run, len(data)
+
+
+def profile_get_attr_panel_arrow(scale: float):
+    session, data = _attr_session(scale)
+    session.arrow = True
+    crud = AttrCRUD("dfs://bench", "attr_bench")
+
+    def run(_):
+        crud.get_arrow(session)
+
+    return (lambda: None), run, len(data)
+
+
+def profile_get_panel(scale: float):
+    session, data = _attr_session(scale)
+    crud = AttrCRUD("dfs://bench", "attr_bench")
+    attributes = sorted(data["attribute"].unique())
+    pool = SessionPool(lambda: session, size=4)
+
+    def run(_):
+        crud.get_panel(pool, attributes)
+
+    return (lambda: None), run, len(data)
+
+
+def profile_get_filtered(scale: float):
+    session, data = _attr_session(scale)
+    crud = AttrCRUD("dfs://bench", "attr_bench")
+    codes = sorted(data["code"].unique())[:300]
+    conds = [
+        Filter("code", Comparator.isin, codes),
+        Filter("datetime", Comparator.gt, datetime(2020, 2, 1)),
+        Filter("attribute", value="attr3"),
+    ]
+
+    def run(_):
+        crud.get(session, conds, panel=False)
+
+    return (lambda: None), run, len(data)
+
+
+def profile_upsert(scale: float):
+    n = int(1_000_000 * scale)
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(
+        {
+            "date": np.repeat(pd.date_range("2020-01-01", periods=n // 1000 + 1), 1000)[:n],
+            "code": np.tile([f"{i:06d}.SZ" for i in range(1000)], n // 1000 + 1)[:n],
+            "price": rng.standard_normal(n),
+            "volume": rng.integers(0, 10**6, n),
+        }
+    )
+    col_types = {"date": "DATE", "code": "SYMBOL", "price": "DOUBLE", "volume": "LONG"}
+    crud = BarCRUD("dfs://bench", "bars")
+
+    def setup():
+        session = FakeSession()
+        session.add_table("dfs://bench", "bars", frame.head(0), col_types=col_types)
+        return session
+
+    def run(session):
+        with patch_table_upserter():
+            crud.upsert(session, DBDf(session, "dfs://bench", "bars", frame))
+
+    return setup, run, n
+
+
+def profile_get_all_dbs(scale: float):
+    n = max(int(300 * scale), 1)
+    session = FakeSession()
+    for i in range(n):
+        session.add_database(f"dfs://db{i}", partition_column_type=[6, 17])
+
+    def run(_):
+        get_all_dbs(session)
+
+    return (lambda: None), run, n
+
+
+PROFILES = {
+    "filter_build": profile_filter_build,
+    "dbdf_40col": profile_dbdf_40col,
+    "get_attr_panel": profile_get_attr_panel,
+    "get_attr_panel_arrow": profile_get_attr_panel_arrow,
+    "get_panel": profile_get_panel,
+    "get_filtered": profile_get_filtered,
+    "upsert": profile_upsert,
+    "get_all_dbs": profile_get_all_dbs,
+}
+
+
+def measure(name: str, scale: float, repeat: int):
+    setup, run, rows = PROFILES[name](scale)
+    timings = []
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        start = time.perf_counter()
+        run(state)
+        timings.append(time.perf_counter() - start)
+
+    state = setup()
+    gc.collect()
+    tracemalloc.start()
+    run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        "rows": rows,
+        "seconds": best,
+        "rows_per_second": rows / best if best else float("inf"),
+        "peak_mb": peak / 1024**2,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ddbtools 离线基准测试")
+    parser.add_argument("-k", dest="only", help="只运行名称包含该字符串的档位")
+    parser.add_argument("--scale", type=float, default=1.0, help="数据规模倍数")
+    parser.add_argument("--repeat", type=int, default=3, help="计时重复次数")
+    parser.add_argument("--save-baseline", action="store_true", help="保存为基准结果")
+    parser.add_argument(
+        "--tolerance", type=float, default=1.5, help="耗时或内存超过基准的倍数视为退化"
+    )
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if BASELINE_PATH.exists():
+        baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    baseline_results = (
+        baseline.get("results", {}) if baseline.get("scale") == args.scale else {}
+    )
+
+    results = {}
+    regressions = []
+    header = f"{'profile':<22}{'rows':>10}{'seconds':>10}{'rows/s':>14}{'peak MB':>10}{'vs base':>10}"
+    print(header)
+    for name in PROFILES:
+        if args.only and args.only not in name:
+            continue
+        result = measure(name, args.scale, args.repeat)
+        results[name] = result
+        base = baseline_results.get(name)
+        ratio = ""
+        if base:
+            time_ratio = result["seconds"] / base["seconds"]
+            mem_ratio = result["peak_mb"] / base["peak_mb"] if base["peak_mb"] else 1
+            ratio = f"{time_ratio:.2f}x"
+            if time_ratio > args.tolerance or mem_ratio > args.tolerance:
+                regressions.append(name)
+                ratio += " !"
+        print(
+            f"{name:<22}{result['rows']:>10}{result['seconds']:>10.3f}"
+            f"{result['rows_per_second']:>14,.0f}{result['peak_mb']:>10.1f}{ratio:>10}"
+        )
+
+    if args.save_baseline:
+        baseline = {
+            "scale": args.scale,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "results": {**baseline_results, **results},
+        }
+        BASELINE_PATH.write_text(
+            json.dumps(baseline, indent=2, ensure_ascii=False) + "\n", encoding="utf-8"
+        )
+        print(f"基准结果已保存到 {BASELINE_PATH}")
+    elif regressions:
+        print(f"性能退化: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,69 @@
-import importlib.metadata
+import importlib
+from typing import TYPE_CHECKING
+
 
 # 从pyproject.toml中获取版本号，实现版本号的单一管理
-try:
-    __version__ = importlib.metadata.version('ddbtools')
-except ImportError:
-    # 如果无法导入，使用默认版本号（开发环境可能需要）
-    __version__ = '0.0.dev0'
-
-from ddbtools.dbmanip import create_db,get_all_dbs,get_db_info
-from ddbtools.tablemanip import create_table,get_table_info,DbColumn,get_all_tables,get_table_columns
-from ddbtools.crud import BaseCRUD,Filter,Comparator,DBDf
\ No newline at end of file
+# importlib.metadata 导入较慢, 首次访问 __version__ 时再读取
+def _version():
+    import importlib.metadata
+
+    try:
+        return importlib.metadata.version('ddbtools')
+    except ImportError:
+        # 如果无法导入，使用默认版本号（开发环境可能需要）
+        return '0.0.dev0'
+
+# 公共 API 按需导入: 首次访问某个名称时才导入其所在模块,
+# 只用到 create_db 的脚本不会加载 pandas/numpy/dolphindb
+_LAZY_IMPORTS = {
+    "ddbtools.dbmanip": ["create_db", "get_all_dbs", "get_db_info", "get_catalog"],
+    "ddbtools.tablemanip": ["create_table", "get_table_info", "DbColumn", "get_all_tables", "get_table_columns", "add_columns", "delete_table", "SchemaCache", "schema_cache"],
+    "ddbtools.plan": ["SchemaPlan"],
+    "ddbtools.partition": ["PartitionScheme", "get_partition_scheme"],
+    "ddbtools.crud": ["BaseCRUD", "Filter", "Comparator", "DBDf", "UpsertSummary", "bind_vector", "clear_bound_vectors", "arrow_to_pandas", "compact_frame", "AttributePanel"],
+    "ddbtools.pool": ["SessionPool", "PooledCRUD", "PoolStats"],
+    "ddbtools.writer": ["BufferedWriter", "WriterStats"],
+    "ddbtools.cache": ["QueryCache"],
+    "ddbtools.diff": ["FingerprintIndex", "DiffSummary"],
+    "ddbtools.template": ["QueryTemplate", "clear_templates"],
+    "ddbtools.panelstore": ["PanelStore"],
+    "ddbtools.router": ["Router", "RoutedCRUD", "NodeStats"],
+    "ddbtools.transfer": ["export_table", "import_table", "TransferSummary"],
+    "ddbtools.aio": ["AsyncSessionPool", "AsyncCRUD", "async_get_table_columns", "async_get_all_tables", "async_get_all_dbs", "async_create_table"],
+}
+_MODULE_OF = {name: module for module, names in _LAZY_IMPORTS.items() for name in names}
+
+__all__ = list(_MODULE_OF)
+
+
+def __getattr__(name):
+    if name == "__version__":
+        value = globals()["__version__"] = _version()
+        return value
+    module = _MODULE_OF.get(name)
+    if module is None:
+        raise AttributeError(f"module 'ddbtools' has no attribute '{name}'")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | {"__version__"})
+
+
+if TYPE_CHECKING:
+    from ddbtools.dbmanip import create_db,get_all_dbs,get_db_info,get_catalog
+    from ddbtools.tablemanip import create_table,get_table_info,DbColumn,get_all_tables,get_table_columns,add_columns,delete_table,SchemaCache,schema_cache
+    from ddbtools.plan import SchemaPlan
+    from ddbtools.partition import PartitionScheme,get_partition_scheme
+    from ddbtools.crud import BaseCRUD,Filter,Comparator,DBDf,UpsertSummary,bind_vector,clear_bound_vectors,arrow_to_pandas,compact_frame,AttributePanel
+    from ddbtools.pool import SessionPool,PooledCRUD,PoolStats
+    from ddbtools.writer import BufferedWriter,WriterStats
+    from ddbtools.cache import QueryCache
+    from ddbtools.diff import FingerprintIndex,DiffSummary
+    from ddbtools.template import QueryTemplate,clear_templates
+    from ddbtools.panelstore import PanelStore
+    from ddbtools.router import Router,RoutedCRUD,NodeStats
+    from ddbtools.transfer import export_table,import_table,TransferSummary
+    from ddbtools.aio import AsyncSessionPool,AsyncCRUD,async_get_table_columns,async_get_all_tables,async_get_all_dbs,async_create_table
@@ -0,0 +1,105 @@
+import asyncio
+from typing import Callable, Iterable, List
+import pandas as pd
+from ddbtools.crud import BaseCRUD
+from ddbtools.dbmanip import get_all_dbs
+from ddbtools.pool import PoolStats, SessionPool
+from ddbtools.tablemanip import create_table, get_all_tables, get_table_columns
+
+
+# SessionPool 的 asyncio 封装: 阻塞调用在连接池的线程中执行, 不阻塞事件循环
+# max_pending 限制同时提交到连接池的任务数, 其余请求在事件循环中等待,
+# 等待中或尚未开始执行的请求被取消时不会占用连接
+class AsyncSessionPool:
+    def __init__(self, pool: SessionPool, max_pending: int = None):
+        self.pool = pool
+        self.max_pending = max_pending or pool.max_concurrency
+        self._semaphore = asyncio.Semaphore(self.max_pending)
+
+    @classmethod
+    def connect(
+        cls,
+        host: str,
+        port: int,
+        userid: str = "",
+        password: str = "",
+        size: int = 4,
+        max_concurrency: int = None,
+        max_pending: int = None,
+        **session_kwargs,
+    ):
+        pool = SessionPool.connect(
+            host,
+            port,
+            userid,
+            password,
+            size=size,
+            max_concurrency=max_concurrency,
+            **session_kwargs,
+        )
+        return cls(pool, max_pending=max_pending)
+
+    # 在连接池中执行 fn(session, *args, **kwargs), 被取消时同时取消尚未开始的任务;
+    # 已在服务器执行的任务无法中断, 其结果会被丢弃
+    async def run(self, fn: Callable, *args, **kwargs):
+        async with self._semaphore:
+            return await asyncio.wrap_future(self.pool.submit(fn, *args, **kwargs))
+
+    def stats(self) -> PoolStats:
+        return self.pool.stats()
+
+    async def close(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.pool.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+# BaseCRUD 的异步版本, 所有请求共享 AsyncSessionPool 中的连接
+class AsyncCRUD:
+    def __init__(self, crud: BaseCRUD, pool: AsyncSessionPool):
+        self.crud = crud
+        self.pool = pool
+
+    async def get(self, conds=None, panel=True) -> pd.DataFrame:
+        return await self.pool.run(self.crud.get, conds=conds, panel=panel)
+
+    async def upsert(self, data: pd.DataFrame):
+        return await self.pool.run(self.crud.upsert, data)
+
+    async def delete(self, **kwargs):
+        return await self.pool.run(self.crud.delete, **kwargs)
+
+    async def delete_keys(self, keys: pd.DataFrame, **kwargs) -> int:
+        return await self.pool.run(self.crud.delete_keys, keys, **kwargs)
+
+    # 并发执行多组查询, 结果与 conds_list 顺序一致; 任一查询失败时取消其余查询
+    async def get_many(self, conds_list: Iterable, panel=True) -> List[pd.DataFrame]:
+        tasks = [asyncio.ensure_future(self.get(conds, panel)) for conds in conds_list]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+
+async def async_get_table_columns(
+    pool: AsyncSessionPool, db_name: str, table_name: str, use_cache: bool = True
+) -> pd.DataFrame:
+    return await pool.run(get_table_columns, db_name, table_name, use_cache=use_cache)
+
+
+async def async_get_all_tables(pool: AsyncSessionPool, db_name: str):
+    return await pool.run(get_all_tables, db_name)
+
+
+async def async_get_all_dbs(pool: AsyncSessionPool) -> pd.DataFrame:
+    return await pool.run(get_all_dbs)
+
+
+async def async_create_table(pool: AsyncSessionPool, *args, **kwargs):
+    return await pool.run(create_table, *args, **kwargs)
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import List
+import pandas as pd
+import dolphindb as ddb
+from ddbtools.crud import BaseCRUD, Comparator, Filter, _as_list
+from ddbtools.log import logger
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "QueryCache 需要 pyarrow, 请安装 ddbtools[parquet] 或 pyarrow"
+        ) from e
+
+
+# 过滤条件的规范化表示, 与条件顺序及 isin 取值顺序无关
+def normalize_conds(conds: Filter | List[Filter]) -> List[str]:
+    normalized = []
+    for cond in _as_list(conds):
+        if cond.comparator == Comparator.isin and not isinstance(cond.raw, str):
+            values = sorted(repr(v) for v in cond.raw)
+            normalized.append(f"{cond.column} in [{', '.join(values)}]")
+        else:
+            normalized.append(cond.clause)
+    return sorted(normalized)
+
+
+def _column_values(data: pd.DataFrame, column: str) -> pd.Series:
+    if column in data.columns:
+        return data[column]
+    return pd.Series(data.index.get_level_values(column), index=data.index)
+
+
+# 面板结果保留 (datetime, code) 索引并排序, 平表结果重新编号, 避免索引重复
+def _concat(frames: List[pd.DataFrame], panel_index: bool) -> pd.DataFrame:
+    if panel_index:
+        return pd.concat(frames).sort_index()
+    return pd.concat(frames, ignore_index=True)
+
+
+# 本地查询结果缓存: 结果以 Parquet 文件保存在 directory 下, 按总大小做 LRU 淘汰
+# 增量模式下只查询时间列大于已缓存最大值(水位)的数据并追加为新的 Parquet 文件
+class QueryCache:
+    def __init__(self, directory: str | Path, max_bytes: int = 10 * 1024**3):
+        _require_pyarrow()
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, crud: BaseCRUD, conds: Filter | List[Filter] = None, panel=True):
+        payload = json.dumps(
+            {
+                "db_path": crud.db_path,
+                "table_name": crud.table_name,
+                "panel": bool(panel),
+                "conds": normalize_conds(conds),
+            },
+            ensure_ascii=False,
+        )
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _meta_path(self, key: str) -> Path:
+        return self.directory / key / "meta.json"
+
+    def _read_meta(self, key: str):
+        try:
+            return json.loads(self._meta_path(key).read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_meta(self, key: str, meta: dict):
+        tmp = self._meta_path(key).with_suffix(".tmp")
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self._meta_path(key))
+
+    def _write_part(self, key: str, data: pd.DataFrame, part: int):
+        path = self.directory / key / f"part-{part:05d}.parquet"
+        tmp = path.with_suffix(".tmp")
+        data.to_parquet(tmp)
+        os.replace(tmp, path)
+
+    def _read(self, key: str, meta: dict) -> pd.DataFrame:
+        frames = [
+            pd.read_parquet(self.directory / key / f"part-{part:05d}.parquet")
+            for part in range(meta["parts"])
+        ]
+        return frames[0] if len(frames) == 1 else _concat(frames, meta["panel_index"])
+
+    def get(
+        self,
+        crud: BaseCRUD,
+        session: ddb.Session,
+        conds: Filter | List[Filter] = None,
+        panel=True,
+        incremental_column: str = None,
+        refresh: bool = False,
+    ) -> pd.DataFrame:
+        key = self.key(crud, conds, panel)
+        meta = None if refresh else self._read_meta(key)
+
+        if meta is None:
+            self.misses += 1
+            data = crud.get(session, conds, panel=panel)
+            shutil.rmtree(self.directory / key, ignore_errors=True)
+            (self.directory / key).mkdir(parents=True)
+            self._write_part(key, data, 0)
+            meta = {
+                "db_path": crud.db_path,
+                "table_name": crud.table_name,
+                "conds": normalize_conds(conds),
+                "panel_index": isinstance(data.index, pd.MultiIndex),
+                "parts": 1,
+                "rows": len(data),
+                "watermark": None,
+            }
+        else:
+            self.hits += 1
+            data = self._read(key, meta)
+            watermark = meta["watermark"]
+            if incremental_column and watermark is not None:
+                newer = _as_list(conds) + [
+                    Filter(
+                        incremental_column,
+                        Comparator.gt_strict,
+                        pd.Timestamp(watermark).to_pydatetime(),
+                    )
+                ]
+                fresh = crud.get(session, newer, panel=panel)
+                if not fresh.empty:
+                    self._write_part(key, fresh, meta["parts"])
+                    meta["parts"] += 1
+                    meta["rows"] += len(fresh)
+                    data = _concat([data, fresh], meta["panel_index"])
+                    logger.info(
+                        f"增量更新缓存 {crud.db_path}/{crud.table_name}: {len(fresh)} 行"
+                    )
+
+        if incremental_column and len(data):
+            meta["watermark"] = str(_column_values(data, incremental_column).max())
+        meta["last_access"] = time.time()
+        self._write_meta(key, meta)
+        self.evict()
+        return data
+
+    def invalidate(self, crud: BaseCRUD = None):
+        for path in self.directory.iterdir():
+            meta = self._read_meta(path.name) if path.is_dir() else None
+            if meta is None:
+                continue
+            if crud is None or (
+                meta["db_path"] == crud.db_path
+                and meta["table_name"] == crud.table_name
+            ):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _entries(self):
+        entries = []
+        for path in self.directory.iterdir():
+            if not path.is_dir():
+                continue
+            meta = self._read_meta(path.name)
+            size = sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+            last_access = meta.get("last_access", 0) if meta else 0
+            entries.append((last_access, size, path))
+        return entries
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    # 按最近访问时间淘汰缓存, 直到总大小不超过 max_bytes
+    def evict(self):
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[0])
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries[:-1]:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                logger.debug(f"淘汰查询缓存 {path.name}")
@@ -1,12 +1,28 @@
-from typing import Dict, List
+import hashlib
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Iterator, List
 import dolphindb as ddb
 from pandas import DataFrame
-from datetime import datetime
+from datetime import date, datetime
 from dataclasses import dataclass, field
 from enum import Enum
-from ddbtools import get_table_columns
+from ddbtools.tablemanip import get_table_columns, get_table_info
+from ddbtools.partition import PartitionScheme, get_partition_scheme
+from ddbtools.log import logger
+from ddbtools.instrument import span, timed
+import numpy as np
 import pandas as pd
 
+if TYPE_CHECKING:
+    from ddbtools.diff import DiffSummary, FingerprintIndex
+    from ddbtools.pool import SessionPool
+    from ddbtools.template import QueryTemplate
+    from ddbtools.writer import BufferedWriter
+
 
 class Comparator(Enum):
     eq = "="
@@ -14,6 +30,8 @@ class Comparator(Enum):
     lt = "<="
     like = "like"
     isin = "in"
+    gt_strict = ">"
+    lt_strict = "<"
 
 
 @dataclass
@@ -22,8 +40,13 @@ class Filter:
     comparator: Comparator = Comparator.eq
     value: str | int | float | list | datetime = None
     clause: str = field(init=False)
+    # 转换为脚本字面量之前的原始值
+    raw: str | int | float | list | datetime = field(
+        init=False, repr=False, compare=False
+    )
 
     def __post_init__(self):
+        self.raw = self.value
         if isinstance(self.value, str) and self.comparator != Comparator.like:
             self.value = "'" + self.value + "'"
 
@@ -31,7 +54,14 @@ class Filter:
             self.value = self.value.strftime("%Y.%m.%d %H:%M:%S.%f")[:-3]
 
         match self.comparator:
-            case Comparator.eq | Comparator.gt | Comparator.lt | Comparator.isin:
+            case (
+                Comparator.eq
+                | Comparator.gt
+                | Comparator.lt
+                | Comparator.isin
+                | Comparator.gt_strict
+                | Comparator.lt_strict
+            ):
                 self.clause = f"{self.column} {self.comparator.value} {self.value}"
             case Comparator.like:
                 if not isinstance(self.value, list):
@@ -42,51 +72,760 @@ class Filter:
                 self.clause = " or ".join(conditions)
 
 
+# 各 session 中已上传的服务器端变量名, 按最近使用顺序排列
+_bound_vectors: "weakref.WeakKeyDictionary[ddb.Session, OrderedDict]" = (
+    weakref.WeakKeyDictionary()
+)
+_bound_lock = threading.Lock()
+
+
+def _to_vector(values) -> np.ndarray:
+    values = list(values)
+    if all(isinstance(v, str) for v in values):
+        return np.array(values, dtype=object)
+    if any(isinstance(v, (date, pd.Timestamp, np.datetime64)) for v in values):
+        return pd.to_datetime(values).to_numpy()
+    return np.asarray(values)
+
+
+# 把取值列表上传为服务器端向量并返回变量名, 内容相同的向量在同一 session 中只上传一次
+# 每个 session 最多保留 max_vectors 个向量, 超出时释放最久未使用的向量;
+# max_vectors 应大于单个查询中 isin 条件的个数
+def bind_vector(session: ddb.Session, values, max_vectors: int = 64) -> str:
+    vector = _to_vector(values)
+    digest = hashlib.sha1(
+        (str(vector.dtype) + repr(vector.tolist())).encode()
+    ).hexdigest()
+    name = f"ddbtools_v_{digest[:16]}"
+    with _bound_lock:
+        names = _bound_vectors.setdefault(session, OrderedDict())
+        if name in names:
+            names.move_to_end(name)
+            return name
+    session.upload({name: vector})
+    evicted = []
+    with _bound_lock:
+        names[name] = None
+        names.move_to_end(name)
+        while len(names) > max_vectors:
+            evicted.append(names.popitem(last=False)[0])
+    for old in evicted:
+        session.undef(old, "VAR")
+    return name
+
+
+# 释放 session 中已上传的向量
+def clear_bound_vectors(session: ddb.Session):
+    with _bound_lock:
+        names = _bound_vectors.pop(session, OrderedDict())
+    for name in names:
+        session.undef(name, "VAR")
+
+
 class BaseCRUD:
     key_cols: List[str]
+    # isin 取值个数超过该阈值时上传为服务器端向量, None 表示不上传
+    isin_bind_threshold: int = 1000
+    # 每个 session 最多保留的已上传向量个数, 见 bind_vector
+    isin_bind_max_vectors: int = 64
+    # 为 True 时 get 默认返回紧凑表示, 见 compact_frame
+    compact: bool = False
 
     def __init__(self, db_path: str, table_name: str) -> None:
         self.db_path = db_path
         self.table_name = table_name
 
-    def upsert(self, session: ddb.Session, data: DataFrame):
-        upserter = ddb.TableUpserter(
+    def _clause(self, session: ddb.Session, cond: Filter) -> str:
+        if (
+            self.isin_bind_threshold is not None
+            and cond.comparator == Comparator.isin
+            and isinstance(cond.raw, (list, tuple, set, np.ndarray, pd.Series, pd.Index))
+            and len(cond.raw) > self.isin_bind_threshold
+        ):
+            return f"{cond.column} in {bind_vector(session, cond.raw, self.isin_bind_max_vectors)}"
+        return cond.clause
+
+    def _upserter(self, session: ddb.Session) -> ddb.TableUpserter:
+        return ddb.TableUpserter(
             dbPath=self.db_path,
             tableName=self.table_name,
             ddbSession=session,
             ignoreNull=True,
             keyColNames=self.key_cols,
         )
-        upserter.upsert(data)
 
+    def upsert(self, session: ddb.Session, data: DataFrame):
+        with span("crud.upsert") as sp:
+            sp.set(data)
+            self._upserter(session).upsert(data)
+
+    # 只写入相对 index 新增或内容变化的行, 写入成功后更新 index
+    def diff_upsert(
+        self, session: ddb.Session, data: DataFrame, index: "FingerprintIndex"
+    ) -> "DiffSummary":
+        from ddbtools.diff import DiffSummary
+
+        start = time.perf_counter()
+        with span("crud.diff_upsert.hash"):
+            keys, rows = index.hashes(data)
+            mask = index.changed(hashes=(keys, rows))
+        sent = int(mask.sum())
+        if sent:
+            self.upsert(session, data[mask])
+            index.update(hashes=(keys[mask], rows[mask]))
+        summary = DiffSummary(
+            rows=len(data),
+            sent=sent,
+            skipped=len(data) - sent,
+            seconds=time.perf_counter() - start,
+        )
+        logger.info(
+            f"{self.table_name} 增量写入: 发送 {summary.sent} 行, 跳过 {summary.skipped} 行"
+        )
+        return summary
+
+    # 按表的实际分区方案(见 PartitionScheme)计算每行所属的物理分区, 整个分区分配给同一个写入连接,
+    # 避免 TSDB 写入冲突; 每个连接按 chunk_rows 行分块依次写入
+    # 未指定 scheme 时从数据库读取; 无法在本地确定分区(SEQ 分区或数据缺少分区列)时只用一个连接写入
+    def bulk_upsert(
+        self,
+        pool: "SessionPool",
+        data: DataFrame,
+        chunk_rows: int = 100000,
+        scheme: PartitionScheme = None,
+    ) -> "UpsertSummary":
+        start = time.perf_counter()
+        n_writers = pool.max_concurrency
+        group_ids = None
+        if n_writers > 1:
+            with pool.session() as session:
+                if scheme is None:
+                    scheme = get_partition_scheme(session, self.db_path, self.table_name)
+                if scheme.supported(data.columns):
+                    group_ids = scheme.partition_ids(data, session)
+                else:
+                    logger.warning(
+                        f"无法确定表 {self.db_path}/{self.table_name} 的分区"
+                        f"({scheme.describe() or '未分区'}), 使用单个连接写入"
+                    )
+
+        if group_ids is not None:
+            # 按分组大小从大到小分配给当前负载最小的连接
+            sizes = np.bincount(group_ids)
+            loads = np.zeros(n_writers, dtype=np.int64)
+            owner = np.empty(len(sizes), dtype=np.int64)
+            for group in np.argsort(-sizes, kind="stable"):
+                writer = int(np.argmin(loads))
+                owner[group] = writer
+                loads[writer] += sizes[group]
+            row_writer = owner[group_ids]
+            order = np.lexsort((group_ids, row_writer))
+            bounds = np.searchsorted(row_writer[order], np.arange(n_writers + 1))
+            assignments = [order[bounds[i] : bounds[i + 1]] for i in range(n_writers)]
+        else:
+            assignments = [np.arange(len(data))]
+
+        def write_chunks(session: ddb.Session, positions: np.ndarray, writer: int):
+            upserter = self._upserter(session)
+            timings = []
+            for offset in range(0, len(positions), chunk_rows):
+                chunk = data.iloc[positions[offset : offset + chunk_rows]]
+                chunk_start = time.perf_counter()
+                with span("crud.bulk_upsert.chunk") as sp:
+                    sp.set(chunk)
+                    upserter.upsert(chunk)
+                timings.append(
+                    {
+                        "writer": writer,
+                        "rows": len(chunk),
+                        "seconds": time.perf_counter() - chunk_start,
+                    }
+                )
+            return timings
+
+        futures = [
+            pool.submit(write_chunks, positions, writer)
+            for writer, positions in enumerate(assignments)
+            if len(positions)
+        ]
+        timings = [timing for future in futures for timing in future.result()]
+        chunk_timings = pd.DataFrame(timings, columns=["writer", "rows", "seconds"])
+        return UpsertSummary(
+            chunks=len(chunk_timings),
+            rows=int(chunk_timings["rows"].sum()),
+            writers=len(futures),
+            seconds=time.perf_counter() - start,
+            chunk_timings=chunk_timings,
+        )
+
+    # 创建绑定本表的后台缓冲写入器, 参数见 BufferedWriter
+    def writer(self, session: ddb.Session, **kwargs) -> "BufferedWriter":
+        from ddbtools.writer import BufferedWriter
+
+        return BufferedWriter(self, session, **kwargs)
+
+    # 注册查询形状, 返回可重复调用的 QueryTemplate: crud.template([("code", Comparator.isin)])(session, codes)
+    def template(
+        self,
+        shape: List["Filter | tuple"],
+        panel=True,
+        function_view: bool = False,
+    ) -> "QueryTemplate":
+        from ddbtools.template import QueryTemplate
+
+        return QueryTemplate(self, shape, panel=panel, function_view=function_view)
+
+    @timed("crud.delete")
     def delete(self, session: ddb.Session, **kwargs):
         table_delete = session.table(self.db_path, self.table_name).delete()
         for kw, param in kwargs.items():
             table_delete = table_delete.where(f"{kw}={param}")
         table_delete.execute()
 
+    def _query(self, session: ddb.Session, conds: Filter | List[Filter] = None):
+        table = session.table(self.db_path, self.table_name)
+        for cond in _as_list(conds):
+            table = table.where(self._clause(session, cond))
+        return table
+
+    # 按键批量删除: keys 为包含 key_cols 列的 DataFrame, 分块上传后在服务器端一次删除每块匹配的行
+    # 返回删除的行数
+    def delete_keys(
+        self,
+        session: ddb.Session,
+        keys: DataFrame,
+        key_cols: List[str] = None,
+        chunk_rows: int = 100000,
+    ) -> int:
+        key_cols = key_cols or self.key_cols
+        keys = keys[key_cols].drop_duplicates()
+        col_types = get_table_columns(session, self.db_path, self.table_name)[
+            "typeString"
+        ]
+        # 服务器端临时变量统一使用 ddbtools_ 前缀, 全部分块执行完后一并释放
+        var_name = "ddbtools_delete_keys"
+        keys_var, set_var = "ddbtools_delete_keys_cast", "ddbtools_delete_keys_set"
+        table_var, count_var = "ddbtools_delete_keys_table", "ddbtools_delete_keys_count"
+        casts = ", ".join(f"cast({col}, {col_types[col]}) as {col}" for col in key_cols)
+        prune = ", ".join(f"{col} in distinct({keys_var}.{col})" for col in key_cols)
+        composite = ' + "|" + '.join(f"string({col})" for col in key_cols)
+        key_composite = ' + "|" + '.join(f"string({keys_var}.{col})" for col in key_cols)
+        script = f"""
+            {keys_var} = select {casts} from {var_name}
+            {set_var} = distinct({key_composite})
+            {table_var} = loadTable("{self.db_path}", "{self.table_name}")
+            {count_var} = exec count(*) from {table_var} where {prune}, {composite} in {set_var}
+            delete from {table_var} where {prune}, {composite} in {set_var}
+            {count_var}
+        """
+        temporaries = "".join(f"`{name}" for name in (var_name, keys_var, set_var, table_var, count_var))
+        deleted = 0
+        try:
+            for offset in range(0, len(keys), chunk_rows):
+                with span("crud.delete_keys.chunk") as sp:
+                    chunk = keys.iloc[offset : offset + chunk_rows]
+                    session.upload({var_name: chunk})
+                    deleted += int(session.run(script))
+                    sp.set(rows=len(chunk))
+        finally:
+            session.run(f"undef({temporaries}, VAR)")
+        logger.info(f"从表 {self.db_path}/{self.table_name} 删除 {deleted} 行")
+        return deleted
+
+    # 属性表面板查询在服务器端按 datetime, code 透视
+    def _panel_query(
+        self, session: ddb.Session, conds: Filter | List[Filter] = None, panel=True
+    ):
+        table = self._query(session, conds)
+        if "attr_" in self.table_name and panel:
+            return (
+                table.select("value").pivotby(index="datetime,code", column="attribute"),
+                True,
+            )
+        return table, False
+
+    # compact 为 True 时返回紧凑表示并在 attrs["memory_report"] 中记录转换前后的内存占用,
+    # 为 None 时使用类属性 compact
     def get(
+        self,
+        session: ddb.Session,
+        conds: Filter | List[Filter] = None,
+        panel=True,
+        compact: bool = None,
+    ):
+        table, pivoted = self._panel_query(session, conds, panel)
+
+        if pivoted:
+            with span("crud.get.pivotby") as sp:
+                result = _as_frame(table.toDF())
+                sp.set(result)
+            if not result.empty:
+                with span("crud.get.sort_index"):
+                    result = result.set_index(["datetime", "code"]).sort_index()
+        else:
+            with span("crud.get.toDF") as sp:
+                result = _as_frame(table.toDF())
+                sp.set(result)
+
+        if self.compact if compact is None else compact:
+            with span("crud.get.compact"):
+                result = compact_frame(result, report=True)
+        return result
+
+    # 以 pyarrow.Table 返回查询结果, 不经过 pandas
+    # Session 使用 PROTOCOL_ARROW 时直接接收 Arrow 数据, 否则由返回的 DataFrame 转换
+    # 属性表面板按 datetime, code 排序, 需要 DataFrame 时使用 arrow_to_pandas
+    def get_arrow(
         self, session: ddb.Session, conds: Filter | List[Filter] = None, panel=True
     ):
-        table = session.table(self.db_path, self.table_name)
-        if conds:
-            if isinstance(conds, Filter):
-                conds = [conds]
-            for cond in conds:
-                table = table.where(cond.clause)
+        pa = _import_pyarrow()
+        table, pivoted = self._panel_query(session, conds, panel)
+        with span("crud.get_arrow.run") as sp:
+            result = session.run(table.showSQL())
+            sp.set(result)
+        if not isinstance(result, pa.Table):
+            with span("crud.get_arrow.from_pandas"):
+                result = pa.Table.from_pandas(result, preserve_index=False)
+        if pivoted and result.num_rows:
+            result = result.sort_by([("datetime", "ascending"), ("code", "ascending")])
+        return result
 
-        if "attr_" in self.table_name and panel:
-            value = (
-                table.select("value")
-                .pivotby(index="datetime,code", column="attribute")
+    # 按时间切片生成查询条件, 相邻切片左闭右开, 最后一个切片沿用原上界
+    # 指定 freq 时按频率切分; 传入分区边界 boundaries 时沿分区边界切分, 每段包含整数个分区,
+    # 段数不超过 periods; 否则等分为 periods 段
+    def _time_slices(
+        self,
+        session: ddb.Session,
+        conds: Filter | List[Filter],
+        time_column: str,
+        freq: str = None,
+        periods: int = None,
+        boundaries: np.ndarray = None,
+    ) -> List[List[Filter]]:
+        conds = _as_list(conds)
+        others = [cond for cond in conds if not _is_range(cond, time_column)]
+        lower = [c for c in conds if _is_range(c, time_column) and c.comparator in _LOWER]
+        upper = [c for c in conds if _is_range(c, time_column) and c.comparator in _UPPER]
+        if not lower or not upper:
+            bounds = (
+                self._query(session, conds)
+                .select(f"min({time_column}) as lo, max({time_column}) as hi")
                 .toDF()
             )
-            if value.empty:
-                return value
-            else:
-                return value.set_index(["datetime", "code"]).sort_index()
+            if bounds.empty or pd.isna(bounds["lo"].iloc[0]):
+                return []
+        start = pd.Timestamp(lower[-1].raw if lower else bounds["lo"].iloc[0])
+        end = pd.Timestamp(upper[-1].raw if upper else bounds["hi"].iloc[0])
+        last = upper[-1] if upper else Filter(time_column, Comparator.lt, end.to_pydatetime())
+        first = lower[-1] if lower else Filter(time_column, Comparator.gt, start.to_pydatetime())
+
+        if freq:
+            points = pd.date_range(start, end, freq=freq)
+        elif boundaries is not None:
+            points = pd.DatetimeIndex(boundaries)
+            inside = points[(points > start) & (points < end)]
+            # 分区数多于 periods 时每段合并 step 个相邻分区
+            step = -(-(len(inside) + 1) // periods) if periods else 1
+            points = inside[step - 1 :: step]
         else:
-            return table.toDF()
+            points = pd.date_range(start, end, periods=periods + 1)
+        edges = [edge for edge in points if start < edge <= end]
+        if not edges or edges[-1] != end:
+            edges.append(end)
+        slices = []
+        lo = first
+        for edge in edges[:-1]:
+            hi = Filter(time_column, Comparator.lt_strict, edge.to_pydatetime())
+            slices.append(others + [lo, hi])
+            lo = Filter(time_column, Comparator.gt, edge.to_pydatetime())
+        slices.append(others + [lo, last])
+        return slices
+
+    # 分块读取, 每次只在服务器端物化一块数据
+    # 指定 partition_column 时按该列取值逐个读取, 指定 time_column 和 freq 时按时间切片读取,
+    # 否则按 chunk_rows 行分块读取; 按行分块无法透视, 属性表需传入 panel=False
+    # 服务器的 fetchSize 不能小于 8192, chunk_rows 更小时按 8192 行从服务器读取,
+    # 再在本地切成不超过 chunk_rows 行的块返回
+    def iter_get(
+        self,
+        session: ddb.Session,
+        conds: Filter | List[Filter] = None,
+        chunk_rows: int = 100000,
+        time_column: str = None,
+        freq: str = None,
+        partition_column: str = None,
+        panel=True,
+    ) -> Iterator[DataFrame]:
+        if partition_column:
+            values = (
+                self._query(session, conds)
+                .select(f"distinct {partition_column} as v")
+                .toDF()["v"]
+                .sort_values()
+            )
+            for value in values:
+                if isinstance(value, pd.Timestamp):
+                    value = value.to_pydatetime()
+                part = _as_list(conds) + [Filter(partition_column, Comparator.eq, value)]
+                yield self.get(session, part, panel=panel)
+        elif time_column and freq:
+            for part in self._time_slices(session, conds, time_column, freq):
+                yield self.get(session, part, panel=panel)
+        else:
+            if "attr_" in self.table_name and panel:
+                raise ValueError(
+                    "属性表按行分块读取无法返回面板, 请传入 panel=False 或指定 partition_column/time_column"
+                )
+            if chunk_rows <= 0:
+                raise ValueError(f"chunk_rows 必须为正数: {chunk_rows}")
+            sql = self._query(session, conds).showSQL()
+            reader = session.run(sql, fetchSize=max(chunk_rows, _MIN_FETCH_SIZE))
+            try:
+                while reader.hasNext():
+                    with span("crud.iter_get.read") as sp:
+                        block = reader.read()
+                        sp.set(block)
+                    if len(block) <= chunk_rows:
+                        yield block
+                        continue
+                    for start in range(0, len(block), chunk_rows):
+                        yield block.iloc[start : start + chunk_rows].reset_index(drop=True)
+            finally:
+                if reader.hasNext():
+                    reader.skipAll()
+
+
+    # 选择用于切分的分区列: 优先使用带范围条件的时间类型分区列, 否则使用第一个时间类型的分区列
+    # 只按时间类型切分, 没有时间类型的分区列时返回 None
+    def _range_partition_column(
+        self, session: ddb.Session, conds: Filter | List[Filter]
+    ):
+        table_info = get_table_info(session, self.db_path, self.table_name)
+        partition_columns = table_info["partition_columns"]
+        if partition_columns is None:
+            return None
+        if isinstance(partition_columns, str):
+            partition_columns = [partition_columns]
+        range_columns = {
+            cond.column for cond in _as_list(conds) if cond.comparator in _LOWER + _UPPER
+        }
+        col_types = table_info["col_defs"]["typeString"]
+        temporal = [col for col in partition_columns if col_types.get(col) in _TEMPORAL_TYPES]
+        for col in temporal:
+            if col in range_columns:
+                return col
+        return temporal[0] if temporal else None
+
+    # 沿分区列把范围查询切分成多段, 在连接池上并发查询后按顺序拼接
+    # 未指定 freq 时沿数据库的 RANGE 边界或 VALUE 分区切分, 每个连接读取整数个分区;
+    # 分区方案中没有该列的时间分区时等分时间范围
+    def get_parallel(
+        self,
+        pool: "SessionPool",
+        conds: Filter | List[Filter] = None,
+        time_column: str = None,
+        freq: str = None,
+        panel=True,
+    ):
+        with pool.session() as session:
+            if time_column is None:
+                time_column = self._range_partition_column(session, conds)
+            if time_column is None:
+                return self.get(session, conds, panel=panel)
+            boundaries = None
+            if freq is None:
+                boundaries = _partition_edges(
+                    get_partition_scheme(session, self.db_path, self.table_name), time_column
+                )
+            slices = self._time_slices(
+                session,
+                conds,
+                time_column,
+                freq=freq,
+                periods=pool.size * 2,
+                boundaries=boundaries,
+            )
+            if not slices:
+                return self.get(session, conds, panel=panel)
+        # 紧凑模式下各段的分类取值不同, 拼接后再统一转换
+        extra = {"compact": False} if self.compact else {}
+        results = pool.map(
+            self.get, [{"conds": part, "panel": panel, **extra} for part in slices]
+        )
+        non_empty = [result for result in results if not result.empty]
+        # 只有属性表面板以 (datetime, code) 为索引, 其余结果重新编号
+        pivoted = "attr_" in self.table_name and panel
+        result = (
+            pd.concat(non_empty, ignore_index=not pivoted) if non_empty else results[0]
+        )
+        if self.compact:
+            result = compact_frame(result, report=True)
+        return result
+
+    # 属性表按属性并发读取长表, 按 (datetime, code) 对齐为面板
+    # 日期与代码先哈希去重再排序, 各属性的取值按位置直接写入稠密数组, 不做整表透视与排序
+    # as_array=True 时返回 AttributePanel(时间 × 代码 × 属性), 否则返回与 get 一致的宽表
+    def get_panel(
+        self,
+        pool: "SessionPool",
+        attributes: List[str],
+        conds: Filter | List[Filter] = None,
+        as_array: bool = False,
+    ) -> "DataFrame | AttributePanel":
+        attributes = list(attributes)
+        conds = _as_list(conds)
+
+        def fetch(session: ddb.Session, attribute: str) -> DataFrame:
+            table = self._query(session, conds + [Filter("attribute", value=attribute)])
+            with span("crud.get_panel.fetch") as sp:
+                result = _as_frame(table.select("datetime, code, value").toDF())
+                sp.set(result)
+            return result
+
+        futures = [pool.submit(fetch, attribute) for attribute in attributes]
+        frames = [future.result() for future in futures]
+
+        with span("crud.get_panel.align"):
+            non_empty = [frame for frame in frames if len(frame)]
+            if non_empty:
+                dates = np.sort(
+                    pd.unique(np.concatenate([pd.unique(f["datetime"]) for f in non_empty]))
+                )
+                codes = np.sort(
+                    pd.unique(
+                        np.concatenate(
+                            [pd.unique(f["code"]).astype(object) for f in non_empty]
+                        )
+                    )
+                )
+            else:
+                dates = np.array([], dtype="datetime64[ns]")
+                codes = np.array([], dtype=object)
+            code_index = pd.Index(codes)
+            values = np.full((len(dates), len(codes), len(attributes)), np.nan)
+            for k, frame in enumerate(frames):
+                if not len(frame):
+                    continue
+                i = np.searchsorted(dates, frame["datetime"].to_numpy())
+                j = code_index.get_indexer(frame["code"])
+                values[i, j, k] = frame["value"].to_numpy(dtype=float, na_value=np.nan)
+            panel = AttributePanel(values, dates, codes, attributes)
+            return panel if as_array else panel.to_frame()
+
+    # 服务器端聚合的 SQL
+    # aggs: {列名: 函数名或函数名列表}, 如 {"price": ["first", "max", "min", "last"], "volume": "sum"},
+    #   单个函数时结果列沿用列名, 多个函数时为 列名_函数名; 值中含括号时视为完整表达式, 键为结果列名,
+    #   如 {"vwap": "wavg(price, volume)"}
+    # by: 分组列; time_column + freq: 按 DolphinDB 时间长度(如 "5m", "1d", "1w")分桶,
+    #   指定 fill 时使用 interval 分桶并按 fill("prev", "post", "linear", "null", "none" 或数值)填充空桶
+    def aggregate_sql(
+        self,
+        session: ddb.Session,
+        aggs: Dict[str, str | List[str]],
+        by: str | List[str] = None,
+        conds: Filter | List[Filter] = None,
+        time_column: str = None,
+        freq: str = None,
+        fill=None,
+    ) -> str:
+        selects = []
+        for column, funcs in aggs.items():
+            if isinstance(funcs, str) and "(" in funcs:
+                selects.append(f"{funcs} as {column}")
+                continue
+            funcs = [funcs] if isinstance(funcs, str) else list(funcs)
+            for func in funcs:
+                if not _IDENTIFIER.match(func):
+                    raise ValueError(f"无效的聚合函数 {func}")
+                alias = column if len(funcs) == 1 else f"{column}_{func}"
+                selects.append(f"{_AGG_FUNCS.get(func, func)}({column}) as {alias}")
+        if not selects:
+            raise ValueError("aggs 不能为空")
+
+        groups = [by] if isinstance(by, str) else list(by or [])
+        if freq is not None:
+            if time_column is None:
+                raise ValueError("按时间分桶时必须指定 time_column")
+            if fill is None:
+                groups.append(f"bar({time_column}, {freq}) as {time_column}")
+            else:
+                fill = f'"{fill}"' if isinstance(fill, str) else fill
+                groups.append(f"interval({time_column}, {freq}, {fill}) as {time_column}")
+
+        sql = f'select {", ".join(selects)} from loadTable("{self.db_path}", "{self.table_name}")'
+        clauses = [self._clause(session, cond) for cond in _as_list(conds)]
+        if clauses:
+            sql += " where " + " and ".join(f"({clause})" for clause in clauses)
+        if groups:
+            sql += " group by " + ", ".join(groups)
+        return sql
+
+    # 在服务器端按条件过滤后分组聚合, 只返回聚合结果, 结果按分组列排序
+    def aggregate(
+        self,
+        session: ddb.Session,
+        aggs: Dict[str, str | List[str]],
+        by: str | List[str] = None,
+        conds: Filter | List[Filter] = None,
+        time_column: str = None,
+        freq: str = None,
+        fill=None,
+    ) -> DataFrame:
+        sql = self.aggregate_sql(session, aggs, by, conds, time_column, freq, fill)
+        with span("crud.aggregate") as sp:
+            result = _as_frame(session.run(sql))
+            sp.set(result)
+        keys = [by] if isinstance(by, str) else list(by or [])
+        if freq is not None:
+            keys.append(time_column)
+        keys = [key for key in keys if key in result.columns]
+        if keys and not result.empty:
+            result = result.sort_values(keys, ignore_index=True)
+        return result
+
+    # 按时间分桶聚合, 如日线转周线: resample(session, "1w", {"close": "last", "volume": "sum"}, by="code")
+    # 未指定 time_column 时使用表中第一个时间类型的列
+    def resample(
+        self,
+        session: ddb.Session,
+        freq: str,
+        aggs: Dict[str, str | List[str]],
+        by: str | List[str] = None,
+        conds: Filter | List[Filter] = None,
+        time_column: str = None,
+        fill=None,
+    ) -> DataFrame:
+        if time_column is None:
+            col_types = get_table_columns(session, self.db_path, self.table_name)[
+                "typeString"
+            ]
+            time_column = next(
+                (col for col, dtype in col_types.items() if dtype in _TEMPORAL_TYPES),
+                None,
+            )
+            if time_column is None:
+                raise ValueError(f"表 {self.table_name} 中没有时间类型的列")
+        return self.aggregate(session, aggs, by, conds, time_column, freq, fill)
+
+
+@dataclass
+class UpsertSummary:
+    chunks: int
+    rows: int
+    writers: int
+    seconds: float
+    chunk_timings: DataFrame
+
+
+# 属性表的稠密面板: values[i, j, k] 为 dates[i], codes[j], attributes[k] 的取值, 缺失为 NaN
+@dataclass
+class AttributePanel:
+    values: np.ndarray
+    dates: np.ndarray
+    codes: np.ndarray
+    attributes: List[str]
+
+    # 转为 (datetime, code) 索引、属性为列的宽表, 去掉所有属性都缺失的行, 与 get 的面板结果一致
+    def to_frame(self) -> DataFrame:
+        present = ~np.isnan(self.values).all(axis=2)
+        rows, cols = np.nonzero(present)
+        index = pd.MultiIndex.from_arrays(
+            [self.dates[rows], self.codes[cols]], names=["datetime", "code"]
+        )
+        return DataFrame(self.values[present], index=index, columns=list(self.attributes))
+
+    # 由 get 返回的面板宽表((datetime, code) 索引、属性为列)构建
+    @classmethod
+    def from_frame(cls, data: DataFrame) -> "AttributePanel":
+        dates = data.index.get_level_values("datetime")
+        codes = data.index.get_level_values("code")
+        date_axis = np.sort(pd.unique(dates.to_numpy()))
+        code_axis = np.sort(pd.unique(codes.to_numpy(dtype=object)))
+        values = np.full((len(date_axis), len(code_axis), data.shape[1]), np.nan)
+        i = np.searchsorted(date_axis, dates.to_numpy())
+        j = pd.Index(code_axis).get_indexer(codes)
+        values[i, j, :] = data.to_numpy(dtype=float, na_value=np.nan)
+        return cls(values, date_axis, code_axis, [str(col) for col in data.columns])
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Arrow 读取需要 pyarrow, 请安装 ddbtools[arrow] 或 pyarrow") from e
+    return pyarrow
+
+
+# PROTOCOL_ARROW 的 Session 返回 pyarrow.Table, get 等接口统一转为 DataFrame
+def _as_frame(result) -> DataFrame:
+    if isinstance(result, DataFrame):
+        return result
+    return result.to_pandas()
+
+
+# pyarrow.Table 转为 DataFrame
+# strings="arrow": 所有列使用 pd.ArrowDtype, 数据留在 Arrow 内存中, 不生成 object 列
+# strings="category": 字符串列按字典编码转为 category, 其余列转为 numpy 类型
+def arrow_to_pandas(table, strings: str = "arrow", index: List[str] = None) -> DataFrame:
+    pa = _import_pyarrow()
+    if strings == "arrow":
+        data = table.to_pandas(types_mapper=pd.ArrowDtype)
+    elif strings == "category":
+        columns = [
+            column.dictionary_encode()
+            if pa.types.is_string(column.type) or pa.types.is_large_string(column.type)
+            else column
+            for column in table.columns
+        ]
+        data = pa.Table.from_arrays(columns, names=table.column_names).to_pandas()
+    else:
+        raise ValueError(f"strings 只能为 arrow 或 category, 得到 {strings}")
+    if index:
+        data = data.set_index(index)
+    return data
+
+
+# pandas 聚合函数名到 DolphinDB 函数名
+_AGG_FUNCS = {"mean": "avg", "median": "med"}
+_MIN_FETCH_SIZE = 8192
+_IDENTIFIER = re.compile(r"^\w+$")
+
+_LOWER = (Comparator.gt, Comparator.gt_strict)
+_UPPER = (Comparator.lt, Comparator.lt_strict)
+_TEMPORAL_TYPES = {
+    "DATE",
+    "MONTH",
+    "DATETIME",
+    "DATEHOUR",
+    "TIMESTAMP",
+    "NANOTIMESTAMP",
+}
+
+
+def _as_list(conds: Filter | List[Filter] | None) -> List[Filter]:
+    if not conds:
+        return []
+    if isinstance(conds, Filter):
+        return [conds]
+    return list(conds)
+
+
+def _is_range(cond: Filter, column: str) -> bool:
+    return cond.column == column and cond.comparator in _LOWER + _UPPER
+
+
+# 分区方案中 column 的时间分区边界: RANGE 分区为各区间的下界, VALUE 分区为各分区的取值
+# 其他分区类型或非时间类型返回 None
+def _partition_edges(scheme: PartitionScheme, column: str):
+    if column not in scheme.columns or not scheme.supported():
+        return None
+    level = scheme.columns.index(column)
+    if scheme.types[level] not in ("RANGE", "VALUE"):
+        return None
+    edges = np.asarray(scheme.schemas[level])
+    if edges.dtype.kind != "M":
+        return None
+    return np.sort(edges.astype("datetime64[ns]"))
 
 
 DTYPE_DDB2PD = {
@@ -111,6 +850,109 @@ DTYPE_DDB2PD = {
 }
 
 
+# 紧凑模式: SYMBOL 转为 category
+DTYPE_DDB2PD_COMPACT = {**DTYPE_DDB2PD, "SYMBOL": "category"}
+
+
+# 字符串列在不同取值占比不超过 category_threshold 时转为 category,
+# 整数列无损降为能容纳取值的最小整数类型, 浮点与时间列保持不变
+def _compact_column(values: pd.Series, category_threshold: float) -> pd.Series:
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(dtype):
+        return values
+    if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        if len(values) and values.nunique() <= category_threshold * len(values):
+            return values.astype("category")
+        return values
+    if pd.api.types.is_integer_dtype(dtype):
+        return pd.to_numeric(values, downcast="integer")
+    return values
+
+
+# 转换前后各列的类型与内存占用(字节, 含字符串内容), total 行包含索引
+def _memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    report = pd.DataFrame(
+        {
+            "dtype_before": before.dtypes.astype(str),
+            "dtype_after": after.dtypes.astype(str),
+            "bytes_before": before.memory_usage(index=False, deep=True),
+            "bytes_after": after.memory_usage(index=False, deep=True),
+        }
+    )
+    report.loc["total"] = [
+        "",
+        "",
+        before.memory_usage(index=True, deep=True).sum(),
+        after.memory_usage(index=True, deep=True).sum(),
+    ]
+    report.index.name = "column"
+    return report
+
+
+# 查询结果的紧凑表示, 适合代码、属性名等大量重复的字符串列
+def compact_frame(
+    data: pd.DataFrame, category_threshold: float = 0.5, report: bool = False
+) -> pd.DataFrame:
+    result = data.copy(deep=False)
+    for name in data.columns:
+        column = _compact_column(data[name], category_threshold)
+        if column is not data[name]:
+            result[name] = column
+    if report:
+        result.attrs["memory_report"] = _memory_report(data, result)
+    return result
+
+
+_BOOL_TRUE = ["TRUE", "True", "true", "是", "1", True, 1]
+_BOOL_FALSE = ["FALSE", "False", "false", "否", "0", False, 0]
+
+
+# 由表结构生成列转换计划: 列名 -> pandas 类型
+def _column_plan(db_cols: pd.DataFrame, compact: bool = False) -> Dict[str, str]:
+    mapping = DTYPE_DDB2PD_COMPACT if compact else DTYPE_DDB2PD
+    return db_cols["typeString"].map(mapping).to_dict()
+
+
+def _to_datetime(values: pd.Series) -> pd.Series:
+    if not pd.api.types.is_datetime64_any_dtype(values.dtype):
+        values = pd.to_datetime(values)
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        # 已有时区，将时区去除(默认转化为东八区时间)
+        values = values.dt.tz_convert("PRC").dt.tz_localize(None)
+    return values
+
+
+def _to_boolean(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(values.dtype) or pd.api.types.is_numeric_dtype(
+        values.dtype
+    ):
+        return values.astype("boolean")
+    result = pd.Series(pd.NA, index=values.index, dtype="boolean")
+    result[values.isin(_BOOL_TRUE).to_numpy()] = True
+    result[values.isin(_BOOL_FALSE).to_numpy()] = False
+    return result
+
+
+def _convert_column(values: pd.Series, dtype: str) -> pd.Series:
+    # 需要做时间格式转化
+    if dtype == "datetime64":
+        return _to_datetime(values)
+    if values.dtype == dtype:
+        return values
+    if dtype == "boolean":
+        return _to_boolean(values)
+    try:
+        return values.astype(dtype)
+    except (ValueError, TypeError):
+        return values
+
+
+def _empty_column(index: pd.Index, dtype: str) -> pd.Series:
+    if dtype == "datetime64":
+        dtype = "datetime64[ns]"
+    return pd.Series(index=index, dtype=dtype)
+
+
 class DBDf(pd.DataFrame):
     def __init__(
         self,
@@ -118,41 +960,51 @@ class DBDf(pd.DataFrame):
         db_path: str,
         table_name: str,
         data: pd.DataFrame = None,
+        report: bool = False,
+        compact: bool = False,
     ):
         db_cols: pd.DataFrame = get_table_columns(session, db_path, table_name)
-        db_cols["pd_dtype"] = db_cols["typeString"].map(DTYPE_DDB2PD)
-        super().__init__(columns=db_cols.index)
-        self.attrs["column_names_types"] = db_cols["pd_dtype"].to_dict()
-
-        if data is not None:
-            data = pd.DataFrame(data).reset_index()
-            commom_columns = data.columns.intersection(db_cols.index)
-            self[commom_columns] = data[commom_columns]
-
-        self._apply_column_types()
-
-    def _apply_column_types(self):
-        for name, dtype in self.attrs["column_names_types"].items():
-            # 需要做时间格式转化
-            if pd.api.types.is_datetime64_dtype(dtype):
-                self[name] = pd.to_datetime(self[name])
-
-                if isinstance(self[name], pd.DatetimeTZDtype):
-                    # 已有时区，将时区去除(默认转化为东八区时间)
-                    self[name] = self[name].dt.tz_convert("PRC").dt.tz_localize(None)
-            elif self[name].dtype != dtype:
-                if dtype == "boolean":
-                    mapping = {
-                        "TRUE": True,
-                        "True": True,
-                        "true": True,
-                        "是": True,
-                        "1": True,
-                        "FALSE": False,
-                        "False": False,
-                        "false": False,
-                        "否": False,
-                        "0": False,
-                    }
-                    self[name] = self[name].map(mapping)
-                self[name] = self[name].astype(dtype, errors="ignore")
+        plan = _column_plan(db_cols, compact)
+
+        if data is None:
+            data = pd.DataFrame()
+        else:
+            data = pd.DataFrame(data)
+            if any(name in plan for name in data.index.names if name is not None):
+                data = data.reset_index()
+            else:
+                data = data.copy(deep=False)
+                data.index = pd.RangeIndex(len(data))
+
+        # 按转换计划一次性构建各列, 类型已匹配的列不做转换
+        with span("crud.DBDf") as sp:
+            columns = {}
+            records = []
+            for name, dtype in plan.items():
+                start = time.perf_counter()
+                if name in data.columns:
+                    source = data[name]
+                    column = _convert_column(source, dtype)
+                    converted = column is not source
+                else:
+                    column = _empty_column(data.index, dtype)
+                    converted = True
+                columns[name] = column
+                if report:
+                    records.append(
+                        {
+                            "column": name,
+                            "dtype": str(column.dtype),
+                            "converted": converted,
+                            "seconds": time.perf_counter() - start,
+                            "bytes": column.memory_usage(index=False),
+                        }
+                    )
+            sp.set(rows=len(data))
+
+        super().__init__(columns, index=data.index, copy=False)
+        self.attrs["column_names_types"] = plan
+        if report:
+            self.attrs["conversion_report"] = pd.DataFrame(records).set_index("column")
+        if compact:
+            self.attrs["memory_report"] = _memory_report(data, self)
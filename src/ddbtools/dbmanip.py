@@ -1,11 +1,31 @@
-import numpy as np
-import pandas as pd
-import dolphindb as ddb
+from __future__ import annotations
+
+import csv
+from typing import TYPE_CHECKING
 from ddbtools.log import logger
-from typing import Dict
+from ddbtools.instrument import span, timed
 from pathlib import Path
 
+# create_db 等只需要 Session 的函数不加载 pandas/numpy/dolphindb, 用到时再导入
+if TYPE_CHECKING:
+    import dolphindb as ddb
+
+
+# 类型 ID 到类型名称的映射, 导入时解析一次
+def _load_dtype_mapping():
+    with open(Path(__file__).parent / "dolphindb_dtype.csv", encoding="utf-8") as f:
+        return {
+            int(row["ID"]): row["名称"]
+            for row in csv.DictReader(f)
+            if row["ID"].isdigit()
+        }
+
+
+DTYPE_ID2NAME = _load_dtype_mapping()
+
+
 # 创建数据库
+@timed("dbmanip.create_db")
 def create_db(
     session: ddb.Session, dbname: str, partition_plan: str, engine: str = "TSDB"
 ):
@@ -28,43 +48,77 @@ def delete_db(session: ddb.Session, dbname: str): ...
 
 
 # 获取数据库信息
+@timed("dbmanip.get_db_info")
 def get_db_info(session: ddb.Session, dbname: str):
     session.database("db", dbPath=dbname)
     return session.run("schema(db)")
 
-def get_all_dbs(session: ddb.Session):
-    all_dbs = session.run("getAllDBs()").keys()
-    db_schemas = []
-    for db in all_dbs:
-        session.database("db", dbPath=f"dfs:/{db}")
-        db_schemas.append(session.run(f"schema(db)"))
-    db_schemas = pd.DataFrame(
-        [
-            {
-                "dbpath": schema["databaseDir"],
-                "engineType": schema["engineType"],
-                "partitionPlan": schema["partitionColumnType"],
-                "partitiontype": schema["partitionTypeName"],
-            }
-            for schema in db_schemas
-        ]
-    )
-    dtype_mapping = (
-        pd.read_csv(
-            f"{Path(__file__).parent}/dolphindb_dtype.csv",
-        )
-        .set_index("ID")["名称"]
-        .to_dict()
-    )
 
-    def map_dtype(x, dtype_mapping: Dict):
-        if isinstance(x, int):
-            return dtype_mapping.get(str(x), x)
-        if isinstance(x, np.ndarray):
-            return [dtype_mapping.get(str(y), y) for y in x]
+def map_dtype(x):
+    import numpy as np
 
-    db_schemas["partitionPlan"] = db_schemas["partitionPlan"].apply(
-        map_dtype, dtype_mapping=dtype_mapping
+    if isinstance(x, (int, np.integer)):
+        x = int(x)
+        # 数组类型的 ID 为基础类型 ID+64
+        if x not in DTYPE_ID2NAME and x - 64 in DTYPE_ID2NAME:
+            return DTYPE_ID2NAME[x - 64] + "[]"
+        return DTYPE_ID2NAME.get(x, x)
+    if isinstance(x, (list, np.ndarray)):
+        return [map_dtype(y) for y in x]
+    return x
+
+
+# 在服务器端一次性收集所有数据库的 schema, 可选同时收集所有表的列定义
+# 脚本包在立即调用的匿名函数中, 变量都是局部变量, 不会留在会话中
+def _catalog_script(with_tables: bool):
+    return f"""
+    def() {{
+        dbPaths = "dfs:/" + keys(getAllDBs())
+        dbSchemas = array(ANY, size(dbPaths))
+        for (i in 0:size(dbPaths)) {{
+            dbSchemas[i] = schema(database(dbPaths[i]))
+        }}
+        colDefs = table(1:0, `dbPath`tableName`name`typeString`typeInt`comment, [STRING, STRING, STRING, STRING, INT, STRING])
+        if ({"true" if with_tables else "false"}) {{
+            for (dbPath in dbPaths) {{
+                for (tableName in getTables(database(dbPath))) {{
+                    c = schema(loadTable(dbPath, tableName)).colDefs
+                    n = size(c)
+                    colDefs.append!(table(take(dbPath, n) as dbPath, take(tableName, n) as tableName, c.name as name, c.typeString as typeString, c.typeInt as typeInt, c.comment as comment))
+                }}
+            }}
+        }}
+        return [dbSchemas, colDefs]
+    }}()
+    """
+
+
+def _db_schemas_frame(db_schemas):
+    import pandas as pd
+
+    return pd.DataFrame(
+        {
+            "dbpath": [schema["databaseDir"] for schema in db_schemas],
+            "engineType": [schema["engineType"] for schema in db_schemas],
+            "partitionPlan": [
+                map_dtype(schema["partitionColumnType"]) for schema in db_schemas
+            ],
+            "partitiontype": [schema["partitionTypeName"] for schema in db_schemas],
+        },
+        columns=["dbpath", "engineType", "partitionPlan", "partitiontype"],
     )
 
+
+# 一次网络往返获取数据库目录, 返回 (数据库信息, 所有表的列定义)
+def get_catalog(session: ddb.Session, with_tables: bool = True):
+    with span("dbmanip.get_catalog.run") as sp:
+        db_schemas, col_defs = session.run(_catalog_script(with_tables))
+        sp.set(col_defs)
+    with span("dbmanip.get_catalog.frame"):
+        return _db_schemas_frame(db_schemas), col_defs
+
+
+@timed("dbmanip.get_all_dbs")
+def get_all_dbs(session: ddb.Session):
+    db_schemas, _ = get_catalog(session, with_tables=False)
     return db_schemas
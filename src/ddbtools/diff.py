@@ -0,0 +1,103 @@
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+from ddbtools.log import logger
+
+
+@dataclass
+class DiffSummary:
+    rows: int
+    sent: int
+    skipped: int
+    seconds: float
+
+    # 跳过行数占输入行数的比例
+    @property
+    def skip_ratio(self) -> float:
+        return self.skipped / self.rows if self.rows else 0.0
+
+
+# 本地行指纹索引: 以 key_cols 的哈希为键, 记录最近一次写入的整行哈希
+# 只反映经由本索引写入(或 update 登记)的数据, 服务器端被其他途径修改后应 clear 或重新登记
+# 指定 path 时从该文件加载, 每次 update 后保存
+class FingerprintIndex:
+    def __init__(self, key_cols: List[str], path: str | Path = None):
+        self.key_cols = list(key_cols)
+        self.path = Path(path).expanduser() if path is not None else None
+        self._lock = threading.Lock()
+        self._fingerprints = pd.Series(
+            np.empty(0, dtype=np.uint64), index=pd.Index([], dtype=np.uint64)
+        )
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    # 向量化计算每行的 (键哈希, 整行哈希), 整行哈希与列顺序无关
+    def hashes(self, data: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        keys = pd.util.hash_pandas_object(data[self.key_cols], index=False)
+        rows = pd.util.hash_pandas_object(data[sorted(data.columns)], index=False)
+        return keys.to_numpy(), rows.to_numpy()
+
+    # 返回新增或内容变化的行的布尔掩码
+    def changed(
+        self, data: pd.DataFrame = None, hashes: Tuple[np.ndarray, np.ndarray] = None
+    ) -> np.ndarray:
+        keys, rows = hashes if hashes is not None else self.hashes(data)
+        with self._lock:
+            positions = self._fingerprints.index.get_indexer(keys)
+            stored = self._fingerprints.to_numpy()
+        mask = positions < 0
+        found = ~mask
+        mask[found] = stored[positions[found]] != rows[found]
+        return mask
+
+    # 登记已写入的数据, 也可用服务器上的现有数据初始化索引
+    def update(
+        self, data: pd.DataFrame = None, hashes: Tuple[np.ndarray, np.ndarray] = None
+    ):
+        keys, rows = hashes if hashes is not None else self.hashes(data)
+        fresh = pd.Series(rows, index=pd.Index(keys, dtype=np.uint64))
+        fresh = fresh[~fresh.index.duplicated(keep="last")]
+        with self._lock:
+            current = self._fingerprints
+            kept = current[~current.index.isin(fresh.index)]
+            self._fingerprints = pd.concat([kept, fresh])
+        if self.path is not None:
+            self.save()
+
+    def clear(self):
+        with self._lock:
+            self._fingerprints = self._fingerprints.iloc[:0]
+        if self.path is not None:
+            self.save()
+
+    def save(self, path: str | Path = None):
+        path = Path(path).expanduser() if path is not None else self.path
+        if path is None:
+            raise ValueError("未指定保存路径")
+        with self._lock:
+            keys = self._fingerprints.index.to_numpy()
+            rows = self._fingerprints.to_numpy()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, key_cols=np.array(self.key_cols), keys=keys, rows=rows)
+        os.replace(tmp, path)
+
+    def _load(self):
+        with np.load(self.path) as stored:
+            key_cols = list(stored["key_cols"])
+            if key_cols != self.key_cols:
+                logger.warning(
+                    f"指纹索引 {self.path} 的键列 {key_cols} 与 {self.key_cols} 不一致, 忽略已保存的索引"
+                )
+                return
+            self._fingerprints = pd.Series(
+                stored["rows"], index=pd.Index(stored["keys"], dtype=np.uint64)
+            )
@@ -0,0 +1,250 @@
+import functools
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+from ddbtools.log import logger
+
+# 调用耗时统计: 默认关闭, 关闭时每次调用只多一次布尔判断
+# 开启后记录每次服务器往返与客户端处理阶段的耗时、行数与字节数,
+# 按操作名汇总为延迟直方图, 并依次调用已注册的钩子
+
+_enabled = False
+_hooks: List[Callable[["Span"], None]] = []
+_histograms: Dict[str, "Histogram"] = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class Span:
+    op: str
+    seconds: float
+    rows: int = None
+    nbytes: int = None
+    error: str = None
+
+
+# 以 2 为底按微秒分桶的延迟直方图
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.rows = 0
+        self.nbytes = 0
+        self.buckets: Dict[int, int] = {}
+
+    def add(self, span: Span):
+        self.count += 1
+        self.total += span.seconds
+        self.min = min(self.min, span.seconds)
+        self.max = max(self.max, span.seconds)
+        self.rows += span.rows or 0
+        self.nbytes += span.nbytes or 0
+        if span.error is not None:
+            self.errors += 1
+        bucket = max(int(span.seconds * 1e6), 1).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    # 近似分位数, 返回所在桶的上界(秒)
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+
+def _record(span: Span):
+    with _lock:
+        histogram = _histograms.get(span.op)
+        if histogram is None:
+            histogram = _histograms[span.op] = Histogram()
+        histogram.add(span)
+        hooks = list(_hooks)
+    for hook in hooks:
+        try:
+            hook(span)
+        except Exception as e:
+            logger.warning(f"统计钩子执行失败: {e}")
+
+
+def _measure(result):
+    rows = nbytes = None
+    if hasattr(result, "memory_usage") and hasattr(result, "__len__"):
+        rows = len(result)
+        usage = result.memory_usage(index=False, deep=False)
+        nbytes = int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    elif hasattr(result, "num_rows") and hasattr(result, "nbytes"):
+        rows, nbytes = result.num_rows, result.nbytes
+    return rows, nbytes
+
+
+class _ActiveSpan:
+    __slots__ = ("op", "start", "rows", "nbytes")
+
+    def __init__(self, op: str):
+        self.op = op
+        self.rows = None
+        self.nbytes = None
+
+    # 记录本次调用处理的数据量, 传入 DataFrame/Series 时自动统计行数与字节数
+    def set(self, result=None, rows: int = None, nbytes: int = None):
+        if result is not None:
+            self.rows, self.nbytes = _measure(result)
+        if rows is not None:
+            self.rows = rows
+        if nbytes is not None:
+            self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _record(
+            Span(
+                op=self.op,
+                seconds=time.perf_counter() - self.start,
+                rows=self.rows,
+                nbytes=self.nbytes,
+                error=None if exc is None else repr(exc),
+            )
+        )
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, result=None, rows: int = None, nbytes: int = None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+# 统计一段代码的耗时: with span("crud.get.toDF") as sp: df = ...; sp.set(df)
+def span(op: str):
+    if not _enabled:
+        return _NULL_SPAN
+    return _ActiveSpan(op)
+
+
+# 统计整个函数的耗时, 返回值为 DataFrame 时同时统计行数与字节数
+def timed(op: str):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _ActiveSpan(op) as active:
+                result = fn(*args, **kwargs)
+                active.set(result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def enable(log: bool = False):
+    global _enabled
+    _enabled = True
+    if log and log_hook not in _hooks:
+        add_hook(log_hook)
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def add_hook(hook: Callable[[Span], None]):
+    with _lock:
+        _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[Span], None]):
+    with _lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+# 输出到 ddbtools.log 的钩子
+def log_hook(span: Span):
+    message = f"{span.op} 耗时 {span.seconds * 1000:.2f}ms"
+    if span.rows is not None:
+        message += f", {span.rows} 行"
+    if span.nbytes is not None:
+        message += f", {span.nbytes} 字节"
+    if span.error is not None:
+        logger.warning(message + f", 失败: {span.error}")
+    else:
+        logger.debug(message)
+
+
+def histograms() -> Dict[str, Histogram]:
+    with _lock:
+        return dict(_histograms)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+# 按操作汇总的统计表
+def report():
+    import pandas as pd
+
+    rows = []
+    for op, histogram in sorted(histograms().items()):
+        rows.append(
+            {
+                "op": op,
+                "count": histogram.count,
+                "errors": histogram.errors,
+                "total": histogram.total,
+                "mean": histogram.total / histogram.count,
+                "p50": histogram.quantile(0.5),
+                "p90": histogram.quantile(0.9),
+                "p99": histogram.quantile(0.99),
+                "max": histogram.max,
+                "rows": histogram.rows,
+                "bytes": histogram.nbytes,
+            }
+        )
+    return pd.DataFrame(
+        rows,
+        columns=[
+            "op",
+            "count",
+            "errors",
+            "total",
+            "mean",
+            "p50",
+            "p90",
+            "p99",
+            "max",
+            "rows",
+            "bytes",
+        ],
+    ).set_index("op")
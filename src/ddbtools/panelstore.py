@@ -0,0 +1,271 @@
+import json
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List
+import numpy as np
+import pandas as pd
+from ddbtools.crud import AttributePanel
+from ddbtools.log import logger
+
+_VALUES = "values.f8"
+_DATES = "dates.npy"
+_CODES = "codes.json"
+_ATTRIBUTES = "attributes.json"
+_META = "meta.json"
+_CURRENT = "current.json"
+_LOCK = "write.lock"
+_GENERATION = re.compile(r"^gen-(\d+)$")
+
+
+# 把面板重新排列到给定的代码与属性轴上, 不存在的位置为 NaN
+def _align(panel: AttributePanel, codes: np.ndarray, attributes: List[str]) -> np.ndarray:
+    if list(panel.codes) == list(codes) and list(panel.attributes) == list(attributes):
+        return np.ascontiguousarray(panel.values, dtype=np.float64)
+    values = np.full((len(panel.dates), len(codes), len(attributes)), np.nan)
+    j = pd.Index(codes).get_indexer(panel.codes)
+    k = pd.Index(attributes).get_indexer(panel.attributes)
+    values[:, j[:, None], k[None, :]] = panel.values
+    return values
+
+
+def _write_json(path: Path, payload):
+    path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+
+
+# 跨进程的写入锁, 同一目录同时只有一个写入者
+@contextmanager
+def _file_lock(path: Path):
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# 新一代的取值文件沿用上一代的数据: 优先硬链接, 文件系统不支持时复制
+# 已发布的行不会被修改, 硬链接后只在末尾追加, 截断到 size 去掉中断的写入留下的尾部
+def _link_values(source: Path, target: Path, size: int):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+    os.truncate(target, size)
+
+
+# 本地内存映射面板: 取值以 float64 (时间, 代码, 属性) 连续存放在 values.f8 中,
+# 日期、代码与属性分别保存在 dates.npy、codes.json、attributes.json, meta.json 记录形状
+# 每次写入生成新的一代目录 gen-N, 写完后原子替换 current.json 指向它, 读取方只会看到完整的一代
+# 写入方之间用 write.lock 文件锁互斥; 保留上一代供正在读取的进程使用, 更早的目录会被删除
+# 多个进程以只读方式打开同一份文件, 通过操作系统页缓存共享数据
+class PanelStore:
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _writer_lock(self):
+        return _file_lock(self.directory / _LOCK)
+
+    # 当前一代的目录; 旧版本没有 current.json, 文件直接位于 directory 下
+    def _current(self) -> Path | None:
+        try:
+            current = json.loads((self.directory / _CURRENT).read_text(encoding="utf-8"))
+            return self.directory / current["generation"]
+        except FileNotFoundError:
+            pass
+        if (self.directory / _META).exists():
+            return self.directory
+        return None
+
+    def _generations(self) -> List[int]:
+        return sorted(
+            int(match.group(1))
+            for match in (_GENERATION.match(path.name) for path in self.directory.iterdir())
+            if match
+        )
+
+    def _new_generation(self) -> Path:
+        generations = self._generations()
+        path = self.directory / f"gen-{(generations[-1] + 1 if generations else 0):06d}"
+        path.mkdir()
+        return path
+
+    # 原子替换 current.json, 然后删除上一代之前的目录
+    def _publish(self, generation: Path):
+        tmp = self.directory / (_CURRENT + ".tmp")
+        _write_json(tmp, {"generation": generation.name})
+        os.replace(tmp, self.directory / _CURRENT)
+        number = int(_GENERATION.match(generation.name).group(1))
+        for old in self._generations():
+            if old < number - 1:
+                shutil.rmtree(self.directory / f"gen-{old:06d}", ignore_errors=True)
+
+    def exists(self) -> bool:
+        return self._current() is not None
+
+    def _axes(self, generation: Path):
+        meta = json.loads((generation / _META).read_text(encoding="utf-8"))
+        n_dates = meta["shape"][0]
+        dates = np.load(generation / _DATES)[:n_dates]
+        codes = np.array(
+            json.loads((generation / _CODES).read_text(encoding="utf-8")), dtype=object
+        )
+        attributes = json.loads((generation / _ATTRIBUTES).read_text(encoding="utf-8"))
+        return tuple(meta["shape"]), dates, codes, attributes
+
+    # 在新一代目录中写入日期、代码、属性与形状; 取值文件由调用方写好
+    def _finish(self, generation: Path, shape, dates, codes, attributes):
+        with open(generation / _DATES, "wb") as f:
+            np.save(f, np.asarray(dates).astype("datetime64[ns]"))
+        _write_json(generation / _CODES, [str(code) for code in codes])
+        _write_json(generation / _ATTRIBUTES, [str(attr) for attr in attributes])
+        _write_json(generation / _META, {"shape": list(shape), "dtype": "float64"})
+        self._publish(generation)
+
+    # 全量写入, 覆盖已有数据
+    def write(self, panel: AttributePanel | pd.DataFrame):
+        if isinstance(panel, pd.DataFrame):
+            panel = AttributePanel.from_frame(panel)
+        with self._lock, self._writer_lock():
+            self._rewrite(panel.values, panel.dates, panel.codes, panel.attributes)
+
+    def _rewrite(self, values, dates, codes, attributes):
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        generation = self._new_generation()
+        values.tofile(generation / _VALUES)
+        self._finish(generation, values.shape, dates, codes, attributes)
+
+    # 追加新的日期; 已有日期只覆盖新面板包含的代码与属性
+    # 代码与属性与已有数据一致或为其子集时新一代沿用已有的取值文件并追加到末尾(覆盖已有日期时复制),
+    # 出现新的代码或属性时重写整个文件
+    def append(self, panel: AttributePanel | pd.DataFrame):
+        if isinstance(panel, pd.DataFrame):
+            panel = AttributePanel.from_frame(panel)
+        with self._lock, self._writer_lock():
+            current = self._current()
+            if current is None:
+                self._rewrite(panel.values, panel.dates, panel.codes, panel.attributes)
+                return
+            shape, dates, codes, attributes = self._axes(current)
+            new_codes = pd.Index(panel.codes).difference(pd.Index(codes))
+            new_attributes = [a for a in panel.attributes if a not in attributes]
+            if len(new_codes) or new_attributes:
+                self._merge(panel, shape, dates, codes, attributes, new_codes, new_attributes)
+                return
+
+            values = _align(panel, codes, attributes)
+            panel_dates = np.asarray(panel.dates, dtype="datetime64[ns]")
+            existing = np.isin(panel_dates, dates)
+            fresh = ~existing
+            # 先检查再写入, 避免拒绝追加时留下新的一代
+            if fresh.any() and len(dates) and panel_dates[fresh].min() <= dates[-1]:
+                raise ValueError("追加的日期必须晚于已有的最后一个日期")
+            if not len(panel_dates):
+                return
+
+            generation = self._new_generation()
+            target = generation / _VALUES
+            size = int(np.prod(shape)) * 8
+            if existing.any():
+                # 已发布的文件可能正被其他进程映射, 复制后再覆盖
+                shutil.copyfile(current / _VALUES, target)
+                os.truncate(target, size)
+                # 只覆盖新面板包含的代码与属性, 其余位置保持不变
+                i = np.searchsorted(dates, panel_dates[existing])
+                j = pd.Index(codes).get_indexer(panel.codes)
+                k = pd.Index(attributes).get_indexer(panel.attributes)
+                stored = np.memmap(target, np.float64, "r+", shape=shape)
+                stored[np.ix_(i, j, k)] = np.asarray(panel.values)[existing]
+                stored.flush()
+                del stored
+            else:
+                _link_values(current / _VALUES, target, size)
+            if fresh.any():
+                with open(target, "ab") as f:
+                    np.ascontiguousarray(values[fresh]).tofile(f)
+            self._finish(
+                generation,
+                (shape[0] + int(fresh.sum()), *shape[1:]),
+                np.concatenate([dates, panel_dates[fresh]]),
+                codes,
+                attributes,
+            )
+
+    def _merge(self, panel, shape, dates, codes, attributes, new_codes, new_attributes):
+        codes = np.sort(np.concatenate([codes, np.asarray(new_codes, dtype=object)]))
+        attributes = list(attributes) + new_attributes
+        old = self.read()
+        all_dates = np.union1d(dates, np.asarray(panel.dates, dtype="datetime64[ns]"))
+        values = np.full((len(all_dates), len(codes), len(attributes)), np.nan)
+        for part in (old, panel):
+            i = np.searchsorted(all_dates, np.asarray(part.dates, dtype="datetime64[ns]"))
+            values[i] = _align(part, codes, attributes)
+        del old
+        logger.info(f"面板 {self.directory} 出现新的代码或属性, 重写全部数据")
+        self._rewrite(values, all_dates, codes, attributes)
+
+    # 按日期范围(闭区间)、代码与属性读取; 返回的 values 为只读内存映射
+    # 日期范围、连续的代码与单个属性是零拷贝视图, 任意代码或属性集合只复制选中的部分
+    def read(
+        self,
+        start=None,
+        end=None,
+        codes: List[str] = None,
+        attributes: str | List[str] = None,
+    ) -> AttributePanel:
+        generation = self._current()
+        if generation is None:
+            raise FileNotFoundError(f"面板 {self.directory} 不存在")
+        shape, dates, all_codes, all_attributes = self._axes(generation)
+        values = np.memmap(generation / _VALUES, np.float64, "r", shape=shape)
+
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), "left")
+        hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), "right")
+        values, dates = values[lo:hi], dates[lo:hi]
+
+        if codes is not None:
+            j = pd.Index(all_codes).get_indexer(list(codes))
+            if (j < 0).any():
+                raise KeyError(f"代码不存在: {list(np.asarray(codes, dtype=object)[j < 0])}")
+            if len(j) and (np.diff(j) == 1).all():
+                values = values[:, j[0] : j[-1] + 1]
+            else:
+                values = values[:, j]
+            all_codes = all_codes[j]
+
+        if attributes is not None:
+            if isinstance(attributes, str):
+                attributes = [attributes]
+            k = pd.Index(all_attributes).get_indexer(attributes)
+            if (k < 0).any():
+                raise KeyError(f"属性不存在: {[a for a, i in zip(attributes, k) if i < 0]}")
+            if len(k) == 1:
+                values = values[:, :, k[0] : k[0] + 1]
+            else:
+                values = values[..., k]
+            all_attributes = list(attributes)
+
+        return AttributePanel(values, dates, all_codes, list(all_attributes))
@@ -0,0 +1,117 @@
+from dataclasses import dataclass
+from typing import List
+import numpy as np
+import pandas as pd
+import dolphindb as ddb
+from ddbtools.dbmanip import get_db_info
+from ddbtools.tablemanip import get_table_info
+
+# 可以在本地确定每行所属分区的分区类型
+_SUPPORTED = ("VALUE", "RANGE", "LIST", "HASH")
+
+
+def _names(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value]
+
+
+# 时间类型统一为纳秒后比较
+def _as_datetime(values: np.ndarray, partitions: np.ndarray):
+    if partitions.dtype.kind == "M" and values.dtype.kind == "M":
+        return values.astype("datetime64[ns]"), partitions.astype("datetime64[ns]")
+    return values, partitions
+
+
+# 表的分区方案: 每一层的分区列、分区类型(VALUE/RANGE/LIST/HASH/SEQ)、分区定义与列类型
+# 与 schema(database(db_path)) 的 partitionTypeName/partitionSchema 一一对应, 组合分区有多层
+@dataclass
+class PartitionScheme:
+    columns: List[str]
+    types: List[str]
+    schemas: list
+    col_types: List[str]
+
+    # 能否在本地确定 columns 中的数据所属的分区
+    def supported(self, columns=None) -> bool:
+        return (
+            bool(self.columns)
+            and len(self.columns) == len(self.types) == len(self.schemas)
+            and all(kind in _SUPPORTED for kind in self.types)
+            and (columns is None or all(col in columns for col in self.columns))
+        )
+
+    def describe(self) -> str:
+        return ", ".join(f"{col}: {kind}" for col, kind in zip(self.columns, self.types))
+
+    # 每行所属物理分区的编号(0 起连续编号), 同一分区的行编号相同
+    # HASH 分区在服务器端用 hashBucket 计算, 需要传入 session
+    def partition_ids(self, data: pd.DataFrame, session: ddb.Session = None) -> np.ndarray:
+        if not self.supported(data.columns):
+            raise ValueError(f"无法在本地确定分区: {self.describe() or '未分区'}")
+        levels = {
+            i: _level_ids(kind, schema, col_type, data[col], session)
+            for i, (col, kind, schema, col_type) in enumerate(
+                zip(self.columns, self.types, self.schemas, self.col_types)
+            )
+        }
+        return (
+            pd.DataFrame(levels)
+            .groupby(list(levels), sort=False, dropna=False)
+            .ngroup()
+            .to_numpy()
+        )
+
+
+def _level_ids(kind: str, schema, col_type: str, values: pd.Series, session) -> np.ndarray:
+    raw = values.to_numpy()
+    if kind == "VALUE":
+        # 时间列先按分区的时间单位取整, 例如 TIMESTAMP 列写入按 DATE 分区的数据库
+        partitions = np.asarray(schema)
+        if partitions.dtype.kind == "M" and raw.dtype.kind == "M":
+            raw = raw.astype(partitions.dtype)
+        return pd.factorize(raw)[0]
+    if kind == "RANGE":
+        # 分区 i 为 [schema[i], schema[i+1])
+        raw, bounds = _as_datetime(raw, np.asarray(schema))
+        return np.searchsorted(bounds, raw, side="right") - 1
+    if kind == "LIST":
+        groups = [np.asarray(group) for group in schema]
+        members = np.concatenate(groups)
+        owner = np.repeat(np.arange(len(groups)), [len(group) for group in groups])
+        raw, members = _as_datetime(raw, members)
+        positions = pd.Index(members).get_indexer(raw)
+        return np.where(positions >= 0, owner[positions], -1)
+    if session is None:
+        raise ValueError("HASH 分区需要 session 计算 hashBucket")
+    inverse, uniques = pd.factorize(raw)
+    name = "ddbtools_partition_values"
+    session.upload({name: np.asarray(uniques)})
+    try:
+        buckets = session.run(f"hashBucket(cast({name}, {col_type}), {int(schema)})")
+    finally:
+        session.undef(name, "VAR")
+    return np.asarray(buckets)[inverse]
+
+
+# 读取表的分区方案
+def get_partition_scheme(
+    session: ddb.Session, db_path: str, table_name: str
+) -> PartitionScheme:
+    table_info = get_table_info(session, db_path, table_name)
+    db_info = get_db_info(session, db_path)
+    columns = _names(table_info["partition_columns"])
+    col_types = table_info["col_defs"]["typeString"]
+    types = db_info["partitionTypeName"]
+    schemas = db_info.get("partitionSchema")
+    # 单层分区的 partitionSchema 就是该层的定义(LIST 分区本身也是列表), 组合分区为各层定义的列表
+    if isinstance(types, str):
+        types, schemas = [types], [schemas]
+    return PartitionScheme(
+        columns=columns,
+        types=[str(kind) for kind in types],
+        schemas=list(schemas) if schemas is not None else [],
+        col_types=[str(col_types.get(col)) for col in columns],
+    )
@@ -0,0 +1,228 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Literal
+import pandas as pd
+import dolphindb as ddb
+from ddbtools.log import logger
+from ddbtools.instrument import span
+from ddbtools.tablemanip import (
+    DbColumn,
+    _ATTRIBUTE_TABLE_OPTIONS,
+    _add_columns_script,
+    _attribute_table_columns,
+    _create_table_script,
+    _drop_table_script,
+    schema_cache,
+)
+
+
+@dataclass
+class _PlanStep:
+    action: str
+    db_name: str
+    table_name: str
+    columns: List[DbColumn] = None
+    options: Dict[str, str] = field(default_factory=dict)
+
+
+# 批量表结构变更: 先登记所有建表、加列、删表操作, apply 时
+# 一次查询检查所有表是否存在及已有列, 再把需要执行的变更合并为一个脚本执行
+# 每个操作在服务器端单独 try/catch, 返回逐项结果报告
+class SchemaPlan:
+    def __init__(self):
+        self.steps: List[_PlanStep] = []
+
+    def __len__(self):
+        return len(self.steps)
+
+    def create_table(
+        self,
+        db_name: str,
+        table_name: str,
+        columns: DbColumn | List[DbColumn],
+        partition_by: str = None,
+        sortColumns: str = None,
+        keepDuplicates: Literal["ALL", "LAST", "FIRST"] = None,
+        sortKeyMappingFunction: str = None,
+    ):
+        options = dict(
+            partition_by=partition_by,
+            sortColumns=sortColumns,
+            keepDuplicates=keepDuplicates,
+            sortKeyMappingFunction=sortKeyMappingFunction,
+        )
+        self.steps.append(
+            _PlanStep("create_table", db_name, table_name, _as_columns(columns), options)
+        )
+        return self
+
+    def create_dimensional_table(
+        self,
+        db_name: str,
+        table_name: str,
+        columns: DbColumn | List[DbColumn],
+        partition_by: str = None,
+    ):
+        return self.create_table(db_name, table_name, columns, partition_by)
+
+    def create_attribute_table(
+        self,
+        db_name: str,
+        table_name: str,
+        code_dtype: str = "SYMBOL",
+        attr_dtype: str = "DOUBLE",
+        dt_dtype: str = "DATE",
+    ):
+        return self.create_table(
+            db_name,
+            table_name,
+            _attribute_table_columns(code_dtype, attr_dtype, dt_dtype),
+            **_ATTRIBUTE_TABLE_OPTIONS,
+        )
+
+    # 只添加表中尚不存在的列
+    def add_columns(
+        self, db_name: str, table_name: str, columns: DbColumn | List[DbColumn]
+    ):
+        self.steps.append(
+            _PlanStep("add_columns", db_name, table_name, _as_columns(columns))
+        )
+        return self
+
+    def delete_table(self, db_name: str, table_name: str):
+        self.steps.append(_PlanStep("delete_table", db_name, table_name))
+        return self
+
+    def _targets(self) -> List[tuple]:
+        return list(dict.fromkeys((step.db_name, step.table_name) for step in self.steps))
+
+    # 一次查询返回每张表是否存在及已有列名, 不存在的表为 None
+    # 检查在匿名函数中进行, 不在 session 中留下变量
+    def _existing(self, session: ddb.Session) -> Dict[tuple, set]:
+        targets = self._targets()
+        dbs = ", ".join(f'"{db_name}"' for db_name, _ in targets)
+        tables = ", ".join(f'"{table_name}"' for _, table_name in targets)
+        script = f"""
+            loop(def(db, tb) {{
+                if (existsTable(db, tb)) {{
+                    return [true, schema(loadTable(db, tb)).colDefs.name]
+                }}
+                return [false, array(STRING, 0)]
+            }}, [{dbs}], [{tables}])
+        """
+        with span("plan.check"):
+            results = session.run(script)
+        return {
+            target: set(names) if flag else None
+            for target, (flag, names) in zip(targets, results)
+        }
+
+    # 按登记顺序推演每个操作: 返回 (报告行, 每行对应的脚本, 无需执行时为 None)
+    def _resolve(self, existing: Dict[tuple, set]):
+        state = dict(existing)
+        rows, scripts = [], []
+        for step in self.steps:
+            target = (step.db_name, step.table_name)
+            current = state.get(target)
+            row = {
+                "db_name": step.db_name,
+                "table_name": step.table_name,
+                "action": step.action,
+                "columns": "",
+            }
+            script = None
+            if step.action == "create_table":
+                row["columns"] = ", ".join(col.name for col in step.columns)
+                if current is not None:
+                    row["message"] = f"在数据库 {step.db_name} 下表 {step.table_name} 已存在,跳过"
+                else:
+                    script = _create_table_script(
+                        step.db_name, step.table_name, step.columns, **step.options
+                    )
+                    row["message"] = f"在数据库 {step.db_name} 下创建表 {step.table_name} 成功"
+                    state[target] = {col.name for col in step.columns}
+            elif step.action == "add_columns":
+                if current is None:
+                    row["columns"] = ", ".join(col.name for col in step.columns)
+                    row["message"] = f"在数据库 {step.db_name} 下表 {step.table_name} 不存在"
+                    row["status"] = "failed"
+                else:
+                    missing = [col for col in step.columns if col.name not in current]
+                    row["columns"] = ", ".join(col.name for col in missing)
+                    if not missing:
+                        row["message"] = f"在数据库 {step.db_name} 下表 {step.table_name} 的列均已存在,跳过"
+                    else:
+                        script = _add_columns_script(step.db_name, step.table_name, missing)
+                        row["message"] = (
+                            f"在数据库 {step.db_name} 下表 {step.table_name} "
+                            f"添加列 {row['columns']} 成功"
+                        )
+                        state[target] = current | {col.name for col in missing}
+            else:
+                if current is None:
+                    row["message"] = f"在数据库 {step.db_name} 下表 {step.table_name} 不存在,跳过"
+                else:
+                    script = _drop_table_script(step.db_name, step.table_name)
+                    row["message"] = f"在数据库 {step.db_name} 下删除表 {step.table_name} 成功"
+                    state[target] = None
+            row.setdefault("status", "skipped" if script is None else "applied")
+            rows.append(row)
+            scripts.append(script)
+        return rows, scripts
+
+    # 合并后的脚本: 每个操作单独 try/catch, 返回各操作的错误信息(成功为空字符串)
+    # 错误信息保存在 _ERRORS 变量中, 执行后由 apply 释放
+    _ERRORS = "ddbtools_plan_errors"
+
+    @classmethod
+    def _combined_script(cls, scripts: List[str]) -> str:
+        blocks = [f"{cls._ERRORS} = array(STRING, {len(scripts)})"]
+        for i, script in enumerate(scripts):
+            blocks.append(
+                f"try {{\n{script}\n}} catch(ex) {{\n"
+                f"    {cls._ERRORS}[{i}] = ex[1]\n}}"
+            )
+        blocks.append(cls._ERRORS)
+        return "\n".join(blocks)
+
+    # 执行变更, 共两次脚本往返, 之后释放合并脚本的错误信息变量; dry_run=True 时只检查并返回将要执行的操作
+    # 报告列: db_name, table_name, action, columns, status(applied/skipped/failed/planned), message
+    # 合并后的脚本保存在 report.attrs["script"]
+    def apply(self, session: ddb.Session, dry_run: bool = False) -> pd.DataFrame:
+        columns = ["db_name", "table_name", "action", "columns", "status", "message"]
+        if not self.steps:
+            return pd.DataFrame(columns=columns)
+
+        rows, scripts = self._resolve(self._existing(session))
+        pending = [i for i, script in enumerate(scripts) if script is not None]
+        combined = self._combined_script([scripts[i] for i in pending])
+
+        if dry_run:
+            for i in pending:
+                rows[i]["status"] = "planned"
+        elif pending:
+            with span("plan.apply"):
+                try:
+                    errors = session.run(combined)
+                finally:
+                    session.undef(self._ERRORS, "VAR")
+            for i, error in zip(pending, errors):
+                if error:
+                    rows[i]["status"] = "failed"
+                    rows[i]["message"] = str(error)
+            for i in pending:
+                schema_cache.invalidate(rows[i]["db_name"], rows[i]["table_name"])
+
+        report = pd.DataFrame(rows, columns=columns)
+        report.attrs["script"] = combined
+        counts = report["status"].value_counts().to_dict()
+        logger.info(
+            f"表结构变更完成: 共 {len(report)} 项, "
+            + ", ".join(f"{status} {count}" for status, count in counts.items())
+        )
+        return report
+
+
+def _as_columns(columns: DbColumn | List[DbColumn]) -> List[DbColumn]:
+    if isinstance(columns, DbColumn):
+        return [columns]
+    return list(columns)
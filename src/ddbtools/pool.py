@@ -0,0 +1,189 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List
+import dolphindb as ddb
+from ddbtools.log import logger
+
+
+@dataclass
+class PoolStats:
+    size: int
+    max_concurrency: int
+    queued: int
+    in_flight: int
+    completed: int
+    failed: int
+    avg_latency: float
+    max_latency: float
+
+
+# 一组可复用的 Session, 任务在线程池中并发执行, 每个任务独占一个 Session
+class SessionPool:
+    def __init__(
+        self,
+        session_factory: Callable[[], ddb.Session],
+        size: int = 4,
+        max_concurrency: int = None,
+    ):
+        if size < 1:
+            raise ValueError("size 必须大于 0")
+        self.size = size
+        self.session_factory = session_factory
+        self.max_concurrency = min(max_concurrency or size, size)
+        self._sessions: queue.Queue = queue.Queue()
+        self._all_sessions: List[ddb.Session] = []
+        for _ in range(size):
+            session = session_factory()
+            self._all_sessions.append(session)
+            self._sessions.put(session)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="ddbtools-pool"
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        self._closed = False
+
+    @classmethod
+    def connect(
+        cls,
+        host: str,
+        port: int,
+        userid: str = "",
+        password: str = "",
+        size: int = 4,
+        max_concurrency: int = None,
+        **session_kwargs,
+    ):
+        def factory():
+            session = ddb.Session(**session_kwargs)
+            session.connect(host, port, userid, password)
+            return session
+
+        return cls(factory, size=size, max_concurrency=max_concurrency)
+
+    # 借出一个 Session, 用完后归还
+    @contextmanager
+    def session(self):
+        session = self._sessions.get()
+        try:
+            yield session
+        finally:
+            self._sessions.put(session)
+
+    def _run(self, fn: Callable, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+        start = time.perf_counter()
+        failed = False
+        try:
+            with self.session() as session:
+                return fn(session, *args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._in_flight -= 1
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                self._total_latency += elapsed
+                self._max_latency = max(self._max_latency, elapsed)
+
+    # 提交任务, fn 的第一个参数为 Session
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        if self._closed:
+            raise RuntimeError("连接池已关闭")
+        with self._lock:
+            self._queued += 1
+        try:
+            future = self._executor.submit(self._run, fn, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+            raise
+        future.add_done_callback(self._on_done)
+        return future
+
+    # 尚未开始执行就被取消的任务不会进入 _run, 在此处修正排队计数
+    def _on_done(self, future: Future):
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    # 按顺序返回每组参数的执行结果
+    def map(self, fn: Callable, kwargs_list: Iterable[Dict[str, Any]]) -> List:
+        futures = [self.submit(fn, **kwargs) for kwargs in kwargs_list]
+        return [future.result() for future in futures]
+
+    def stats(self) -> PoolStats:
+        with self._lock:
+            finished = self._completed + self._failed
+            return PoolStats(
+                size=self.size,
+                max_concurrency=self.max_concurrency,
+                queued=self._queued,
+                in_flight=self._in_flight,
+                completed=self._completed,
+                failed=self._failed,
+                avg_latency=self._total_latency / finished if finished else 0.0,
+                max_latency=self._max_latency,
+            )
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        for session in self._all_sessions:
+            try:
+                session.close()
+            except Exception as e:
+                logger.warning(f"关闭连接失败: {e}")
+        logger.info(f"连接池已关闭, 共 {self.size} 个连接")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# 在连接池上并发执行 BaseCRUD 的 get/upsert/delete, 返回 Future
+class PooledCRUD:
+    def __init__(self, crud, pool: SessionPool):
+        self.crud = crud
+        self.pool = pool
+
+    def get(self, conds=None, panel=True) -> Future:
+        return self.pool.submit(self.crud.get, conds=conds, panel=panel)
+
+    def upsert(self, data) -> Future:
+        return self.pool.submit(self.crud.upsert, data)
+
+    def delete(self, **kwargs) -> Future:
+        return self.pool.submit(self.crud.delete, **kwargs)
+
+    # 并发执行多组查询, 结果与 conds_list 顺序一致
+    def get_many(self, conds_list: Iterable, panel=True) -> List:
+        return self.pool.map(
+            self.crud.get, [{"conds": conds, "panel": panel} for conds in conds_list]
+        )
+
+    # 并发写入多个 DataFrame
+    def upsert_many(self, frames: Iterable) -> None:
+        futures = [self.upsert(data) for data in frames]
+        for future in futures:
+            future.result()
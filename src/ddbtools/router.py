@@ -0,0 +1,327 @@
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Literal, Tuple
+import pandas as pd
+import dolphindb as ddb
+from ddbtools.crud import BaseCRUD
+from ddbtools.dbmanip import get_all_dbs, get_catalog
+from ddbtools.log import logger
+from ddbtools.pool import SessionPool
+from ddbtools.tablemanip import get_all_tables, get_table_columns, get_table_info
+
+
+@dataclass
+class NodeStats:
+    name: str
+    primary: bool
+    healthy: bool
+    outstanding: int
+    completed: int
+    failed: int
+    avg_latency: float
+    max_latency: float
+    check_latency: float
+
+
+class _Node:
+    def __init__(self, name: str, pool: SessionPool):
+        self.name = name
+        self.pool = pool
+        self.healthy = True
+        self.outstanding = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.check_latency = float("nan")
+        # 健康检查使用单独的会话, 不经过 pool 的任务队列
+        self.health_session: ddb.Session = None
+        self.health_lock = threading.Lock()
+
+    # 在健康检查会话上执行 1+1; 节点忙碌时不会因为排队而超时
+    def ping(self):
+        if not self.health_lock.acquire(blocking=False):
+            raise TimeoutError("上一次健康检查尚未结束")
+        try:
+            if self.health_session is None:
+                self.health_session = self.pool.session_factory()
+            return self.health_session.run("1+1")
+        finally:
+            self.health_lock.release()
+
+    def close_health_session(self):
+        if self.health_session is None:
+            return
+        try:
+            self.health_session.close()
+        except Exception as e:
+            logger.warning(f"关闭节点 {self.name} 的健康检查连接失败: {e}")
+        self.health_session = None
+
+
+# 在多个节点的 SessionPool 之间路由请求: 只读请求按策略分散到健康的节点,
+# 写入与 DDL 固定发往主节点 primary(默认为第一个节点)
+# policy: least_outstanding 选择未完成请求最少的节点, round_robin 轮流选择
+class Router:
+    def __init__(
+        self,
+        pools: Dict[str, SessionPool],
+        primary: str = None,
+        policy: Literal["least_outstanding", "round_robin"] = "least_outstanding",
+        read_from_primary: bool = True,
+    ):
+        if not pools:
+            raise ValueError("至少需要一个节点")
+        if policy not in ("least_outstanding", "round_robin"):
+            raise ValueError(f"不支持的路由策略: {policy}")
+        self._nodes = {name: _Node(name, pool) for name, pool in pools.items()}
+        self.primary = primary if primary is not None else next(iter(pools))
+        if self.primary not in self._nodes:
+            raise ValueError(f"主节点 {self.primary} 不在节点列表中")
+        self.policy = policy
+        self.read_from_primary = read_from_primary
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._stop = threading.Event()
+        self._checker: threading.Thread = None
+        self._health_executor = ThreadPoolExecutor(
+            max_workers=len(self._nodes), thread_name_prefix="ddbtools-router-ping"
+        )
+
+    # nodes 为 "host:port" 或 (host, port), 每个节点创建一个 size 大小的 SessionPool
+    @classmethod
+    def connect(
+        cls,
+        nodes: Iterable[str | Tuple[str, int]],
+        userid: str = "",
+        password: str = "",
+        size: int = 2,
+        primary: str = None,
+        policy: Literal["least_outstanding", "round_robin"] = "least_outstanding",
+        read_from_primary: bool = True,
+        **session_kwargs,
+    ):
+        pools = {}
+        try:
+            for node in nodes:
+                host, port = node.rsplit(":", 1) if isinstance(node, str) else node
+                pools[f"{host}:{port}"] = SessionPool.connect(
+                    host, int(port), userid, password, size=size, **session_kwargs
+                )
+        except BaseException:
+            for pool in pools.values():
+                pool.close()
+            raise
+        return cls(pools, primary, policy, read_from_primary)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def _read_candidates(self) -> List[_Node]:
+        candidates = [
+            node
+            for node in self._nodes.values()
+            if node.healthy and (self.read_from_primary or node.name != self.primary)
+        ]
+        if not candidates:
+            # 从节点都不可用时退回主节点
+            primary = self._nodes[self.primary]
+            candidates = [primary] if primary.healthy else []
+        if not candidates:
+            raise RuntimeError("没有可用的节点")
+        return candidates
+
+    def _choose(self) -> _Node:
+        with self._lock:
+            candidates = self._read_candidates()
+            offset = next(self._counter) % len(candidates)
+            rotated = candidates[offset:] + candidates[:offset]
+            if self.policy == "round_robin":
+                return rotated[0]
+            return min(rotated, key=lambda node: node.outstanding)
+
+    def _submit(self, node: _Node, fn: Callable, args, kwargs) -> Future:
+        with self._lock:
+            node.outstanding += 1
+        start = time.perf_counter()
+        try:
+            future = node.pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            with self._lock:
+                node.outstanding -= 1
+            raise
+
+        def done(future: Future):
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                node.outstanding -= 1
+                if future.cancelled():
+                    return
+                if future.exception() is None:
+                    node.completed += 1
+                else:
+                    node.failed += 1
+                node.total_latency += elapsed
+                node.max_latency = max(node.max_latency, elapsed)
+
+        future.add_done_callback(done)
+        return future
+
+    # 提交只读任务, fn 的第一个参数为 Session
+    def submit_read(self, fn: Callable, *args, **kwargs) -> Future:
+        return self._submit(self._choose(), fn, args, kwargs)
+
+    # 提交写入或 DDL 任务, 固定在主节点执行
+    def submit_write(self, fn: Callable, *args, **kwargs) -> Future:
+        node = self._nodes[self.primary]
+        if not node.healthy:
+            raise RuntimeError(f"主节点 {self.primary} 不可用")
+        return self._submit(node, fn, args, kwargs)
+
+    def read(self, fn: Callable, *args, **kwargs):
+        return self.submit_read(fn, *args, **kwargs).result()
+
+    def write(self, fn: Callable, *args, **kwargs):
+        return self.submit_write(fn, *args, **kwargs).result()
+
+    def get(self, crud: BaseCRUD, conds=None, panel=True) -> pd.DataFrame:
+        return self.read(crud.get, conds=conds, panel=panel)
+
+    def get_table_info(self, db_name: str, table_name: str, use_cache: bool = True):
+        return self.read(get_table_info, db_name, table_name, use_cache=use_cache)
+
+    def get_table_columns(
+        self, db_name: str, table_name: str, use_cache: bool = True
+    ) -> pd.DataFrame:
+        return self.read(get_table_columns, db_name, table_name, use_cache=use_cache)
+
+    def get_all_tables(self, db_name: str):
+        return self.read(get_all_tables, db_name)
+
+    def get_all_dbs(self) -> pd.DataFrame:
+        return self.read(get_all_dbs)
+
+    def get_catalog(self, with_tables: bool = True):
+        return self.read(get_catalog, with_tables=with_tables)
+
+    # 在每个节点上执行 1+1, 超时或出错的节点标记为不可用, 恢复后重新参与路由
+    # 每个节点另开一个会话执行检查, 节点只是忙碌(任务排队)时不会被判为不可用
+    def check_health(self, timeout: float = 5.0) -> List[NodeStats]:
+        checks = {}
+        for node in self._nodes.values():
+            try:
+                checks[node.name] = (time.perf_counter(), self._health_executor.submit(node.ping))
+            except Exception as e:
+                checks[node.name] = (time.perf_counter(), e)
+        for name, (start, check) in checks.items():
+            node = self._nodes[name]
+            healthy = False
+            if isinstance(check, Future):
+                try:
+                    healthy = check.result(timeout=timeout) == 2
+                except FutureTimeoutError:
+                    check.cancel()
+                    logger.warning(f"节点 {name} 健康检查超时")
+                except Exception as e:
+                    logger.warning(f"节点 {name} 健康检查失败: {e}")
+            else:
+                logger.warning(f"节点 {name} 健康检查失败: {check}")
+            with self._lock:
+                if healthy != node.healthy:
+                    logger.info(f"节点 {name} {'恢复可用' if healthy else '不可用'}")
+                node.healthy = healthy
+                node.check_latency = (
+                    time.perf_counter() - start if healthy else float("nan")
+                )
+        return self.stats()
+
+    # 启动后台线程, 每 interval 秒检查一次所有节点
+    def start_health_checks(self, interval: float = 30.0, timeout: float = 5.0):
+        if self._checker is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.check_health(timeout)
+                except Exception as e:
+                    logger.warning(f"健康检查异常: {e}")
+
+        self._stop.clear()
+        self._checker = threading.Thread(
+            target=loop, name="ddbtools-router-health", daemon=True
+        )
+        self._checker.start()
+
+    def stop_health_checks(self):
+        if self._checker is None:
+            return
+        self._stop.set()
+        self._checker.join()
+        self._checker = None
+
+    def stats(self) -> List[NodeStats]:
+        with self._lock:
+            return [
+                NodeStats(
+                    name=node.name,
+                    primary=node.name == self.primary,
+                    healthy=node.healthy,
+                    outstanding=node.outstanding,
+                    completed=node.completed,
+                    failed=node.failed,
+                    avg_latency=(
+                        node.total_latency / (node.completed + node.failed)
+                        if node.completed + node.failed
+                        else 0.0
+                    ),
+                    max_latency=node.max_latency,
+                    check_latency=node.check_latency,
+                )
+                for node in self._nodes.values()
+            ]
+
+    def close(self):
+        self.stop_health_checks()
+        self._health_executor.shutdown(wait=False, cancel_futures=True)
+        for node in self._nodes.values():
+            node.close_health_session()
+            node.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# 通过 Router 执行 BaseCRUD: get 分散到各节点, upsert/delete 在主节点执行
+class RoutedCRUD:
+    def __init__(self, crud: BaseCRUD, router: Router):
+        self.crud = crud
+        self.router = router
+
+    def get(self, conds=None, panel=True) -> pd.DataFrame:
+        return self.router.get(self.crud, conds=conds, panel=panel)
+
+    def upsert(self, data: pd.DataFrame):
+        return self.router.write(self.crud.upsert, data)
+
+    def delete(self, **kwargs):
+        return self.router.write(self.crud.delete, **kwargs)
+
+    def delete_keys(self, keys: pd.DataFrame, **kwargs) -> int:
+        return self.router.write(self.crud.delete_keys, keys, **kwargs)
+
+    # 并发执行多组查询, 结果与 conds_list 顺序一致
+    def get_many(self, conds_list: Iterable, panel=True) -> List[pd.DataFrame]:
+        futures = [
+            self.router.submit_read(self.crud.get, conds=conds, panel=panel)
+            for conds in conds_list
+        ]
+        return [future.result() for future in futures]
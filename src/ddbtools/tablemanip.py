@@ -1,8 +1,12 @@
+import threading
+import time
 import pandas as pd
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import List, Literal
 import dolphindb as ddb
 from ddbtools.log import logger
+from ddbtools.instrument import span, timed
 
 
 @dataclass
@@ -13,11 +17,67 @@ class DbColumn:
     compress: str = None
 
 
-def get_table_info(session: ddb.Session, db_name: str, table_name: str):
-    session.table(db_name, table_name, "db_table")
-    table_schema = session.run("schema(db_table)")
+# 进程级表结构缓存, 以 (db_name, table_name) 为键, 支持 TTL 与 LRU 淘汰
+class SchemaCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db_name: str, table_name: str):
+        key = (db_name, table_name)
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (
+                self.ttl is None or time.monotonic() - item[0] < self.ttl
+            ):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, db_name: str, table_name: str, value):
+        key = (db_name, table_name)
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    # 不指定 table_name 时清除整个数据库下的缓存, 均不指定时清空缓存
+    def invalidate(self, db_name: str = None, table_name: str = None):
+        with self._lock:
+            if db_name is None:
+                self._data.clear()
+            elif table_name is None:
+                for key in [k for k in self._data if k[0] == db_name]:
+                    del self._data[key]
+            else:
+                self._data.pop((db_name, table_name), None)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+    def __len__(self):
+        return len(self._data)
+
+
+schema_cache = SchemaCache()
+
+
+def _fetch_table_info(session: ddb.Session, db_name: str, table_name: str):
+    with span("tablemanip.schema.run"):
+        session.table(db_name, table_name, "db_table")
+        table_schema = session.run("schema(db_table)")
     col_defs = table_schema["colDefs"].set_index("name")
-    col_defs["compress_methods"] = table_schema["compressMethods"].set_index("name")    
+    col_defs["compress_methods"] = table_schema["compressMethods"].set_index("name")
     return pd.Series(
         {
             "db_name": db_name,
@@ -30,38 +90,41 @@ def get_table_info(session: ddb.Session, db_name: str, table_name: str):
         }
     )
 
-def get_table_columns(session: ddb.Session, db_name: str, table_name: str):
-    session.table(db_name, table_name, "db_table")
-    table_schema = session.run("schema(db_table)")
-    col_defs = table_schema["colDefs"].set_index("name")
-    col_defs["compress_methods"] = table_schema["compressMethods"].set_index("name")
-    return col_defs
 
+def _cached_table_info(
+    session: ddb.Session, db_name: str, table_name: str, use_cache: bool
+):
+    table_info = schema_cache.get(db_name, table_name) if use_cache else None
+    if table_info is None:
+        table_info = _fetch_table_info(session, db_name, table_name)
+        schema_cache.put(db_name, table_name, table_info)
+    return table_info
 
-def get_all_tables(session: ddb.Session, db_name: str):
-    session.database("db", dbPath=db_name)
-    return session.run("db.getTables()")
 
+def get_table_info(
+    session: ddb.Session, db_name: str, table_name: str, use_cache: bool = True
+):
+    table_info = _cached_table_info(session, db_name, table_name, use_cache).copy()
+    table_info["col_defs"] = table_info["col_defs"].copy()
+    return table_info
 
-def create_table(
-    session: ddb.Session,
-    db_name: str,
-    table_name: str,
-    columns: DbColumn | List[DbColumn],
-    partition_by: str = None,
-    sortColumns: str = None,
-    keepDuplicates: Literal["ALL", "LAST", "FIRST"] = None,
-    sortKeyMappingFunction: str = None,
+
+def get_table_columns(
+    session: ddb.Session, db_name: str, table_name: str, use_cache: bool = True
 ):
-    if session.run(f"existsTable('{db_name}',`{table_name});"):
-        logger.info(
-            f"在数据库 {db_name} 下表 {table_name} 已存在，请删除重建或修改原表"
-        )
-        return f"在数据库 {db_name} 下表 {table_name} 已存在，请删除重建或修改原表"
+    return _cached_table_info(session, db_name, table_name, use_cache)[
+        "col_defs"
+    ].copy()
 
-    if isinstance(columns, DbColumn):
-        columns = [columns]
 
+@timed("tablemanip.get_all_tables")
+def get_all_tables(session: ddb.Session, db_name: str):
+    session.database("db", dbPath=db_name)
+    return session.run("db.getTables()")
+
+
+# 列定义: name TYPE[comment="...",compress="..."]
+def _column_defs(columns: List[DbColumn]) -> str:
     col_strs = []
     for col in columns:
         col_str = f"{col.name} {col.dtype}"
@@ -76,11 +139,23 @@ def create_table(
             case (False, True):
                 col_str = col_str + f'[compress="{col.compress}"]'
         col_strs.append(col_str)
-    cols_str = "\n".join(col_strs)
+    return "\n".join(col_strs)
+
 
+def _create_table_script(
+    db_name: str,
+    table_name: str,
+    columns: DbColumn | List[DbColumn],
+    partition_by: str = None,
+    sortColumns: str = None,
+    keepDuplicates: Literal["ALL", "LAST", "FIRST"] = None,
+    sortKeyMappingFunction: str = None,
+) -> str:
+    if isinstance(columns, DbColumn):
+        columns = [columns]
     script = f"""
         create table "{db_name}"."{table_name}"(
-            {cols_str}
+            {_column_defs(columns)}
         )
     """
     if partition_by:
@@ -91,17 +166,64 @@ def create_table(
         script = script + f"\nkeepDuplicates={keepDuplicates},"
     if sortKeyMappingFunction:
         script = script + f"\nsortKeyMappingFunction=[{sortKeyMappingFunction}]"
-    session.run(script)
-    logger.info(f"在数据库 {db_name} 下创建表 {table_name} 成功")
-    return f"在数据库 {db_name} 下创建表 {table_name} 成功"
+    return script
 
 
-def create_dimensional_table(
+# 属性表的固定结构: 按 datetime, attribute 分区, 按 code, datetime 排序
+def _attribute_table_columns(
+    code_dtype: str = "SYMBOL", attr_dtype: str = "DOUBLE", dt_dtype: str = "DATE"
+) -> List[DbColumn]:
+    return [
+        DbColumn("datetime", dt_dtype, comment="时间", compress="delta"),
+        DbColumn("code", code_dtype),
+        DbColumn("attribute", "SYMBOL"),
+        DbColumn("value", attr_dtype),
+    ]
+
+
+_ATTRIBUTE_TABLE_OPTIONS = dict(
+    partition_by="datetime, attribute",
+    sortColumns="`code, `datetime",
+    keepDuplicates="ALL",
+    sortKeyMappingFunction="hashBucket{, 500}",
+)
+
+
+def _add_columns_script(
+    db_name: str, table_name: str, columns: DbColumn | List[DbColumn]
+) -> str:
+    if isinstance(columns, DbColumn):
+        columns = [columns]
+    names = ",".join(f'"{col.name}"' for col in columns)
+    dtypes = ",".join(col.dtype for col in columns)
+    script = f"""
+        addColumn(loadTable("{db_name}", "{table_name}"), [{names}], [{dtypes}])
+    """
+    comments = ",".join(
+        f'"{col.name}":"{col.comment}"' for col in columns if isinstance(col.comment, str)
+    )
+    if comments:
+        script = (
+            script
+            + f'\nsetColumnComment(loadTable("{db_name}", "{table_name}"), {{{comments}}})'
+        )
+    return script
+
+
+def _drop_table_script(db_name: str, table_name: str) -> str:
+    return f'dropTable(database("{db_name}"), "{table_name}")'
+
+
+@timed("tablemanip.create_table")
+def create_table(
     session: ddb.Session,
     db_name: str,
     table_name: str,
     columns: DbColumn | List[DbColumn],
     partition_by: str = None,
+    sortColumns: str = None,
+    keepDuplicates: Literal["ALL", "LAST", "FIRST"] = None,
+    sortKeyMappingFunction: str = None,
 ):
     if session.run(f"existsTable('{db_name}',`{table_name});"):
         logger.info(
@@ -109,37 +231,43 @@ def create_dimensional_table(
         )
         return f"在数据库 {db_name} 下表 {table_name} 已存在，请删除重建或修改原表"
 
-    if isinstance(columns, DbColumn):
-        columns = [columns]
+    session.run(
+        _create_table_script(
+            db_name,
+            table_name,
+            columns,
+            partition_by,
+            sortColumns,
+            keepDuplicates,
+            sortKeyMappingFunction,
+        )
+    )
+    schema_cache.invalidate(db_name, table_name)
+    logger.info(f"在数据库 {db_name} 下创建表 {table_name} 成功")
+    return f"在数据库 {db_name} 下创建表 {table_name} 成功"
 
-    col_strs = []
-    for col in columns:
-        col_str = f"{col.name} {col.dtype}"
-        patten = (isinstance(col.comment, str), isinstance(col.compress, str))
-        match patten:
-            case (True, True):
-                col_str = (
-                    col_str + f'[comment="{col.comment}",compress="{col.compress}"]'
-                )
-            case (True, False):
-                col_str = col_str + f'[comment="{col.comment}"]'
-            case (False, True):
-                col_str = col_str + f'[compress="{col.compress}"]'
-        col_strs.append(col_str)
-    cols_str = "\n".join(col_strs)
 
-    script = f"""
-        create table "{db_name}"."{table_name}"(
-            {cols_str}
+@timed("tablemanip.create_dimensional_table")
+def create_dimensional_table(
+    session: ddb.Session,
+    db_name: str,
+    table_name: str,
+    columns: DbColumn | List[DbColumn],
+    partition_by: str = None,
+):
+    if session.run(f"existsTable('{db_name}',`{table_name});"):
+        logger.info(
+            f"在数据库 {db_name} 下表 {table_name} 已存在，请删除重建或修改原表"
         )
-    """
-    if partition_by:
-        script = script + f"\npartitioned by {partition_by},"
-    session.run(script)
+        return f"在数据库 {db_name} 下表 {table_name} 已存在，请删除重建或修改原表"
+
+    session.run(_create_table_script(db_name, table_name, columns, partition_by))
+    schema_cache.invalidate(db_name, table_name)
     logger.info(f"在数据库 {db_name} 下创建表 {table_name} 成功")
     return f"在数据库 {db_name} 下创建表 {table_name} 成功"
 
 
+@timed("tablemanip.create_attribute_table")
 def create_attribute_table(
     session: ddb.Session,
     db_name: str,
@@ -149,19 +277,15 @@ def create_attribute_table(
     dt_dtype: str = "DATE",
 ):
     if not session.run(f"existsTable('{db_name}',`{table_name});"):
-        script = f"""
-        create table "{db_name}"."{table_name}"(
-            datetime {dt_dtype}[comment="时间", compress="delta"]
-            code {code_dtype}
-            attribute SYMBOL
-            value {attr_dtype}
+        session.run(
+            _create_table_script(
+                db_name,
+                table_name,
+                _attribute_table_columns(code_dtype, attr_dtype, dt_dtype),
+                **_ATTRIBUTE_TABLE_OPTIONS,
+            )
         )
-        partitioned by datetime, attribute,
-        sortColumns=[`code, `datetime],
-        keepDuplicates=ALL, 
-        sortKeyMappingFunction=[hashBucket{{, 500}}]
-        """
-        session.run(script)
+        schema_cache.invalidate(db_name, table_name)
         logger.info(f"在数据库 {db_name} 下创建表 {table_name} 成功")
         return f"在数据库 {db_name} 下创建表 {table_name} 成功"
     else:
@@ -169,12 +293,30 @@ def create_attribute_table(
         return f"在数据库 {db_name} 下表 {table_name} 已存在,跳过"
 
 
-def delete_table(session: ddb.Session, db_name: str, table_name: str): ...
+@timed("tablemanip.delete_table")
+def delete_table(session: ddb.Session, db_name: str, table_name: str):
+    if session.run(f"existsTable('{db_name}',`{table_name});"):
+        session.run(_drop_table_script(db_name, table_name))
+        schema_cache.invalidate(db_name, table_name)
+        logger.info(f"在数据库 {db_name} 下删除表 {table_name} 成功")
+        return f"在数据库 {db_name} 下删除表 {table_name} 成功"
+    else:
+        logger.info(f"在数据库 {db_name} 下表 {table_name} 不存在,跳过")
+        return f"在数据库 {db_name} 下表 {table_name} 不存在,跳过"
 
 
+@timed("tablemanip.add_columns")
 def add_columns(
     session: ddb.Session,
     db_name: str,
     table_name: str,
     columns: DbColumn | List[DbColumn],
-): ...
+):
+    if isinstance(columns, DbColumn):
+        columns = [columns]
+
+    session.run(_add_columns_script(db_name, table_name, columns))
+    schema_cache.invalidate(db_name, table_name)
+    col_names = ", ".join(col.name for col in columns)
+    logger.info(f"在数据库 {db_name} 下表 {table_name} 添加列 {col_names} 成功")
+    return f"在数据库 {db_name} 下表 {table_name} 添加列 {col_names} 成功"
@@ -0,0 +1,133 @@
+import hashlib
+import threading
+import weakref
+from datetime import date, datetime
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+import dolphindb as ddb
+from ddbtools.crud import BaseCRUD, Comparator, Filter, _as_frame, _to_vector, compact_frame
+from ddbtools.instrument import span
+
+# 各 session 中已定义的查询模板函数名
+_defined_templates: "weakref.WeakKeyDictionary[ddb.Session, set]" = (
+    weakref.WeakKeyDictionary()
+)
+_defined_lock = threading.Lock()
+# 已确认在服务器上注册为函数视图的模板, 键为 (host, port, 函数名); 函数视图对集群中所有会话可见
+_function_views: set = set()
+
+
+def _condition(column: str, comparator: Comparator, param: str) -> str:
+    if comparator == Comparator.like:
+        return f'{column} like "%" + {param} + "%"'
+    return f"{column} {comparator.value} {param}"
+
+
+def _argument(value, comparator: Comparator):
+    if comparator == Comparator.isin:
+        return _to_vector(value)
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return np.datetime64(pd.Timestamp(value))
+    return value
+
+
+# 参数化的服务器端查询: 查询形状(列与比较符)注册为服务器端函数, 之后每次调用只传入参数值,
+# 服务器不再重复解析查询脚本; 同一 session 中每个模板只定义一次
+# 属性表面板查询与 BaseCRUD.get 的结果一致
+class QueryTemplate:
+    def __init__(
+        self,
+        crud: BaseCRUD,
+        shape: List[Filter | Tuple[str, Comparator]],
+        panel=True,
+        function_view: bool = False,
+    ):
+        self.crud = crud
+        self.shape = [
+            (cond.column, cond.comparator) if isinstance(cond, Filter) else tuple(cond)
+            for cond in shape
+        ]
+        self.pivoted = "attr_" in crud.table_name and panel
+        self.function_view = function_view
+        self.params = [f"p{i}" for i in range(len(self.shape))]
+        self.script = self._definition()
+        digest = hashlib.sha1(self.script.encode()).hexdigest()
+        self.name = f"ddbtools_q_{digest[:16]}"
+        self.script = self.script.replace("ddbtools_q_NAME", self.name)
+
+    def _definition(self) -> str:
+        source = f'loadTable("{self.crud.db_path}", "{self.crud.table_name}")'
+        conditions = ", ".join(
+            _condition(column, comparator, param)
+            for (column, comparator), param in zip(self.shape, self.params)
+        )
+        if self.pivoted:
+            sql = f"select value from {source}"
+        else:
+            sql = f"select * from {source}"
+        if conditions:
+            sql += f" where {conditions}"
+        if self.pivoted:
+            sql += " pivot by datetime, code, attribute"
+        return f"def ddbtools_q_NAME({', '.join(self.params)}) {{\n    return {sql}\n}}"
+
+    # 在 session 中定义模板函数, function_view=True 时改为注册为函数视图(需要管理员权限)
+    def define(self, session: ddb.Session):
+        if self.function_view:
+            self._define_view(session)
+            return
+        with _defined_lock:
+            if self.name in _defined_templates.get(session, ()):
+                return
+        session.run(self.script)
+        with _defined_lock:
+            _defined_templates.setdefault(session, set()).add(self.name)
+
+    def _view_exists(self, session: ddb.Session) -> bool:
+        return bool(session.run(f'"{self.name}" in (exec name from getFunctionViews())'))
+
+    # 函数视图在集群中只注册一次: 每个节点先查询 getFunctionViews, 已存在时直接调用,
+    # 不在会话中重复定义, 也不再执行 addFunctionView
+    def _define_view(self, session: ddb.Session):
+        key = (getattr(session, "host", None), getattr(session, "port", None), self.name)
+        with _defined_lock:
+            if key in _function_views:
+                return
+        if not self._view_exists(session):
+            session.run(self.script)
+            try:
+                session.run(f"addFunctionView({self.name})")
+            except Exception:
+                # 其他进程可能同时注册了同一个函数视图
+                if not self._view_exists(session):
+                    raise
+            session.undef(self.name, "DEF")
+        with _defined_lock:
+            _function_views.add(key)
+
+    # 按 shape 的顺序传入参数值, isin 传入取值列表
+    def __call__(self, session: ddb.Session, *values, compact: bool = None):
+        if len(values) != len(self.shape):
+            raise ValueError(f"需要 {len(self.shape)} 个参数, 得到 {len(values)} 个")
+        self.define(session)
+        args = [
+            _argument(value, comparator)
+            for value, (_, comparator) in zip(values, self.shape)
+        ]
+        with span("template.run") as sp:
+            result = _as_frame(session.run(self.name, *args))
+            sp.set(result)
+        if self.pivoted and not result.empty:
+            result = result.set_index(["datetime", "code"]).sort_index()
+        if self.crud.compact if compact is None else compact:
+            result = compact_frame(result, report=True)
+        return result
+
+
+# 删除 session 中已定义的模板函数
+def clear_templates(session: ddb.Session):
+    with _defined_lock:
+        names = _defined_templates.pop(session, set())
+    for name in names:
+        session.undef(name, "DEF")
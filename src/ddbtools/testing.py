@@ -0,0 +1,395 @@
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+import dolphindb as ddb
+from ddbtools.tablemanip import schema_cache
+
+# 进程内的 DolphinDB Session 替身, 用于离线测试与基准测试
+# 记录执行过的脚本, 返回合成的表结构与数据, 只支持 ddbtools 自身生成的简单查询
+
+_LITERAL_DATETIME = re.compile(r"^\d{4}\.\d{2}\.\d{2}( \d{2}:\d{2}:\d{2}(\.\d+)?)?$")
+_CLAUSE = re.compile(r"^\s*(\w+)\s*(>=|<=|!=|=|>|<| in )\s*(.+?)\s*$")
+_AGG = re.compile(r"^\s*(min|max|count|sum|avg)\((\w+)\)\s+as\s+(\w+)\s*$")
+_HASH_BUCKET = re.compile(r"hashBucket\(cast\((\w+), (\w+)\), (\d+)\)")
+_DISTINCT = re.compile(r"^\s*distinct\s+(\w+)\s+as\s+(\w+)\s*$")
+
+DTYPE_PD2DDB = {
+    "b": "BOOL",
+    "i": "LONG",
+    "u": "LONG",
+    "f": "DOUBLE",
+    "M": "TIMESTAMP",
+    "O": "SYMBOL",
+}
+
+
+def _ddb_type(values: pd.Series) -> str:
+    if pd.api.types.is_string_dtype(values.dtype):
+        return "SYMBOL"
+    return DTYPE_PD2DDB.get(values.dtype.kind, "STRING")
+
+
+def _parse_literal(text: str, session: "FakeSession"):
+    text = text.strip()
+    if text in session.variables:
+        return session.variables[text]
+    if text.startswith("[") and text.endswith("]"):
+        items = [item for item in text[1:-1].split(",") if item.strip()]
+        return [_parse_literal(item, session) for item in items]
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "'\"`":
+        return text[1:-1]
+    if _LITERAL_DATETIME.match(text):
+        return pd.Timestamp(text.replace(".", "-", 2))
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _evaluate(data: pd.DataFrame, clause: str, session: "FakeSession") -> pd.Series:
+    match = _CLAUSE.match(clause)
+    if match is None:
+        raise NotImplementedError(f"FakeSession 不支持的查询条件: {clause}")
+    column, op, literal = match.group(1), match.group(2).strip(), match.group(3)
+    values = data[column]
+    target = _parse_literal(literal, session)
+    if op == "in":
+        return values.isin(list(target))
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        target = pd.Timestamp(target)
+    return {
+        "=": values.__eq__,
+        "!=": values.__ne__,
+        ">=": values.__ge__,
+        "<=": values.__le__,
+        ">": values.__gt__,
+        "<": values.__lt__,
+    }[op](target)
+
+
+# 与服务器一致, fetchSize 小于 8192 时报错
+class FakeBlockReader:
+    def __init__(self, data: pd.DataFrame, fetch_size: int):
+        if fetch_size < 8192:
+            raise RuntimeError(f"fetchSize 不能小于 8192: {fetch_size}")
+        self._data = data
+        self._fetch_size = fetch_size
+        self._offset = 0
+
+    def hasNext(self) -> bool:
+        return self._offset < len(self._data)
+
+    def read(self) -> pd.DataFrame:
+        chunk = self._data.iloc[self._offset : self._offset + self._fetch_size]
+        self._offset += self._fetch_size
+        return chunk.reset_index(drop=True)
+
+    def skipAll(self):
+        self._offset = len(self._data)
+
+
+class FakeTable:
+    def __init__(
+        self,
+        session: "FakeSession",
+        key: tuple,
+        clauses: List[str] = None,
+        selects: str = None,
+        pivot: tuple = None,
+    ):
+        self._session = session
+        self._key = key
+        self._clauses = clauses or []
+        self._selects = selects
+        self._pivot = pivot
+
+    def _copy(self, **kwargs):
+        state = {
+            "clauses": self._clauses,
+            "selects": self._selects,
+            "pivot": self._pivot,
+        }
+        state.update(kwargs)
+        return FakeTable(self._session, self._key, **state)
+
+    def where(self, clause: str) -> "FakeTable":
+        return self._copy(clauses=self._clauses + [clause])
+
+    def select(self, cols: str) -> "FakeTable":
+        return self._copy(selects=cols)
+
+    def pivotby(self, index: str, column: str) -> "FakeTable":
+        return self._copy(pivot=(index, column))
+
+    def showSQL(self) -> str:
+        sql = f"select {self._selects or '*'} from {self._key[1]}"
+        if self._clauses:
+            sql += " where " + " and ".join(f"({c})" for c in self._clauses)
+        self._session._sql[sql] = self
+        return sql
+
+    def toDF(self) -> pd.DataFrame:
+        if self._session.arrow:
+            return self._session.run(self.showSQL())
+        return self._frame()
+
+    def _frame(self) -> pd.DataFrame:
+        data = self._session.table_data(*self._key)
+        for clause in self._clauses:
+            mask = None
+            for part in clause.split(" or "):
+                part_mask = _evaluate(data, part, self._session)
+                mask = part_mask if mask is None else mask | part_mask
+            data = data[mask.to_numpy()]
+        self._session.rows_read += len(data)
+
+        if self._pivot is not None:
+            index, column = self._pivot
+            index = [col.strip() for col in index.split(",")]
+            value = self._selects or "value"
+            return (
+                data.pivot_table(
+                    index=index, columns=column, values=value, aggfunc="last"
+                )
+                .rename_axis(columns=None)
+                .reset_index()
+            )
+        if self._selects is None or self._selects.strip() == "*":
+            return data.reset_index(drop=True)
+
+        distinct = _DISTINCT.match(self._selects)
+        if distinct:
+            values = data[distinct.group(1)].drop_duplicates()
+            return pd.DataFrame({distinct.group(2): values.to_numpy()})
+        result = {}
+        for expr in self._selects.split(","):
+            agg = _AGG.match(expr)
+            if agg:
+                func, col, alias = agg.groups()
+                func = "mean" if func == "avg" else func
+                result[alias] = [getattr(data[col], func)()]
+            else:
+                col = expr.strip()
+                result[col] = data[col].to_numpy()
+        return pd.DataFrame(result)
+
+
+class FakeSession:
+    # arrow=True 时模拟 PROTOCOL_ARROW, 查询结果以 pyarrow.Table 返回
+    # run 只识别 ddbtools 发送的查询与目录脚本, 其他脚本抛出 NotImplementedError
+    def __init__(self, arrow: bool = False):
+        self.arrow = arrow
+        self.scripts: List[str] = []
+        self.variables: Dict[str, object] = {}
+        self.databases: Dict[str, dict] = {}
+        self.schemas: Dict[tuple, dict] = {}
+        self.rows_read = 0
+        self.rows_written = 0
+        self._tables: Dict[tuple, List[pd.DataFrame]] = {}
+        self._sql: Dict[str, FakeTable] = {}
+        self._closed = False
+        # 连接池的多个线程可能共用同一个替身, 写入与合并需要互斥
+        self._lock = threading.RLock()
+
+    def add_database(
+        self,
+        db_path: str,
+        partition_type: str = "VALUE",
+        partition_column_type: int = 6,
+        engine: str = "TSDB",
+        partition_schema=None,
+    ):
+        self.databases[db_path] = {
+            "databaseDir": db_path,
+            "engineType": engine,
+            "partitionColumnType": partition_column_type,
+            "partitionTypeName": partition_type,
+            "partitionSchema": partition_schema,
+        }
+
+    def add_table(
+        self,
+        db_path: str,
+        table_name: str,
+        data: pd.DataFrame,
+        col_types: Dict[str, str] = None,
+        partition_columns: str | List[str] = None,
+        sort_columns: List[str] = None,
+    ):
+        if db_path not in self.databases:
+            self.add_database(db_path)
+        col_types = col_types or {}
+        types = [col_types.get(col) or _ddb_type(data[col]) for col in data.columns]
+        self.schemas[(db_path, table_name)] = {
+            "colDefs": pd.DataFrame(
+                {
+                    "name": list(data.columns),
+                    "typeString": types,
+                    "typeInt": [0] * len(types),
+                    "comment": [""] * len(types),
+                }
+            ),
+            "compressMethods": pd.DataFrame(
+                {"name": list(data.columns), "compressMethods": ["lz4"] * len(types)}
+            ),
+            "partitionColumnName": partition_columns,
+            "sortColumns": sort_columns,
+        }
+        self._tables[(db_path, table_name)] = [data]
+        schema_cache.invalidate(db_path, table_name)
+
+    def table_data(self, db_path: str, table_name: str) -> pd.DataFrame:
+        with self._lock:
+            frames = self._tables[(db_path, table_name)]
+            if len(frames) > 1:
+                frames[:] = [pd.concat(frames, ignore_index=True)]
+            return frames[0]
+
+    def append(self, db_path: str, table_name: str, data: pd.DataFrame):
+        with self._lock:
+            self._tables[(db_path, table_name)].append(pd.DataFrame(data))
+            self.rows_written += len(data)
+
+    def connect(self, *args, **kwargs):
+        return True
+
+    def close(self):
+        self._closed = True
+
+    def isClosed(self) -> bool:
+        return self._closed
+
+    def upload(self, variables: Dict[str, object]):
+        self.variables.update(variables)
+
+    def undef(self, name: str, var_type: str = "VAR"):
+        self.variables.pop(name, None)
+
+    def database(self, dbName: str = None, dbPath: str = None, **kwargs):
+        self.variables[dbName] = ("database", dbPath)
+
+    def existsDatabase(self, db_path: str) -> bool:
+        return db_path in self.databases
+
+    def table(
+        self, dbPath: str = None, data=None, tableAliasName: str = None, **kwargs
+    ) -> FakeTable:
+        table = FakeTable(self, (dbPath, data))
+        if tableAliasName:
+            self.variables[tableAliasName] = table
+        return table
+
+    def loadTable(self, tableName: str, dbPath: str = None, **kwargs) -> FakeTable:
+        return FakeTable(self, (dbPath, tableName))
+
+    def run(self, script: str, *args, fetchSize: int = None, **kwargs):
+        self.scripts.append(script)
+        if script in self._sql:
+            table = self._sql[script]
+            if fetchSize:
+                return FakeBlockReader(table._frame(), fetchSize)
+            if self.arrow:
+                import pyarrow as pa
+
+                return pa.Table.from_pandas(table._frame(), preserve_index=False)
+            return table._frame()
+
+        text = script.strip()
+        if text == "1+1":
+            return 2
+        match = _HASH_BUCKET.fullmatch(text)
+        if match:
+            # 以确定性的哈希代替服务器端的 hashBucket
+            values = np.asarray(self.variables[match.group(1)], dtype=object).astype(str)
+            return pd.util.hash_array(values) % np.uint64(match.group(3))
+        match = re.fullmatch(r"schema\((\w+)\)", text)
+        if match:
+            target = self.variables[match.group(1)]
+            if isinstance(target, FakeTable):
+                return self.schemas[target._key]
+            return self.databases[target[1]]
+        match = re.fullmatch(r"existsTable\('([^']*)',\s*`(\w+)\);?", text)
+        if match:
+            return (match.group(1), match.group(2)) in self._tables
+        if "getAllDBs()" in text:
+            return self._catalog("if (true)" in text)
+        raise NotImplementedError(f"FakeSession 不支持的脚本: {text[:200]}")
+
+    def _catalog(self, with_tables: bool):
+        rows = []
+        if with_tables:
+            for (db_path, table_name), schema in self.schemas.items():
+                col_defs = schema["colDefs"]
+                rows.append(
+                    col_defs.assign(dbPath=db_path, tableName=table_name)[
+                        ["dbPath", "tableName", "name", "typeString", "typeInt", "comment"]
+                    ]
+                )
+        col_defs = (
+            pd.concat(rows, ignore_index=True)
+            if rows
+            else pd.DataFrame(
+                columns=["dbPath", "tableName", "name", "typeString", "typeInt", "comment"]
+            )
+        )
+        return [list(self.databases.values()), col_defs]
+
+
+# TableUpserter 替身: 按主键合并写入 FakeSession 中的表
+class FakeTableUpserter:
+    def __init__(
+        self,
+        dbPath: str,
+        tableName: str,
+        ddbSession: FakeSession,
+        ignoreNull: bool = False,
+        keyColNames: List[str] = None,
+        **kwargs,
+    ):
+        self.db_path = dbPath
+        self.table_name = tableName
+        self.session = ddbSession
+        self.key_cols = list(keyColNames or [])
+
+    def upsert(self, data: pd.DataFrame):
+        with self.session._lock:
+            self.session.scripts.append(f"upsert!({self.table_name}, {len(data)} rows)")
+            self.session.append(self.db_path, self.table_name, data)
+            if self.key_cols:
+                frames = self.session._tables[(self.db_path, self.table_name)]
+                merged = pd.concat(frames, ignore_index=True)
+                frames[:] = [
+                    merged.drop_duplicates(self.key_cols, keep="last").reset_index(drop=True)
+                ]
+
+
+# 在上下文中用 FakeTableUpserter 替换 dolphindb.TableUpserter
+@contextmanager
+def patch_table_upserter():
+    original = ddb.TableUpserter
+    ddb.TableUpserter = FakeTableUpserter
+    try:
+        yield FakeTableUpserter
+    finally:
+        ddb.TableUpserter = original
+
+
+# 生成属性表的长表数据: dates × codes × attributes 行
+def make_attribute_frame(
+    n_dates: int, n_codes: int, n_attributes: int, seed: int = 0
+) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2020-01-01", periods=n_dates, freq="D")
+    codes = np.array([f"{i:06d}.SZ" for i in range(n_codes)], dtype=object)
+    attributes = np.array([f"attr{i}" for i in range(n_attributes)], dtype=object)
+    return pd.DataFrame(
+        {
+            "datetime": np.repeat(dates.to_numpy(), n_codes * n_attributes),
+            "code": np.tile(np.repeat(codes, n_attributes), n_dates),
+            "attribute": np.tile(attributes, n_dates * n_codes),
+            "value": rng.standard_normal(n_dates * n_codes * n_attributes),
+        }
+    )
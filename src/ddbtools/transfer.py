@@ -0,0 +1,459 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from ddbtools.cache import normalize_conds
+from ddbtools.crud import BaseCRUD, Comparator, Filter, _as_list
+from ddbtools.log import logger
+from ddbtools.partition import PartitionScheme, _names, get_partition_scheme
+from ddbtools.pool import SessionPool
+from ddbtools.tablemanip import DbColumn, create_table, get_table_info
+
+_MANIFEST = "manifest.json"
+_IMPORTED = "imported.json"
+
+
+@dataclass
+class TransferSummary:
+    db_path: str
+    table_name: str
+    parts: int
+    skipped: int
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _import_parquet():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("导出与导入需要 pyarrow, 请安装 ddbtools[parquet] 或 pyarrow") from e
+    return pyarrow, pyarrow.parquet
+
+
+def _optional_str(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)) or value == "":
+        return None
+    return str(value)
+
+
+# 由 get_table_info 的结果生成可序列化的表结构, 导入时据此重建表
+def _schema(table_info: pd.Series) -> dict:
+    col_defs = table_info["col_defs"]
+    columns = [
+        {
+            "name": str(name),
+            "dtype": str(row["typeString"]),
+            "comment": _optional_str(row.get("comment")),
+            "compress": _optional_str(row.get("compress_methods")),
+        }
+        for name, row in col_defs.iterrows()
+    ]
+    mapping = table_info.get("sort_key_mapping_function")
+    return {
+        "partition_columns": _names(table_info["partition_columns"]),
+        "sort_columns": _names(table_info.get("sort_columns")),
+        "keep_duplicates": _optional_str(table_info.get("keep_duplicates")),
+        "sort_key_mapping_function": ", ".join(_names(mapping)) or None,
+        "columns": columns,
+    }
+
+
+def _read_json(path: Path):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+def _write_json(path: Path, payload):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _part_file(label: str) -> str:
+    return f"part-{hashlib.sha1(label.encode()).hexdigest()[:16]}.parquet"
+
+
+def _py(value):
+    return value.to_pydatetime() if isinstance(value, pd.Timestamp) else value
+
+
+# 把分区列的取值按数据库第一层的物理分区分组, 每组导出为一个文件, 返回 (标签, 查询条件)
+# VALUE/RANGE 分区中同一分区的取值是连续的, 用范围条件; LIST/HASH 分区用 in 条件
+# 分区列不是第一层分区列或无法在本地确定分区时, 每个取值一个文件
+def _export_units(
+    session, scheme: PartitionScheme, column: str, values: list
+) -> List[Tuple[str, List[Filter]]]:
+    level = PartitionScheme(
+        scheme.columns[:1], scheme.types[:1], scheme.schemas[:1], scheme.col_types[:1]
+    )
+    if level.columns == [column] and level.supported():
+        ids = level.partition_ids(pd.DataFrame({column: values}), session)
+        kind = level.types[0]
+    else:
+        ids = np.arange(len(values))
+        kind = "VALUE"
+    units = []
+    for _, group in pd.Series(values, dtype=object).groupby(ids, sort=False):
+        members = [_py(value) for value in group]
+        if len(members) == 1:
+            units.append((str(members[0]), [Filter(column, Comparator.eq, members[0])]))
+            continue
+        label = f"{members[0]}~{members[-1]}"
+        if kind in ("VALUE", "RANGE"):
+            conds = [
+                Filter(column, Comparator.gt, members[0]),
+                Filter(column, Comparator.lt, members[-1]),
+            ]
+        else:
+            conds = [Filter(column, Comparator.isin, members)]
+        units.append((label, conds))
+    return units
+
+
+# 按目标表的分区方案把分区文件分组: 写入同一物理分区的文件在同一组, 由同一个连接依次导入
+# 无法在本地确定分区时所有文件为一组
+def _import_groups(
+    session, scheme: PartitionScheme, directory: Path, files: Dict[str, str], pq
+) -> List[List[str]]:
+    labels = list(files)
+    if len(labels) <= 1:
+        return [labels] if labels else []
+    columns = pq.ParquetFile(directory / files[labels[0]]).schema_arrow.names
+    if not scheme.supported(columns):
+        logger.warning(
+            f"无法在本地确定目标表的分区({scheme.describe() or '未分区'}), 分区文件将依次导入"
+        )
+        return [labels]
+    frames = []
+    for i, label in enumerate(labels):
+        parquet = pq.ParquetFile(directory / files[label])
+        for batch in parquet.iter_batches(columns=scheme.columns):
+            keys = batch.to_pandas(date_as_object=False).drop_duplicates()
+            frames.append(keys.assign(_file=i))
+    keys = pd.concat(frames, ignore_index=True)
+    keys["_partition"] = scheme.partition_ids(keys, session)
+
+    # 并查集: 共享分区的文件合并为一组
+    owner = list(range(len(labels)))
+
+    def find(i: int) -> int:
+        while owner[i] != i:
+            owner[i] = owner[owner[i]]
+            i = owner[i]
+        return i
+
+    for members in keys.groupby("_partition")["_file"].unique():
+        root = find(members[0])
+        for i in members[1:]:
+            owner[find(i)] = root
+    groups: Dict[int, List[str]] = {}
+    for i, label in enumerate(labels):
+        groups.setdefault(find(i), []).append(label)
+    return list(groups.values())
+
+
+def _log_summary(action: str, summary: TransferSummary):
+    logger.info(
+        f"{action} {summary.db_path}/{summary.table_name} 完成: {summary.parts} 个分区"
+        f"(跳过 {summary.skipped} 个), {summary.rows} 行, 耗时 {summary.seconds:.1f}s, "
+        f"{summary.rows_per_second:.0f} 行/秒"
+    )
+
+
+# 把表按物理分区逐个导出为 Parquet 文件, 每个分区由连接池中的一个连接分块读取并流式写入
+# 目录中的 manifest.json 记录表结构、过滤条件与已完成的分区, resume=True 时跳过已导出的分区,
+# 目录中已有其他表、分区列或过滤条件的导出时报错
+# partition_column 默认为表的第一个分区列, 此时按数据库第一层分区的方案分组(例如按月 RANGE 分区
+# 每月一个文件); 指定其他列时按该列的取值逐个导出; 表没有分区列时整表导出为一个文件
+def export_table(
+    pool: SessionPool,
+    db_path: str,
+    table_name: str,
+    directory: str | Path,
+    conds: Filter | List[Filter] = None,
+    partition_column: str = None,
+    chunk_rows: int = 100000,
+    resume: bool = True,
+) -> TransferSummary:
+    pa, pq = _import_parquet()
+    start = time.perf_counter()
+    directory = Path(directory).expanduser()
+    directory.mkdir(parents=True, exist_ok=True)
+    crud = BaseCRUD(db_path, table_name)
+    conds = _as_list(conds)
+
+    with pool.session() as session:
+        table_info = get_table_info(session, db_path, table_name)
+        schema = _schema(table_info)
+        if partition_column is None and schema["partition_columns"]:
+            partition_column = schema["partition_columns"][0]
+        scheme = get_partition_scheme(session, db_path, table_name)
+        units = [("None", [])]
+        if partition_column:
+            values = (
+                crud._query(session, conds)
+                .select(f"distinct {partition_column} as v")
+                .toDF()["v"]
+                .sort_values()
+                .tolist()
+            )
+            units = _export_units(session, scheme, partition_column, values)
+
+    manifest_path = directory / _MANIFEST
+    manifest = _read_json(manifest_path) if resume else None
+    normalized = normalize_conds(conds)
+    if manifest is not None and (
+        manifest["db_path"] != db_path
+        or manifest["table_name"] != table_name
+        or manifest["partition_column"] != partition_column
+        or manifest.get("conds", []) != normalized
+    ):
+        raise ValueError(
+            f"{directory} 中已有其他表、分区方式或过滤条件的导出, 请使用新的目录或 resume=False"
+        )
+    if manifest is None:
+        manifest = {
+            "db_path": db_path,
+            "table_name": table_name,
+            "partition_column": partition_column,
+            "conds": normalized,
+            "parts": {},
+        }
+    manifest["schema"] = schema
+    manifest["partition_scheme"] = scheme.describe()
+    done = manifest["parts"]
+    lock = threading.Lock()
+    with lock:
+        _write_json(manifest_path, manifest)
+
+    pending = [(label, unit) for label, unit in units if label not in done]
+
+    def export_part(session, label: str, unit: List[Filter]) -> int:
+        part_conds = list(conds) + unit
+        path = directory / _part_file(label)
+        tmp = path.with_name(path.name + ".tmp")
+        part_start = time.perf_counter()
+        writer = None
+        rows = 0
+        try:
+            for chunk in crud.iter_get(session, part_conds, chunk_rows=chunk_rows, panel=False):
+                table = pa.Table.from_pandas(
+                    chunk, schema=writer.schema if writer else None, preserve_index=False
+                )
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp, table.schema)
+                writer.write_table(table)
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is not None:
+            os.replace(tmp, path)
+        elapsed = time.perf_counter() - part_start
+        with lock:
+            done[label] = {"file": path.name if writer is not None else None, "rows": rows}
+            _write_json(manifest_path, manifest)
+        logger.info(
+            f"导出 {table_name} 分区 {label}: {rows} 行, {rows / elapsed if elapsed else 0:.0f} 行/秒"
+        )
+        return rows
+
+    futures = [pool.submit(export_part, label, unit) for label, unit in pending]
+    rows = sum(future.result() for future in futures)
+    summary = TransferSummary(
+        db_path=db_path,
+        table_name=table_name,
+        parts=len(units),
+        skipped=len(units) - len(pending),
+        rows=rows,
+        seconds=time.perf_counter() - start,
+    )
+    _log_summary("导出", summary)
+    return summary
+
+
+def _create_from_schema(session, db_path: str, table_name: str, schema: dict):
+    columns = [
+        DbColumn(col["name"], col["dtype"], comment=col["comment"], compress=col["compress"])
+        for col in schema["columns"]
+    ]
+    return create_table(
+        session,
+        db_path,
+        table_name,
+        columns,
+        partition_by=", ".join(schema["partition_columns"]) or None,
+        sortColumns=", ".join(f"`{col}" for col in schema["sort_columns"]) or None,
+        keepDuplicates=schema["keep_duplicates"],
+        sortKeyMappingFunction=schema["sort_key_mapping_function"],
+    )
+
+
+# 把 export_table 导出的目录并发写回数据库, 每个分区文件按 chunk_rows 行分批读取并 upsert,
+# 内存占用与并发数和 chunk_rows 成正比; 按目标表的分区方案分组, 写入同一物理分区的文件
+# 由同一个连接依次导入, 避免 TSDB 写入冲突
+# 目标表默认为导出时的表, create=True 时按导出时的表结构建表(数据库需已存在)
+# key_cols 默认为排序列与分区列(没有排序列的 OLAP 表为所有列), 重复导入同一分区不会产生重复行
+# 已导入的分区记录在目录中的 imported.json, resume=True 时跳过
+def import_table(
+    pool: SessionPool,
+    directory: str | Path,
+    db_path: str = None,
+    table_name: str = None,
+    key_cols: List[str] = None,
+    create: bool = True,
+    chunk_rows: int = 100000,
+    resume: bool = True,
+) -> TransferSummary:
+    _, pq = _import_parquet()
+    start = time.perf_counter()
+    directory = Path(directory).expanduser()
+    manifest = _read_json(directory / _MANIFEST)
+    if manifest is None:
+        raise FileNotFoundError(f"{directory} 中没有导出清单 {_MANIFEST}")
+    db_path = db_path or manifest["db_path"]
+    table_name = table_name or manifest["table_name"]
+    schema = manifest["schema"]
+    if key_cols is None:
+        # OLAP 表没有排序列, 只用分区列作主键会把同一分区的行合并为一行, 此时以所有列为主键
+        if schema["sort_columns"]:
+            key_cols = list(dict.fromkeys(schema["sort_columns"] + schema["partition_columns"]))
+        else:
+            key_cols = [col["name"] for col in schema["columns"]]
+    crud = BaseCRUD(db_path, table_name)
+    crud.key_cols = list(key_cols)
+
+    target = f"{db_path}/{table_name}"
+    progress_path = directory / _IMPORTED
+    progress = (_read_json(progress_path) if resume else None) or {}
+    imported = set(progress.get(target, []))
+    parts = {label: info for label, info in manifest["parts"].items() if info["file"]}
+    pending = [label for label in parts if label not in imported]
+    lock = threading.Lock()
+
+    with pool.session() as session:
+        if create:
+            _create_from_schema(session, db_path, table_name, schema)
+        scheme = get_partition_scheme(session, db_path, table_name)
+        groups = _import_groups(
+            session, scheme, directory, {label: parts[label]["file"] for label in pending}, pq
+        )
+
+    def import_part(session, label: str) -> int:
+        part_start = time.perf_counter()
+        rows = 0
+        parquet = pq.ParquetFile(directory / parts[label]["file"])
+        for batch in parquet.iter_batches(batch_size=chunk_rows):
+            chunk = batch.to_pandas()
+            crud.upsert(session, chunk)
+            rows += len(chunk)
+        elapsed = time.perf_counter() - part_start
+        with lock:
+            imported.add(label)
+            progress[target] = sorted(imported)
+            _write_json(progress_path, progress)
+        logger.info(
+            f"导入 {table_name} 分区 {label}: {rows} 行, {rows / elapsed if elapsed else 0:.0f} 行/秒"
+        )
+        return rows
+
+    def import_group(session, labels: List[str]) -> int:
+        return sum(import_part(session, label) for label in labels)
+
+    futures = [pool.submit(import_group, labels) for labels in groups]
+    rows = sum(future.result() for future in futures)
+    summary = TransferSummary(
+        db_path=db_path,
+        table_name=table_name,
+        parts=len(parts),
+        skipped=len(parts) - len(pending),
+        rows=rows,
+        seconds=time.perf_counter() - start,
+    )
+    _log_summary("导入", summary)
+    return summary
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ddbtools-transfer", description="DolphinDB 表与 Parquet 目录之间的并行导出与导入"
+    )
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--host", default="localhost")
+    common.add_argument("--port", type=int, default=8848)
+    common.add_argument("--user", default="")
+    common.add_argument("--password", default="")
+    common.add_argument("--workers", type=int, default=4, help="并发连接数")
+    common.add_argument("--chunk-rows", type=int, default=100000, help="每批读取或写入的行数")
+    common.add_argument("--no-resume", action="store_true", help="忽略已完成的分区, 全部重新执行")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", parents=[common], help="导出表到 Parquet 目录")
+    export.add_argument("db_path")
+    export.add_argument("table_name")
+    export.add_argument("directory")
+    export.add_argument(
+        "--partition-column", help="按该列分区导出, 默认为表的第一个分区列(按数据库的分区方案分组)"
+    )
+
+    load = commands.add_parser("import", parents=[common], help="从 Parquet 目录导入表")
+    load.add_argument("directory")
+    load.add_argument("--db-path", help="目标数据库, 默认为导出时的数据库")
+    load.add_argument("--table-name", help="目标表, 默认为导出时的表")
+    load.add_argument("--key-cols", help="逗号分隔的主键列, 默认为排序列与分区列")
+    load.add_argument("--no-create", action="store_true", help="目标表不存在时不自动建表")
+    return parser
+
+
+# 命令行入口: ddbtools-transfer export/import ...
+def main(argv: List[str] = None) -> int:
+    args = _parser().parse_args(argv)
+    with SessionPool.connect(
+        args.host, args.port, args.user, args.password, size=args.workers
+    ) as pool:
+        if args.command == "export":
+            summary = export_table(
+                pool,
+                args.db_path,
+                args.table_name,
+                args.directory,
+                partition_column=args.partition_column,
+                chunk_rows=args.chunk_rows,
+                resume=not args.no_resume,
+            )
+        else:
+            summary = import_table(
+                pool,
+                args.directory,
+                db_path=args.db_path,
+                table_name=args.table_name,
+                key_cols=args.key_cols.split(",") if args.key_cols else None,
+                create=not args.no_create,
+                chunk_rows=args.chunk_rows,
+                resume=not args.no_resume,
+            )
+    print(
+        f"{summary.db_path}/{summary.table_name}: {summary.parts} 个分区(跳过 {summary.skipped} 个), "
+        f"{summary.rows} 行, {summary.seconds:.1f}s, {summary.rows_per_second:.0f} 行/秒"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import List
+import pandas as pd
+import dolphindb as ddb
+from ddbtools.log import logger
+
+
+@dataclass
+class WriterStats:
+    queued_rows: int
+    flushed_rows: int
+    flushes: int
+    failures: int
+    last_flush_latency: float
+    avg_flush_latency: float
+    last_error: str = None
+    dropped_rows: int = 0
+
+
+# 后台缓冲写入器: 在内存中累积数据, 达到行数阈值或时间间隔后由后台线程批量 upsert
+# 缓冲区行数达到 max_buffer_rows 时 write 阻塞, 实现背压
+# 写入失败的批次保存在 failed_batches 中, 最多 max_failed_batches 个, 超出时丢弃最早的批次并记入 dropped_rows;
+# 用 retry_failed 重新放回缓冲区, 或用 drain_failed 取出自行处理
+# 写入器独占传入的 session, 使用期间不要在其他线程中使用同一个 session
+class BufferedWriter:
+    def __init__(
+        self,
+        crud,
+        session: ddb.Session,
+        max_rows: int = 10000,
+        flush_interval: float = 1.0,
+        max_buffer_rows: int = None,
+        block_timeout: float = None,
+        max_failed_batches: int = 100,
+    ):
+        self.crud = crud
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_buffer_rows = max_buffer_rows or max_rows * 10
+        self.block_timeout = block_timeout
+        self.failed_batches: "deque[pd.DataFrame]" = deque(maxlen=max_failed_batches)
+        self._dropped_rows = 0
+        self._upserter = crud._upserter(session)
+        self._frames: List[pd.DataFrame] = []
+        self._buffered_rows = 0
+        # 已从缓冲区取出但尚未写完的行数, 同样计入背压
+        self._pending_rows = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._flushed_rows = 0
+        self._flushes = 0
+        self._failures = 0
+        self._total_latency = 0.0
+        self._last_latency = 0.0
+        self._last_error = None
+        self._thread = threading.Thread(
+            target=self._loop, name="ddbtools-writer", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, data: pd.DataFrame):
+        if data is None or len(data) == 0:
+            return
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("写入器已关闭")
+            if not self._cond.wait_for(
+                lambda: self._closed
+                or self._buffered_rows + self._pending_rows < self.max_buffer_rows,
+                timeout=self.block_timeout,
+            ):
+                raise TimeoutError(
+                    f"写入缓冲区已满({self.max_buffer_rows} 行), 等待超时"
+                )
+            if self._closed:
+                raise RuntimeError("写入器已关闭")
+            self._frames.append(data)
+            self._buffered_rows += len(data)
+            if self._buffered_rows >= self.max_rows:
+                self._cond.notify_all()
+
+    def _loop(self):
+        last_flush = time.monotonic()
+        while True:
+            with self._cond:
+                while not (
+                    self._closed
+                    or self._flush_requested
+                    or self._buffered_rows >= self.max_rows
+                ):
+                    remaining = self.flush_interval - (time.monotonic() - last_flush)
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(timeout=remaining)
+                if self._closed and not self._frames:
+                    self._cond.notify_all()
+                    return
+                frames, self._frames = self._frames, []
+                rows = self._buffered_rows
+                self._buffered_rows = 0
+                self._pending_rows = rows
+                self._flush_requested = False
+            if frames:
+                self._flush_frames(frames, rows)
+            last_flush = time.monotonic()
+            with self._cond:
+                self._pending_rows = 0
+                self._cond.notify_all()
+
+    def _flush_frames(self, frames: List[pd.DataFrame], rows: int):
+        data = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        start = time.perf_counter()
+        try:
+            self._upserter.upsert(data)
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            dropped = None
+            with self._cond:
+                self._failures += 1
+                self._last_error = str(e)
+                # max_failed_batches=None 时不限制, 为 0 时不保留
+                limit = self.failed_batches.maxlen
+                if limit == 0:
+                    dropped = data
+                elif len(self.failed_batches) == limit:
+                    dropped = self.failed_batches[0]
+                if dropped is not None:
+                    self._dropped_rows += len(dropped)
+                if limit != 0:
+                    self.failed_batches.append(data)
+            logger.error(
+                f"写入表 {self.crud.db_path}/{self.crud.table_name} 失败, {rows} 行: {e}"
+            )
+            if dropped is not None:
+                logger.error(
+                    f"写入失败的批次超过 {self.failed_batches.maxlen} 个, 丢弃最早的 {len(dropped)} 行"
+                )
+        else:
+            elapsed = time.perf_counter() - start
+            with self._cond:
+                self._flushed_rows += rows
+                self._flushes += 1
+            logger.debug(
+                f"写入表 {self.crud.db_path}/{self.crud.table_name} {rows} 行, 耗时 {elapsed:.3f}s"
+            )
+        with self._cond:
+            self._last_latency = elapsed
+            self._total_latency += elapsed
+
+    # 立即写出缓冲区中的数据, 并等待写入完成
+    # 全部写入成功时返回 True; 超时或请求之后有批次写入失败(见 failed_batches)时返回 False
+    def flush(self, timeout: float = None) -> bool:
+        with self._cond:
+            failures = self._failures
+            if self._closed:
+                return self._buffered_rows + self._pending_rows == 0
+            self._flush_requested = True
+            self._cond.notify_all()
+            drained = self._cond.wait_for(
+                lambda: self._buffered_rows + self._pending_rows == 0,
+                timeout=timeout,
+            )
+            return drained and self._failures == failures
+
+    # 取出并清空写入失败的批次
+    def drain_failed(self) -> List[pd.DataFrame]:
+        with self._cond:
+            batches = list(self.failed_batches)
+            self.failed_batches.clear()
+        return batches
+
+    # 把写入失败的批次重新放回缓冲区, 返回重新排队的行数
+    def retry_failed(self) -> int:
+        batches = self.drain_failed()
+        for data in batches:
+            self.write(data)
+        return sum(len(data) for data in batches)
+
+    # 写出剩余数据并停止后台线程
+    # 超时后仍有数据未写出时返回 False 并记录日志, 后台线程会继续写入
+    def close(self, timeout: float = None) -> bool:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            with self._cond:
+                rows = self._buffered_rows + self._pending_rows
+            logger.warning(
+                f"关闭写入器超时, 表 {self.crud.db_path}/{self.crud.table_name} 还有 {rows} 行未写出"
+            )
+            return False
+        if self.failed_batches:
+            logger.warning(
+                f"写入器已关闭, 表 {self.crud.db_path}/{self.crud.table_name} 有 "
+                f"{sum(len(data) for data in self.failed_batches)} 行写入失败, 见 failed_batches"
+            )
+        return True
+
+    def stats(self) -> WriterStats:
+        with self._cond:
+            attempts = self._flushes + self._failures
+            return WriterStats(
+                queued_rows=self._buffered_rows + self._pending_rows,
+                flushed_rows=self._flushed_rows,
+                flushes=self._flushes,
+                failures=self._failures,
+                last_flush_latency=self._last_latency,
+                avg_flush_latency=self._total_latency / attempts if attempts else 0.0,
+                last_error=self._last_error,
+                dropped_rows=self._dropped_rows,
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,6 +1,7 @@
 import pytest
 import dolphindb as ddb
 from ddbtools import (
+    BaseCRUD,
     create_db,
     create_table,
     DbColumn,
@@ -11,6 +12,10 @@ TEST_DB_NAME = "dfs://test_ddbtools"
 TEST_TABLE_NAME = "test_table"
 
 
+class AttrCRUD(BaseCRUD):
+    key_cols = ["datetime", "code", "attribute"]
+
+
 @pytest.fixture(scope="session")
 def session():
     """创建DolphinDB会话"""
@@ -56,3 +61,43 @@ def test_table(session, test_db):
     yield TEST_TABLE_NAME
     # 清理测试表
     session.run(f'drop table "{test_db}"."{TEST_TABLE_NAME}"')
+
+
+@pytest.fixture
+def fake_session():
+    """离线的DolphinDB会话替身"""
+    from ddbtools.testing import FakeSession
+
+    return FakeSession()
+
+
+@pytest.fixture
+def attr_crud():
+    """离线属性表 dfs://fake/attr_fake 的CRUD"""
+    return AttrCRUD("dfs://fake", "attr_fake")
+
+
+@pytest.fixture
+def attr_table():
+    """向离线会话添加属性表 dfs://fake/attr_fake 的工厂, 未传入会话时新建一个"""
+    from ddbtools.testing import FakeSession, make_attribute_frame
+
+    def make(session=None, n_dates=5, n_codes=3, n_attributes=2):
+        session = FakeSession() if session is None else session
+        session.add_table(
+            "dfs://fake",
+            "attr_fake",
+            make_attribute_frame(n_dates, n_codes, n_attributes),
+            col_types={"datetime": "DATE"},
+            partition_columns=["datetime", "attribute"],
+            sort_columns=["code", "datetime"],
+        )
+        return session
+
+    return make
+
+
+@pytest.fixture
+def attr_session(fake_session, attr_table):
+    """带有属性表的离线会话"""
+    return attr_table(fake_session)
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+import pytest
+from ddbtools import (
+    AsyncCRUD,
+    AsyncSessionPool,
+    SessionPool,
+    async_get_all_dbs,
+    async_get_table_columns,
+)
+
+
+@pytest.fixture
+def fake_pool(attr_table):
+    with SessionPool(lambda: attr_table(n_dates=4), size=2) as pool:
+        yield pool
+
+
+class TestAsync:
+    """测试asyncio接口"""
+
+    def test_crud_and_metadata(self, attr_crud, fake_pool):
+        """测试异步查询与元数据函数"""
+
+        async def main():
+            pool = AsyncSessionPool(fake_pool)
+            crud = AsyncCRUD(attr_crud, pool)
+            panels = await crud.get_many([None] * 5)
+            columns = await async_get_table_columns(pool, "dfs://fake", "attr_fake")
+            dbs = await async_get_all_dbs(pool)
+            return panels, columns, dbs
+
+        panels, columns, dbs = asyncio.run(main())
+        assert [panel.shape for panel in panels] == [(12, 2)] * 5
+        assert list(columns.index) == ["datetime", "code", "attribute", "value"]
+        assert list(dbs["dbpath"]) == ["dfs://fake"]
+
+    def test_bounded_concurrency(self, fake_pool):
+        """测试提交到连接池的任务数不超过上限"""
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def task(session):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        async def main():
+            pool = AsyncSessionPool(fake_pool, max_pending=2)
+            await asyncio.gather(*(pool.run(task) for _ in range(50)))
+
+        asyncio.run(main())
+        assert peak[0] <= 2
+        assert fake_pool.stats().completed == 50
+
+    def test_cancel(self, fake_pool):
+        """测试取消等待中的请求"""
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow(session):
+            started.set()
+            release.wait(5)
+
+        async def main():
+            pool = AsyncSessionPool(fake_pool, max_pending=1)
+            blocker = asyncio.ensure_future(pool.run(slow))
+            waiting = asyncio.ensure_future(pool.run(lambda session: calls.append(1)))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            waiting.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiting
+            release.set()
+            await blocker
+
+        asyncio.run(main())
+        assert calls == []
+        stats = fake_pool.stats()
+        assert stats.queued == 0
+        assert stats.completed == 1
@@ -0,0 +1,47 @@
+import pytest
+import pandas as pd
+from ddbtools import Filter, arrow_to_pandas
+from ddbtools.testing import FakeSession
+
+pa = pytest.importorskip("pyarrow")
+
+
+class TestArrow:
+    """测试Arrow读取"""
+
+    @pytest.mark.parametrize("arrow", [False, True])
+    def test_get_arrow(self, attr_crud, attr_table, arrow):
+        """测试以pyarrow.Table返回查询结果"""
+        session = attr_table(FakeSession(arrow=arrow), n_dates=4)
+        table = attr_crud.get_arrow(session, Filter("attribute", value="attr1"), panel=False)
+        assert isinstance(table, pa.Table)
+        assert table.num_rows == 12
+        assert table.column_names == ["datetime", "code", "attribute", "value"]
+
+    def test_panel(self, attr_crud, attr_table):
+        """测试属性表面板与pandas结果一致"""
+        session = attr_table(FakeSession(arrow=True), n_dates=4)
+        table = attr_crud.get_arrow(session)
+        panel = arrow_to_pandas(table, strings="category", index=["datetime", "code"])
+        expected = attr_crud.get(attr_table(n_dates=4))
+        assert isinstance(panel.index.levels[1].dtype, pd.CategoricalDtype)
+        assert list(panel.columns) == list(expected.columns)
+        assert list(panel.index) == list(expected.index)
+        assert (panel.to_numpy() == expected.to_numpy()).all()
+
+    def test_arrow_to_pandas(self):
+        """测试字符串列的转换方式"""
+        table = pa.table({"code": ["a", "b", "a"], "value": [1.0, 2.0, 3.0]})
+        arrow = arrow_to_pandas(table)
+        assert isinstance(arrow["code"].dtype, pd.ArrowDtype)
+        category = arrow_to_pandas(table, strings="category")
+        assert isinstance(category["code"].dtype, pd.CategoricalDtype)
+        assert category["value"].dtype == "float64"
+        with pytest.raises(ValueError):
+            arrow_to_pandas(table, strings="object")
+
+    def test_get_on_arrow_session(self, attr_crud, attr_table):
+        """测试Arrow协议会话上get仍返回DataFrame"""
+        panel = attr_crud.get(attr_table(FakeSession(arrow=True), n_dates=4))
+        assert isinstance(panel, pd.DataFrame)
+        assert panel.shape == (12, 2)
@@ -0,0 +1,84 @@
+import pytest
+import pandas as pd
+from datetime import datetime
+from ddbtools import BaseCRUD, Filter, Comparator
+
+pytest.importorskip("pyarrow")
+from ddbtools import QueryCache
+from ddbtools.cache import normalize_conds
+
+
+class FakeTableCRUD(BaseCRUD):
+    """从内存表中按条件返回数据的CRUD"""
+
+    key_cols = ["datetime", "code"]
+
+    def __init__(self, data):
+        super().__init__("dfs://db", "attr_test")
+        self.data = data
+        self.calls = []
+
+    def get(self, session, conds=None, panel=True):
+        self.calls.append([cond.clause for cond in conds or []])
+        data = self.data
+        for cond in conds or []:
+            if cond.comparator == Comparator.gt_strict:
+                data = data[data[cond.column] > pd.Timestamp(cond.raw)]
+        return data.reset_index(drop=True)
+
+
+def make_data(days):
+    return pd.DataFrame(
+        {
+            "datetime": pd.date_range("2023-01-01", periods=days, freq="D"),
+            "code": ["A"] * days,
+            "value": range(days),
+        }
+    )
+
+
+class TestQueryCache:
+    """测试本地查询结果缓存"""
+
+    def test_normalize_conds(self):
+        """测试条件规范化与顺序无关"""
+        a = [Filter("code", Comparator.isin, ["B", "A"]), Filter("value", value=1)]
+        b = [Filter("value", value=1), Filter("code", Comparator.isin, ["A", "B"])]
+        assert normalize_conds(a) == normalize_conds(b)
+
+    def test_hit_and_miss(self, tmp_path):
+        """测试缓存命中"""
+        crud = FakeTableCRUD(make_data(3))
+        cache = QueryCache(tmp_path)
+        first = cache.get(crud, None, panel=False)
+        second = cache.get(crud, None, panel=False)
+        assert len(crud.calls) == 1
+        assert cache.hits == 1 and cache.misses == 1
+        pd.testing.assert_frame_equal(first, second)
+        cache.get(crud, None, panel=False, refresh=True)
+        assert len(crud.calls) == 2
+
+    def test_incremental(self, tmp_path):
+        """测试增量刷新只查询水位之后的数据"""
+        crud = FakeTableCRUD(make_data(3))
+        cache = QueryCache(tmp_path)
+        cache.get(crud, None, panel=False, incremental_column="datetime")
+        crud.data = make_data(5)
+        result = cache.get(crud, None, panel=False, incremental_column="datetime")
+        assert crud.calls[-1] == ["datetime > 2023.01.03 00:00:00.000"]
+        assert list(result["value"]) == [0, 1, 2, 3, 4]
+        assert list(result.index) == [0, 1, 2, 3, 4]
+        result = cache.get(crud, None, panel=False, incremental_column="datetime")
+        assert len(result) == 5
+        assert result.index.is_unique
+        assert result.loc[3, "value"] == 3
+
+    def test_evict(self, tmp_path):
+        """测试按大小淘汰最久未访问的缓存"""
+        crud = FakeTableCRUD(make_data(100))
+        cache = QueryCache(tmp_path, max_bytes=1)
+        cache.get(crud, Filter("value", value=1), panel=False)
+        cache.get(crud, Filter("value", value=2), panel=False)
+        assert len([p for p in tmp_path.iterdir() if p.is_dir()]) == 1
+        cache.invalidate(crud)
+        assert cache.size() == 0
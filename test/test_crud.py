@@ -4,9 +4,14 @@ from ddbtools import (
     Filter,
     Comparator,
     DBDf,
+    PartitionScheme,
+    SessionPool,
+    clear_bound_vectors,
+    compact_frame,
 )
+import numpy as np
 import pandas as pd
-from datetime import date
+from datetime import date, datetime
 
 
 class TestComparator:
@@ -59,6 +64,20 @@ class TestFilter:
         filter1 = Filter(column="code", comparator=Comparator.isin, value=["AAPL", "MSFT"])
         assert filter1.clause == "code in ['AAPL', 'MSFT']"
 
+    def test_filter_strict(self):
+        """测试严格比较过滤条件"""
+        filter1 = Filter(column="price", comparator=Comparator.gt_strict, value=100)
+        assert filter1.clause == "price > 100"
+        filter2 = Filter(column="price", comparator=Comparator.lt_strict, value=200)
+        assert filter2.clause == "price < 200"
+
+    def test_filter_raw(self):
+        """测试保留原始值"""
+        dt = datetime(2023, 1, 1)
+        filter1 = Filter(column="date", comparator=Comparator.gt, value=dt)
+        assert filter1.raw == dt
+        assert filter1.clause == "date >= 2023.01.01 00:00:00.000"
+
 
 class TestBaseCRUD:
     """测试BaseCRUD类"""
@@ -110,6 +129,237 @@ class TestBaseCRUD:
         assert len(result) == 1
         assert result.iloc[0]["code"] == "AAPL"
     
+    def test_time_slices(self):
+        """测试按时间切片生成查询条件"""
+        crud = self.TestCRUD("dfs://db", "t")
+        conds = [
+            Filter("code", value="AAPL"),
+            Filter("date", Comparator.gt, datetime(2023, 1, 15)),
+            Filter("date", Comparator.lt, datetime(2023, 3, 10)),
+        ]
+        slices = crud._time_slices(None, conds, "date", "MS")
+        clauses = [[cond.clause for cond in part] for part in slices]
+        assert clauses == [
+            ["code = 'AAPL'", "date >= 2023.01.15 00:00:00.000", "date < 2023.02.01 00:00:00.000"],
+            ["code = 'AAPL'", "date >= 2023.02.01 00:00:00.000", "date < 2023.03.01 00:00:00.000"],
+            ["code = 'AAPL'", "date >= 2023.03.01 00:00:00.000", "date <= 2023.03.10 00:00:00.000"],
+        ]
+
+    def test_iter_get(self, session, test_db, test_table):
+        """测试分块读取数据"""
+        data = pd.DataFrame({
+            "date": [pd.Timestamp("2023-01-01"), pd.Timestamp("2023-01-02")],
+            "code": ["AAPL", "MSFT"],
+            "price": [150.0, 200.0],
+            "volume": [1000000, 2000000]
+        })
+        data = DBDf(session, test_db, test_table, data)
+        crud = self.TestCRUD(test_db, test_table)
+        crud.upsert(session, data)
+
+        chunks = list(crud.iter_get(session, chunk_rows=1))
+        assert sum(len(chunk) for chunk in chunks) == len(crud.get(session))
+
+        chunks = list(crud.iter_get(session, time_column="date", freq="D"))
+        assert sum(len(chunk) for chunk in chunks) == len(crud.get(session))
+
+        chunks = list(crud.iter_get(session, partition_column="code"))
+        assert [chunk["code"].iloc[0] for chunk in chunks] == sorted(
+            chunk["code"].iloc[0] for chunk in chunks
+        )
+
+    def test_get_parallel_order(self):
+        """测试并发切片查询按顺序拼接"""
+
+        class SliceCRUD(BaseCRUD):
+            key_cols = ["date"]
+
+            def get(self, session, conds=None, panel=True):
+                return pd.DataFrame({"lo": [conds[0].clause]})
+
+        crud = SliceCRUD("dfs://db", "t")
+        conds = [
+            Filter("date", Comparator.gt, datetime(2023, 1, 1)),
+            Filter("date", Comparator.lt, datetime(2023, 4, 30)),
+        ]
+        with SessionPool(object, size=3) as pool:
+            result = crud.get_parallel(pool, conds, time_column="date", freq="MS")
+        assert list(result["lo"]) == [
+            "date >= 2023.01.01 00:00:00.000",
+            "date >= 2023.02.01 00:00:00.000",
+            "date >= 2023.03.01 00:00:00.000",
+            "date >= 2023.04.01 00:00:00.000",
+        ]
+
+    def test_get_parallel_partitions(self, fake_session):
+        """测试沿RANGE分区边界切分, 每段读取整数个分区"""
+        months = np.array(["2023-01", "2023-02", "2023-03", "2023-04", "2023-05"], dtype="datetime64[M]")
+        fake_session.add_database("dfs://fake", "RANGE", partition_schema=months.astype("datetime64[D]"))
+        data = pd.DataFrame({"date": pd.date_range("2023-01-01", "2023-04-30"), "price": 1.0})
+        fake_session.add_table(
+            "dfs://fake", "bars", data, col_types={"date": "DATE"}, partition_columns="date"
+        )
+        crud = self.TestCRUD("dfs://fake", "bars")
+        conds = [
+            Filter("date", Comparator.gt, datetime(2023, 1, 15)),
+            Filter("date", Comparator.lt, datetime(2023, 4, 10)),
+        ]
+        with SessionPool(lambda: fake_session, size=1) as pool:
+            result = crud.get_parallel(pool, conds)
+        assert [
+            [cond.clause for cond in part]
+            for part in crud._time_slices(
+                fake_session, conds, "date", periods=2, boundaries=months.astype("datetime64[ns]")
+            )
+        ] == [
+            ["date >= 2023.01.15 00:00:00.000", "date < 2023.03.01 00:00:00.000"],
+            ["date >= 2023.03.01 00:00:00.000", "date <= 2023.04.10 00:00:00.000"],
+        ]
+        expected = crud.get(fake_session, conds)
+        assert len(result) == len(expected) == 86
+        assert result.index.is_unique
+        assert list(result["date"]) == list(expected["date"])
+
+    def test_get_parallel_non_temporal(self, fake_session):
+        """测试分区列不是时间类型时不切分"""
+        fake_session.add_database("dfs://fake", "RANGE", partition_schema=np.array([0, 10, 20]))
+        data = pd.DataFrame({"id": np.arange(20), "price": 1.0})
+        fake_session.add_table(
+            "dfs://fake", "items", data, col_types={"id": "INT"}, partition_columns="id"
+        )
+        crud = self.TestCRUD("dfs://fake", "items")
+        conds = [Filter("id", Comparator.gt, 3), Filter("id", Comparator.lt_strict, 15)]
+        with SessionPool(lambda: fake_session, size=2) as pool:
+            result = crud.get_parallel(pool, conds)
+        assert list(result["id"]) == list(range(3, 15))
+        assert list(result.index) == list(range(12))
+        assert not any("1970" in script for script in fake_session.scripts)
+
+    def test_get_parallel(self, session, test_db, test_table):
+        """测试按分区并发查询"""
+        crud = self.TestCRUD(test_db, test_table)
+        pool = SessionPool(lambda: session, size=1)
+        conds = [
+            Filter("date", Comparator.gt, datetime(2023, 1, 1)),
+            Filter("date", Comparator.lt, datetime(2023, 1, 2)),
+        ]
+        result = crud.get_parallel(pool, conds)
+        assert len(result) == len(crud.get(session, conds))
+
+    def test_bulk_upsert_partition_ownership(self):
+        """测试同一分区只由一个连接写入"""
+        written = []
+
+        class Recorder:
+            def __init__(self, session):
+                self.session = session
+
+            def upsert(self, data):
+                written.append((id(self.session), data.copy()))
+
+        class RecordingCRUD(BaseCRUD):
+            key_cols = ["code", "date"]
+
+            def _upserter(self, session):
+                return Recorder(session)
+
+        data = pd.DataFrame(
+            {
+                "date": pd.date_range("2023-01-01", periods=120, freq="7D").repeat(3),
+                "code": ["A", "B", "C"] * 120,
+                "price": range(360),
+            }
+        )
+        # 按年的 RANGE 分区与按代码的 VALUE 分区, 每个分区跨越多个月
+        years = np.array(["2023-01-01", "2024-01-01", "2025-01-01", "2026-01-01"], dtype="datetime64[D]")
+        scheme = PartitionScheme(
+            ["date", "code"], ["RANGE", "VALUE"], [years, np.array(["A", "B", "C"])], ["DATE", "SYMBOL"]
+        )
+        crud = RecordingCRUD("dfs://db", "t")
+        with SessionPool(object, size=3) as pool:
+            summary = crud.bulk_upsert(pool, data, chunk_rows=50, scheme=scheme)
+        assert summary.rows == 360
+        assert summary.writers == 3
+        assert summary.chunks == len(written)
+        assert all(len(chunk) <= 50 for _, chunk in written)
+        owners = {}
+        for session_id, chunk in written:
+            for key in zip(chunk["date"].dt.year, chunk["code"]):
+                assert owners.setdefault(key, session_id) == session_id
+        assert len(owners) == 9
+        assert sorted(pd.concat([chunk for _, chunk in written])["price"]) == list(range(360))
+
+        written.clear()
+        with SessionPool(object, size=3) as pool:
+            summary = crud.bulk_upsert(
+                pool, data, scheme=PartitionScheme(["date"], ["SEQ"], [4], ["DATE"])
+            )
+        assert summary.writers == 1
+        assert len({session_id for session_id, _ in written}) == 1
+
+    def test_bulk_upsert(self, session, test_db, test_table):
+        """测试分块并行写入"""
+        data = pd.DataFrame({
+            "date": [pd.Timestamp("2023-01-01"), pd.Timestamp("2023-01-02")],
+            "code": ["AAPL", "MSFT"],
+            "price": [150.0, 200.0],
+            "volume": [1000000, 2000000]
+        })
+        data = DBDf(session, test_db, test_table, data)
+        crud = self.TestCRUD(test_db, test_table)
+        summary = crud.bulk_upsert(SessionPool(lambda: session, size=1), data)
+        assert summary.rows == 2
+
+    def test_isin_bind_vector(self):
+        """测试大列表isin条件上传为服务器端向量"""
+
+        class UploadSession:
+            def __init__(self):
+                self.uploads = []
+                self.undefined = []
+
+            def upload(self, variables):
+                self.uploads.append(variables)
+
+            def undef(self, name, var_type="VAR"):
+                self.undefined.append(name)
+
+        crud = self.TestCRUD("dfs://db", "t")
+        crud.isin_bind_threshold = 2
+        upload_session = UploadSession()
+        small = Filter("code", Comparator.isin, ["A", "B"])
+        assert crud._clause(upload_session, small) == "code in ['A', 'B']"
+
+        codes = ["A", "B", "C"]
+        clause = crud._clause(upload_session, Filter("code", Comparator.isin, codes))
+        name = clause.split(" in ")[1]
+        assert name.startswith("ddbtools_v_")
+        assert list(upload_session.uploads[0][name]) == codes
+        # 相同取值复用已上传的变量
+        assert crud._clause(upload_session, Filter("code", Comparator.isin, list(codes))) == clause
+        assert len(upload_session.uploads) == 1
+        crud._clause(upload_session, Filter("code", Comparator.isin, ["A", "B", "D"]))
+        assert len(upload_session.uploads) == 2
+
+        # 超出上限时释放最久未使用的向量
+        crud.isin_bind_max_vectors = 2
+        crud._clause(upload_session, Filter("code", Comparator.isin, codes))
+        crud._clause(upload_session, Filter("code", Comparator.isin, ["E", "F", "G"]))
+        assert len(upload_session.uploads) == 3
+        evicted = list(upload_session.uploads[1])[0]
+        assert upload_session.undefined == [evicted]
+        clear_bound_vectors(upload_session)
+        assert sorted(upload_session.undefined[1:]) == sorted([name, list(upload_session.uploads[2])[0]])
+
+    def test_get_isin_bound(self, session, test_db, test_table):
+        """测试使用服务器端向量查询"""
+        crud = self.TestCRUD(test_db, test_table)
+        crud.isin_bind_threshold = 1
+        cond = Filter("code", Comparator.isin, ["AAPL", "MSFT"])
+        result = crud.get(session, cond)
+        crud.isin_bind_threshold = None
+        assert len(result) == len(crud.get(session, cond))
+
     def test_delete(self, session, test_db, test_table):
         """测试删除数据"""
         # 先插入测试数据
@@ -132,6 +382,107 @@ class TestBaseCRUD:
         assert result.iloc[0]["code"] == "MSFT"
 
 
+    def test_delete_keys_chunks(self):
+        """测试按键批量删除分块执行"""
+        from ddbtools.tablemanip import schema_cache
+
+        class ScriptSession:
+            def __init__(self):
+                self.uploads = []
+                self.undefined = []
+                self.scripts = []
+
+            def upload(self, variables):
+                self.uploads.append(next(iter(variables.values())))
+
+            def run(self, script):
+                self.scripts.append(script)
+                return len(self.uploads[-1])
+
+        col_defs = pd.DataFrame(
+            {"name": ["code", "date"], "typeString": ["SYMBOL", "DATE"]}
+        ).set_index("name")
+        schema_cache.put("dfs://offline", "keys", pd.Series({"col_defs": col_defs}))
+        try:
+            crud = self.TestCRUD("dfs://offline", "keys")
+            keys = pd.DataFrame(
+                {
+                    "code": ["A", "B", "C", "A"],
+                    "date": pd.to_datetime(["2023-01-01"] * 3 + ["2023-01-01"]),
+                    "extra": [1, 2, 3, 4],
+                }
+            )
+            script_session = ScriptSession()
+            assert crud.delete_keys(script_session, keys, chunk_rows=2) == 3
+            assert [len(chunk) for chunk in script_session.uploads] == [2, 1]
+            assert list(script_session.uploads[0].columns) == ["code", "date"]
+            assert "cast(date, DATE) as date" in script_session.scripts[0]
+            # 临时变量使用 ddbtools_ 前缀, 执行完后全部释放
+            assert "keys = " not in script_session.scripts[0]
+            assert script_session.scripts[-1].startswith("undef(`ddbtools_delete_keys`")
+            assert len(script_session.scripts) == 3
+        finally:
+            schema_cache.invalidate("dfs://offline")
+
+    def test_delete_keys(self, session, test_db, test_table):
+        """测试按键批量删除数据"""
+        data = pd.DataFrame({
+            "date": [date(2023, 1, 1), date(2023, 1, 2)],
+            "code": ["AAPL", "MSFT"],
+            "price": [150.0, 200.0],
+            "volume": [1000000, 2000000]
+        })
+        data = DBDf(session, test_db, test_table, data)
+        crud = self.TestCRUD(test_db, test_table)
+        crud.upsert(session, data)
+
+        deleted = crud.delete_keys(session, data[["code", "date"]].iloc[:1])
+        assert deleted == 1
+        result = crud.get(session)
+        assert "AAPL" not in set(result["code"])
+
+    def test_aggregate_sql(self):
+        """测试服务器端聚合SQL"""
+        crud = self.TestCRUD("dfs://db", "t")
+        sql = crud.aggregate_sql(
+            None,
+            {"price": ["first", "max", "mean"], "volume": "sum", "vwap": "wavg(price, volume)"},
+            by="code",
+            conds=Filter("code", Comparator.isin, ["AAPL", "MSFT"]),
+            time_column="date",
+            freq="1w",
+        )
+        assert sql == (
+            'select first(price) as price_first, max(price) as price_max, '
+            'avg(price) as price_mean, sum(volume) as volume, wavg(price, volume) as vwap '
+            'from loadTable("dfs://db", "t") where (code in [\'AAPL\', \'MSFT\']) '
+            'group by code, bar(date, 1w) as date'
+        )
+        sql = crud.aggregate_sql(None, {"price": "last"}, time_column="date", freq="1d", fill="prev")
+        assert sql.endswith('group by interval(date, 1d, "prev") as date')
+        with pytest.raises(ValueError):
+            crud.aggregate_sql(None, {"price": "max; drop"})
+        with pytest.raises(ValueError):
+            crud.aggregate_sql(None, {"price": "max"}, freq="1d")
+
+    def test_aggregate(self, session, test_db, test_table):
+        """测试按代码与时间分桶聚合"""
+        data = pd.DataFrame({
+            "date": [date(2023, 1, 2), date(2023, 1, 3), date(2023, 1, 2)],
+            "code": ["AAPL", "AAPL", "MSFT"],
+            "price": [150.0, 152.0, 200.0],
+            "volume": [100, 200, 300]
+        })
+        crud = self.TestCRUD(test_db, test_table)
+        crud.upsert(session, DBDf(session, test_db, test_table, data))
+
+        result = crud.aggregate(session, {"price": ["max", "last"], "volume": "sum"}, by="code")
+        assert list(result["code"]) == ["AAPL", "MSFT"]
+        assert list(result["volume"]) == [300, 300]
+        weekly = crud.resample(session, "1w", {"volume": "sum"}, by="code", time_column="date")
+        assert len(weekly) == 2
+
+
 class TestDBDf:
     """测试DBDf类"""
     
@@ -172,3 +523,108 @@ class TestDBDf:
         assert dbdf["code"].dtype == "object"
         assert dbdf["price"].dtype == "float64"
         assert dbdf["volume"].dtype == "Int64"
+
+    def test_dbdf_conversion(self):
+        """测试类型转换与转换报告"""
+        from ddbtools.tablemanip import schema_cache
+
+        col_defs = pd.DataFrame(
+            {
+                "name": ["date", "code", "price", "flag", "ts"],
+                "typeString": ["DATE", "SYMBOL", "DOUBLE", "BOOL", "TIMESTAMP"],
+            }
+        ).set_index("name")
+        schema_cache.put("dfs://offline", "dbdf", pd.Series({"col_defs": col_defs}))
+        try:
+            data = pd.DataFrame(
+                {
+                    "date": ["2023-01-01", "2023-01-02", "2023-01-03"],
+                    "code": ["AAPL", "MSFT", "IBM"],
+                    "price": [1.0, 2.0, 3.0],
+                    "flag": ["是", "false", "x"],
+                },
+                index=[10, 11, 12],
+            )
+            dbdf = DBDf(None, "dfs://offline", "dbdf", data, report=True)
+            assert list(dbdf.index) == [0, 1, 2]
+            assert pd.api.types.is_datetime64_dtype(dbdf["date"])
+            assert dbdf["code"].dtype == "object"
+            assert dbdf["flag"].tolist()[:2] == [True, False]
+            assert pd.isna(dbdf["flag"].iloc[2])
+            assert dbdf["ts"].isna().all()
+
+            report = dbdf.attrs["conversion_report"]
+            assert not report.loc["price", "converted"]
+            assert report.loc["date", "converted"]
+            assert (report["seconds"] >= 0).all()
+
+            tz_data = pd.DataFrame(
+                {"ts": pd.date_range("2023-01-01", periods=2, freq="h", tz="UTC")}
+            )
+            dbdf = DBDf(None, "dfs://offline", "dbdf", tz_data)
+            assert dbdf["ts"].iloc[0] == pd.Timestamp("2023-01-01 08:00:00")
+        finally:
+            schema_cache.invalidate("dfs://offline")
+
+
+class TestCompact:
+    """测试紧凑表示"""
+
+    def test_compact_frame(self):
+        """测试分类转换与整数降位"""
+        data = pd.DataFrame(
+            {
+                "code": ["000001.SZ", "000002.SZ"] * 50,
+                "name": [f"n{i}" for i in range(100)],
+                "volume": pd.array(range(100), dtype="Int64"),
+                "price": [1.5] * 100,
+            }
+        )
+        result = compact_frame(data, report=True)
+        assert result["code"].dtype == "category"
+        assert result["name"].dtype != "category"
+        assert result["volume"].dtype == "Int8"
+        assert result["price"].dtype == "float64"
+        assert (result["code"].astype(str) == data["code"]).all()
+        report = result.attrs["memory_report"]
+        assert report.loc["total", "bytes_after"] < report.loc["total", "bytes_before"]
+        assert data["code"].dtype != "category"
+
+    def test_get_compact(self, attr_crud, attr_table, fake_session):
+        """测试查询结果的紧凑表示"""
+        attr_table(fake_session, n_dates=20, n_codes=50, n_attributes=5)
+        long = attr_crud.get(fake_session, panel=False, compact=True)
+        assert long["code"].dtype == "category"
+        assert long["attribute"].dtype == "category"
+        report = long.attrs["memory_report"]
+        assert report.loc["code", "bytes_before"] > 5 * report.loc["code", "bytes_after"]
+        assert report.loc["total", "bytes_after"] < report.loc["total", "bytes_before"]
+        assert "memory_report" not in attr_crud.get(fake_session, panel=False).attrs
+
+    def test_dbdf_compact(self, fake_session):
+        """测试DBDf紧凑模式"""
+        data = pd.DataFrame({"code": ["A", "B", "A"], "volume": [1, 2, 3]})
+        fake_session.add_table(
+            "dfs://fake", "bars", data, col_types={"code": "SYMBOL", "volume": "LONG"}
+        )
+        dbdf = DBDf(fake_session, "dfs://fake", "bars", data, compact=True)
+        assert dbdf["code"].dtype == "category"
+        assert dbdf["volume"].dtype == "Int64"
+        assert "memory_report" in dbdf.attrs
+
+
+class TestGetPanel:
+    """测试按属性并发读取面板"""
+
+    def test_get_panel(self, attr_crud, attr_session):
+        """测试与get的面板结果一致"""
+        conds = Filter("datetime", Comparator.gt, datetime(2020, 1, 2))
+        expected = attr_crud.get(attr_session, conds)
+        with SessionPool(lambda: attr_session, size=2) as pool:
+            panel = attr_crud.get_panel(pool, ["attr0", "attr1"], conds)
+            dense = attr_crud.get_panel(pool, ["attr1", "attr0", "missing"], conds, as_array=True)
+        pd.testing.assert_frame_equal(panel, expected, check_names=False, check_index_type=False)
+        assert dense.values.shape == (4, 3, 3)
+        assert np.isnan(dense.values[:, :, 2]).all()
+        assert dense.values[0, 0, 1] == expected.iloc[0]["attr0"]
+        assert list(dense.codes) == ["000000.SZ", "000001.SZ", "000002.SZ"]
@@ -5,7 +5,10 @@ from ddbtools import (
     create_db,
     get_all_dbs,
     get_db_info,
+    get_catalog,
 )
+from ddbtools.dbmanip import DTYPE_ID2NAME, map_dtype
+import numpy as np
 
 
 class TestDbManip:
@@ -36,6 +39,37 @@ class TestDbManip:
         # 验证测试数据库在结果中
         assert "dbpath" in all_dbs.columns
     
+    def test_get_catalog(self, session, test_db, test_table):
+        """测试一次性获取数据库目录"""
+        dbs, col_defs = get_catalog(session)
+        assert test_db in set(dbs["dbpath"])
+        assert list(dbs.columns) == ["dbpath", "engineType", "partitionPlan", "partitiontype"]
+        cols = col_defs[(col_defs["dbPath"] == test_db) & (col_defs["tableName"] == test_table)]
+        assert list(cols["name"]) == ["date", "code", "price", "volume"]
+
+        dbs, col_defs = get_catalog(session, with_tables=False)
+        assert col_defs.empty
+        variables = set(session.run("objs()")["name"])
+        assert not variables & {"dbPaths", "dbSchemas", "colDefs", "c", "n"}
+
+    def test_catalog_script_scope(self, attr_session):
+        """测试目录脚本在匿名函数中执行, 不在会话中留下变量"""
+        dbs, col_defs = get_catalog(attr_session)
+        script = attr_session.scripts[-1].strip()
+        assert script.startswith("def() {") and script.endswith("}()")
+        assert "return [dbSchemas, colDefs]" in script
+        assert list(dbs["dbpath"]) == ["dfs://fake"]
+        assert len(col_defs) == 4
+
+    def test_map_dtype(self):
+        """测试类型ID映射"""
+        assert DTYPE_ID2NAME[6] == "DATE"
+        assert map_dtype(17) == "SYMBOL"
+        assert map_dtype(np.int32(6)) == "DATE"
+        assert map_dtype(np.array([6, 17])) == ["DATE", "SYMBOL"]
+        assert map_dtype(4 + 64) == "INT[]"
+        assert map_dtype("x") == "x"
+
     def test_get_db_info(self, session, test_db):
         """测试获取数据库信息"""
         # 获取数据库信息
@@ -0,0 +1,66 @@
+import pandas as pd
+from ddbtools import BaseCRUD, DBDf, FingerprintIndex
+from ddbtools.testing import patch_table_upserter
+
+
+class BarCRUD(BaseCRUD):
+    key_cols = ["code", "date"]
+
+
+def _bars(prices):
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2023-01-02", "2023-01-02", "2023-01-03"]),
+            "code": ["A", "B", "A"],
+            "price": prices,
+        }
+    )
+
+
+class TestFingerprintIndex:
+    """测试行指纹索引"""
+
+    def test_changed(self):
+        """测试识别新增与变化的行"""
+        index = FingerprintIndex(["code", "date"])
+        data = _bars([1.0, 2.0, 3.0])
+        assert index.changed(data).all()
+        index.update(data)
+        assert len(index) == 3
+        assert not index.changed(data).any()
+        assert not index.changed(data[["price", "code", "date"]]).any()
+        assert list(index.changed(_bars([1.0, 2.5, 3.0]))) == [False, True, False]
+
+    def test_persist(self, tmp_path):
+        """测试保存与加载"""
+        path = tmp_path / "bars.npz"
+        index = FingerprintIndex(["code", "date"], path=path)
+        index.update(_bars([1.0, 2.0, 3.0]))
+        loaded = FingerprintIndex(["code", "date"], path=path)
+        assert len(loaded) == 3
+        assert not loaded.changed(_bars([1.0, 2.0, 3.0])).any()
+        assert len(FingerprintIndex(["code"], path=path)) == 0
+
+
+class TestDiffUpsert:
+    """测试增量写入"""
+
+    def test_diff_upsert(self, fake_session):
+        """测试只发送新增或变化的行"""
+        fake_session.add_table(
+            "dfs://fake", "bars", _bars([1.0, 2.0, 3.0]).head(0), col_types={"date": "DATE"}
+        )
+        crud = BarCRUD("dfs://fake", "bars")
+        index = FingerprintIndex(crud.key_cols)
+        with patch_table_upserter():
+            data = DBDf(fake_session, "dfs://fake", "bars", _bars([1.0, 2.0, 3.0]))
+            first = crud.diff_upsert(fake_session, data, index)
+            second = crud.diff_upsert(fake_session, data, index)
+            changed = DBDf(fake_session, "dfs://fake", "bars", _bars([1.0, 2.5, 3.0]))
+            third = crud.diff_upsert(fake_session, changed, index)
+        assert (first.sent, first.skipped) == (3, 0)
+        assert (second.sent, second.skipped, second.skip_ratio) == (0, 3, 1.0)
+        assert (third.sent, third.skipped) == (1, 2)
+        assert fake_session.rows_written == 4
+        stored = fake_session.table_data("dfs://fake", "bars").sort_values(["date", "code"])
+        assert stored["price"].tolist() == [1.0, 2.5, 3.0]
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+import pytest
+import ddbtools
+
+# 导入耗时预算(秒), 远小于加载 pandas/dolphindb 所需的时间
+IMPORT_BUDGET = 0.3
+
+MEASURE_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from ddbtools import create_db
+elapsed = time.perf_counter() - start
+heavy = [name for name in ("pandas", "numpy", "dolphindb") if name in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+
+def _measure_import():
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE_SCRIPT],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    return float(output[0]), output[1] if len(output) > 1 else ""
+
+
+class TestLazyImport:
+    """测试按需导入"""
+
+    def test_create_db_is_light(self):
+        """测试只导入 create_db 时不加载 pandas/numpy/dolphindb"""
+        _, heavy = _measure_import()
+        assert heavy == ""
+
+    def test_import_budget(self):
+        """测试导入耗时在预算内"""
+        elapsed = min(_measure_import()[0] for _ in range(3))
+        assert elapsed < IMPORT_BUDGET, f"导入耗时 {elapsed:.3f}s 超过预算"
+
+    def test_public_api(self):
+        """测试公共 API 可按名称访问"""
+        for name in ddbtools.__all__:
+            assert getattr(ddbtools, name) is not None
+        assert "BaseCRUD" in dir(ddbtools)
+        assert ddbtools.__version__
+        with pytest.raises(AttributeError):
+            ddbtools.not_a_name
@@ -0,0 +1,59 @@
+import pytest
+from ddbtools import DBDf, instrument
+from ddbtools.instrument import Histogram, Span
+
+
+@pytest.fixture
+def enabled():
+    instrument.reset()
+    instrument.enable()
+    yield
+    instrument.disable()
+    instrument.reset()
+
+
+class TestInstrument:
+    """测试调用耗时统计"""
+
+    def test_disabled(self):
+        """测试关闭时不记录"""
+        instrument.reset()
+        with instrument.span("noop") as sp:
+            sp.set(rows=1)
+        assert instrument.histograms() == {}
+        assert instrument.report().empty
+
+    def test_histogram(self):
+        """测试直方图与分位数"""
+        histogram = Histogram()
+        for seconds in [0.001] * 90 + [0.1] * 10:
+            histogram.add(Span("op", seconds, rows=1))
+        assert histogram.count == 100
+        assert histogram.rows == 100
+        assert 0.001 <= histogram.quantile(0.5) < 0.002
+        assert 0.1 <= histogram.quantile(0.99) <= 0.1 * 2
+
+    def test_hook_and_error(self, enabled):
+        """测试钩子与失败记录"""
+        spans = []
+        instrument.add_hook(spans.append)
+        try:
+            with pytest.raises(ValueError):
+                with instrument.span("fail"):
+                    raise ValueError("x")
+        finally:
+            instrument.remove_hook(spans.append)
+        assert spans[0].op == "fail"
+        assert "ValueError" in spans[0].error
+        assert instrument.report().loc["fail", "errors"] == 1
+
+    def test_crud_spans(self, enabled, attr_crud, attr_table):
+        """测试查询与类型转换的统计"""
+        fake_session = attr_table(n_dates=4)
+        data = fake_session.table_data("dfs://fake", "attr_fake")
+        attr_crud.get(fake_session)
+        DBDf(fake_session, "dfs://fake", "attr_fake", data)
+        report = instrument.report()
+        assert report.loc["crud.get.pivotby", "rows"] == 12
+        assert report.loc["crud.DBDf", "rows"] == len(data)
+        assert report.loc["tablemanip.schema.run", "count"] == 1
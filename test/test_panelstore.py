@@ -0,0 +1,120 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from ddbtools import AttributePanel, PanelStore
+
+
+def _panel(dates, codes, attributes, start=0.0):
+    shape = (len(dates), len(codes), len(attributes))
+    values = np.arange(np.prod(shape), dtype=float).reshape(shape) + start
+    return AttributePanel(
+        values,
+        pd.to_datetime(dates).to_numpy(),
+        np.array(codes, dtype=object),
+        list(attributes),
+    )
+
+
+class TestPanelStore:
+    """测试本地内存映射面板"""
+
+    def test_write_read(self, tmp_path):
+        """测试写入后按日期、代码与属性切片读取"""
+        store = PanelStore(tmp_path)
+        panel = _panel(["2023-01-02", "2023-01-03", "2023-01-04"], ["A", "B", "C"], ["close", "open"])
+        store.write(panel)
+
+        result = store.read()
+        assert isinstance(result.values, np.memmap)
+        np.testing.assert_array_equal(result.values, panel.values)
+        assert list(result.codes) == ["A", "B", "C"]
+
+        sliced = store.read(start="2023-01-03", end="2023-01-03", codes=["B", "C"], attributes="open")
+        assert isinstance(sliced.values, np.memmap)
+        np.testing.assert_array_equal(sliced.values, panel.values[1:2, 1:3, 1:2])
+        assert sliced.attributes == ["open"]
+
+        picked = store.read(codes=["C", "A"], attributes=["open", "close"])
+        np.testing.assert_array_equal(picked.values, panel.values[:, [2, 0]][..., [1, 0]])
+
+        with pytest.raises(KeyError):
+            store.read(codes=["D"])
+
+    def test_append(self, tmp_path):
+        """测试追加新日期与覆盖已有日期"""
+        store = PanelStore(tmp_path)
+        store.append(_panel(["2023-01-02", "2023-01-03"], ["A", "B"], ["close"]))
+        store.append(_panel(["2023-01-03", "2023-01-04"], ["B"], ["close"], start=100.0))
+
+        result = store.read()
+        assert len(result.dates) == 3
+        assert result.values[1, 1, 0] == 100.0
+        assert result.values[1, 0, 0] == 2.0
+        assert result.values[2, 1, 0] == 101.0
+        assert np.isnan(result.values[2, 0, 0])
+
+        with pytest.raises(ValueError):
+            store.append(_panel(["2023-01-01", "2023-01-05"], ["A"], ["close"]))
+        with pytest.raises(ValueError):
+            store.append(_panel(["2023-01-01", "2023-01-03"], ["A"], ["close"], start=500.0))
+        assert store.read().values[1, 0, 0] == 2.0
+
+    def test_generations(self, tmp_path):
+        """测试读取方持有的一代不受后续写入影响, 只保留最近两代"""
+        store = PanelStore(tmp_path)
+        store.write(_panel(["2023-01-02", "2023-01-03"], ["A", "B"], ["close"]))
+        held = store.read()
+        store.append(_panel(["2023-01-04"], ["A", "B"], ["close"], start=10.0))
+        store.append(_panel(["2023-01-03"], ["A"], ["close"], start=50.0))
+        store.write(_panel(["2023-02-01"], ["C"], ["open"], start=90.0))
+
+        np.testing.assert_array_equal(held.values[:, :, 0], [[0.0, 1.0], [2.0, 3.0]])
+        result = store.read()
+        assert list(result.codes) == ["C"]
+        assert result.values[0, 0, 0] == 90.0
+        assert sorted(path.name for path in tmp_path.glob("gen-*")) == ["gen-000002", "gen-000003"]
+
+        # 没有 current.json 的目录按旧版布局读取
+        values = PanelStore(tmp_path / "gen-000002").read().values[:, :, 0]
+        np.testing.assert_array_equal(values, [[0.0, 1.0], [50.0, 3.0], [10.0, 11.0]])
+
+    def test_writer_lock(self, tmp_path):
+        """测试写入方之间通过文件锁互斥"""
+        store = PanelStore(tmp_path)
+        store.write(_panel(["2023-01-02"], ["A"], ["close"]))
+        other = PanelStore(tmp_path)
+        with store._writer_lock():
+            writer = threading.Thread(
+                target=other.append, args=(_panel(["2023-01-03"], ["A"], ["close"]),)
+            )
+            writer.start()
+            writer.join(0.2)
+            assert writer.is_alive()
+            assert len(store.read().dates) == 1
+        writer.join(5)
+        assert len(store.read().dates) == 2
+
+    def test_new_axes(self, tmp_path):
+        """测试出现新的代码与属性时重写"""
+        store = PanelStore(tmp_path)
+        store.write(_panel(["2023-01-02"], ["A", "C"], ["close"]))
+        store.append(_panel(["2023-01-03"], ["B"], ["open"], start=7.0))
+
+        result = store.read()
+        assert list(result.codes) == ["A", "B", "C"]
+        assert result.attributes == ["close", "open"]
+        assert result.values[0, 2, 0] == 1.0
+        assert result.values[1, 1, 1] == 7.0
+        assert np.isnan(result.values[1, 1, 0])
+
+    def test_frame(self, tmp_path):
+        """测试与 get 返回的面板宽表互相转换"""
+        index = pd.MultiIndex.from_arrays(
+            [pd.to_datetime(["2023-01-02", "2023-01-02", "2023-01-03"]), ["A", "B", "A"]],
+            names=["datetime", "code"],
+        )
+        data = pd.DataFrame({"close": [1.0, 2.0, 3.0]}, index=index)
+        store = PanelStore(tmp_path)
+        store.write(data)
+        pd.testing.assert_frame_equal(store.read().to_frame(), data, check_index_type=False)
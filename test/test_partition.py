@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ddbtools import PartitionScheme, get_partition_scheme
+from ddbtools.testing import FakeSession
+
+
+def _same_partition(ids, expected):
+    # 编号不同但分组方式相同
+    return pd.crosstab(ids, expected).gt(0).sum(axis=1).eq(1).all() and len(set(ids)) == len(set(expected))
+
+
+class TestPartitionScheme:
+    """测试按分区方案计算每行所属的分区"""
+
+    def test_value_temporal(self):
+        """测试TIMESTAMP列写入按DATE分区的数据库时按天分组"""
+        scheme = PartitionScheme(
+            ["ts"], ["VALUE"], [np.array(["2023-01-02"], dtype="datetime64[D]")], ["TIMESTAMP"]
+        )
+        data = pd.DataFrame(
+            {"ts": pd.to_datetime(["2023-01-02 09:30", "2023-01-02 15:00", "2023-01-03 09:30"])}
+        )
+        assert list(scheme.partition_ids(data)) == [0, 0, 1]
+
+    def test_range_and_list(self):
+        """测试RANGE与LIST分区"""
+        months = np.array(["2023-01", "2023-04", "2023-07"], dtype="datetime64[M]")
+        scheme = PartitionScheme(
+            ["date", "code"],
+            ["RANGE", "LIST"],
+            [months, [np.array(["A", "B"]), np.array(["C"])]],
+            ["DATE", "SYMBOL"],
+        )
+        data = pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2023-01-05", "2023-03-31", "2023-04-01", "2023-02-01"]),
+                "code": ["A", "B", "A", "C"],
+            }
+        )
+        assert _same_partition(scheme.partition_ids(data), [0, 0, 1, 2])
+
+    def test_hash(self, fake_session):
+        """测试HASH分区在服务器端计算分桶"""
+        scheme = PartitionScheme(["code"], ["HASH"], [2], ["SYMBOL"])
+        data = pd.DataFrame({"code": ["A", "B", "C", "D", "A"]})
+        ids = scheme.partition_ids(data, fake_session)
+        assert ids[0] == ids[4]
+        assert len(set(ids)) <= 2
+        assert "ddbtools_partition_values" not in fake_session.variables
+        with pytest.raises(ValueError):
+            scheme.partition_ids(data)
+
+    def test_unsupported(self):
+        """测试无法在本地确定的分区"""
+        data = pd.DataFrame({"id": [1, 2]})
+        assert not PartitionScheme(["id"], ["SEQ"], [4], ["INT"]).supported(data.columns)
+        assert not PartitionScheme(["date"], ["VALUE"], [[]], ["DATE"]).supported(data.columns)
+        with pytest.raises(ValueError):
+            PartitionScheme([], [], [], []).partition_ids(data)
+
+    def test_get_partition_scheme(self, fake_session):
+        """测试从数据库读取组合分区方案"""
+        months = np.array(["2023-01", "2023-02"], dtype="datetime64[M]")
+        fake_session.add_database(
+            "dfs://compo",
+            partition_type=["RANGE", "VALUE"],
+            partition_schema=[months, np.array(["f1", "f2"])],
+        )
+        fake_session.add_table(
+            "dfs://compo",
+            "t",
+            pd.DataFrame({"date": pd.to_datetime(["2023-01-03"]), "code": ["f1"], "price": [1.0]}),
+            col_types={"date": "DATE"},
+            partition_columns=["date", "code"],
+        )
+        scheme = get_partition_scheme(fake_session, "dfs://compo", "t")
+        assert scheme.types == ["RANGE", "VALUE"]
+        assert scheme.col_types == ["DATE", "SYMBOL"]
+        assert scheme.supported()
@@ -0,0 +1,108 @@
+import threading
+import time
+import pytest
+from ddbtools import SessionPool, PooledCRUD, BaseCRUD
+
+
+class DummySession:
+    """不连接服务器的占位会话"""
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestSessionPool:
+    """测试SessionPool"""
+
+    def test_submit_and_stats(self):
+        """测试提交任务与统计信息"""
+        with SessionPool(DummySession, size=2) as pool:
+            future = pool.submit(lambda session, x: x * 2, 21)
+            assert future.result() == 42
+            stats = pool.stats()
+            assert stats.size == 2
+            assert stats.completed == 1
+            assert stats.queued == 0
+            assert stats.in_flight == 0
+
+    def test_concurrency(self):
+        """测试任务在多个会话上并发执行"""
+        barrier = threading.Barrier(3, timeout=5)
+        sessions = set()
+
+        def task(session):
+            sessions.add(id(session))
+            barrier.wait()
+            return True
+
+        with SessionPool(DummySession, size=3) as pool:
+            assert all(pool.map(task, [{}, {}, {}]))
+        assert len(sessions) == 3
+
+    def test_max_concurrency(self):
+        """测试并发上限"""
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def task(session):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+        with SessionPool(DummySession, size=4, max_concurrency=2) as pool:
+            pool.map(task, [{} for _ in range(8)])
+        assert max(peak) <= 2
+
+    def test_failed_task(self):
+        """测试失败任务计数"""
+
+        def task(session):
+            raise ValueError("boom")
+
+        with SessionPool(DummySession, size=1) as pool:
+            with pytest.raises(ValueError):
+                pool.submit(task).result()
+            assert pool.stats().failed == 1
+
+    def test_cancel_queued(self):
+        """测试取消排队中的任务"""
+        release = threading.Event()
+        with SessionPool(DummySession, size=1) as pool:
+            blocker = pool.submit(lambda session: release.wait(5))
+            queued = pool.submit(lambda session: None)
+            assert queued.cancel()
+            release.set()
+            blocker.result()
+            assert pool.stats().queued == 0
+
+    def test_close(self):
+        """测试关闭连接池"""
+        pool = SessionPool(DummySession, size=2)
+        pool.close()
+        assert all(session.closed for session in pool._all_sessions)
+        with pytest.raises(RuntimeError):
+            pool.submit(lambda session: None)
+
+
+class TestPooledCRUD:
+    """测试PooledCRUD"""
+
+    class EchoCRUD(BaseCRUD):
+        key_cols = ["code"]
+
+        def get(self, session, conds=None, panel=True):
+            return conds
+
+    def test_get_many(self):
+        """测试并发查询保持顺序"""
+        crud = self.EchoCRUD("dfs://db", "t")
+        with SessionPool(DummySession, size=3) as pool:
+            result = PooledCRUD(crud, pool).get_many(list(range(10)))
+        assert result == list(range(10))
@@ -0,0 +1,94 @@
+import threading
+import pandas as pd
+import pytest
+from ddbtools import Router, RoutedCRUD, SessionPool
+from ddbtools.testing import FakeSession, patch_table_upserter
+
+
+class DownSession(FakeSession):
+    """模拟不可用的节点"""
+
+    def run(self, script, *args, **kwargs):
+        raise ConnectionError("节点不可用")
+
+
+@pytest.fixture
+def sessions(attr_table):
+    return {name: attr_table(n_dates=3, n_codes=2) for name in ["n0", "n1", "n2"]}
+
+
+def _router(sessions, **kwargs):
+    return Router(
+        {name: SessionPool(lambda s=session: s, size=1) for name, session in sessions.items()},
+        **kwargs,
+    )
+
+
+class TestRouter:
+    """测试多节点请求路由"""
+
+    def test_round_robin(self, sessions):
+        """测试只读请求轮流分配, 写入固定在主节点"""
+        with _router(sessions, primary="n1", policy="round_robin") as router:
+            used = [router.read(lambda session: session) for _ in range(6)]
+            assert {id(session) for session in used} == {id(s) for s in sessions.values()}
+            assert all(router.write(lambda session: session) is sessions["n1"] for _ in range(3))
+            stats = {node.name: node for node in router.stats()}
+        assert stats["n0"].completed == 2
+        assert stats["n1"].completed == 5
+        assert stats["n1"].primary
+
+    def test_least_outstanding(self, sessions):
+        """测试选择未完成请求最少的节点"""
+        release = threading.Event()
+        with _router(sessions) as router:
+            blocked = router.submit_read(lambda session: release.wait(5) and session)
+            used = {id(router.read(lambda session: session)) for _ in range(4)}
+            release.set()
+            assert id(blocked.result()) not in used
+            assert len(used) == 2
+
+    def test_health_check(self, attr_table, sessions):
+        """测试健康检查排除不可用节点"""
+        sessions["n2"] = attr_table(DownSession(), n_dates=3, n_codes=2)
+        with _router(sessions, read_from_primary=False) as router:
+            stats = {node.name: node for node in router.check_health()}
+            assert not stats["n2"].healthy
+            assert stats["n1"].check_latency >= 0
+            assert all(router.read(lambda session: session) is sessions["n1"] for _ in range(3))
+
+            sessions["n1"].run = lambda *args, **kwargs: None
+            router.check_health()
+            assert router.read(lambda session: session) is sessions["n0"]
+
+            sessions["n0"].run = DownSession.run.__get__(sessions["n0"])
+            router.check_health()
+            with pytest.raises(RuntimeError):
+                router.read(lambda session: session)
+            with pytest.raises(RuntimeError):
+                router.write(lambda session: session)
+
+    def test_health_check_busy(self, sessions):
+        """测试节点只是忙碌时健康检查不会将其判为不可用"""
+        release = threading.Event()
+        with _router(sessions, primary="n0") as router:
+            blocked = router.submit_write(lambda session: release.wait(5))
+            stats = {node.name: node for node in router.check_health(timeout=0.5)}
+            release.set()
+            assert blocked.result()
+        assert all(node.healthy for node in stats.values())
+        assert stats["n0"].check_latency < 0.5
+
+    def test_routed_crud(self, attr_crud, sessions):
+        """测试读取分散到各节点, 写入只发往主节点"""
+        with _router(sessions, policy="round_robin") as router:
+            routed = RoutedCRUD(attr_crud, router)
+            panels = routed.get_many([None, None, None])
+            assert all(panel.shape == (6, 2) for panel in panels)
+            assert router.get_table_columns("dfs://fake", "attr_fake").index.name == "name"
+            data = attr_crud.get(sessions["n0"], panel=False).head(1).assign(value=0.0)
+            with patch_table_upserter():
+                routed.upsert(data)
+        assert sessions["n0"].rows_written == 1
+        assert sessions["n1"].rows_written == 0
+        assert all(isinstance(panel, pd.DataFrame) for panel in panels)
@@ -5,7 +5,12 @@ from ddbtools import (
     get_table_info,
     get_table_columns,
     get_all_tables,
+    add_columns,
+    delete_table,
     DbColumn,
+    SchemaCache,
+    SchemaPlan,
+    schema_cache,
 )
 
 
@@ -78,3 +83,187 @@ class TestTableManip:
         assert test_table in all_tables
 
 
+
+
+class CountingSession:
+    """记录 schema 查询次数的占位会话"""
+
+    def __init__(self):
+        self.schema_calls = 0
+
+    def table(self, *args, **kwargs):
+        pass
+
+    def run(self, script):
+        self.schema_calls += 1
+        return {
+            "colDefs": pd.DataFrame(
+                {"name": ["date", "price"], "typeString": ["DATE", "DOUBLE"]}
+            ),
+            "compressMethods": pd.DataFrame(
+                {"name": ["date", "price"], "compressMethods": ["delta", "lz4"]}
+            ),
+            "partitionColumnName": "date",
+        }
+
+
+class TestSchemaCache:
+    """测试表结构缓存"""
+
+    def test_lru_and_ttl(self):
+        """测试LRU与TTL淘汰"""
+        cache = SchemaCache(maxsize=2, ttl=None)
+        cache.put("db", "a", 1)
+        cache.put("db", "b", 2)
+        assert cache.get("db", "a") == 1
+        cache.put("db", "c", 3)
+        assert cache.get("db", "b") is None
+        assert cache.get("db", "a") == 1
+        assert cache.stats() == {"hits": 2, "misses": 1, "size": 2}
+
+        cache = SchemaCache(ttl=0)
+        cache.put("db", "a", 1)
+        assert cache.get("db", "a") is None
+
+    def test_invalidate(self):
+        """测试缓存失效"""
+        cache = SchemaCache()
+        cache.put("db1", "a", 1)
+        cache.put("db1", "b", 2)
+        cache.put("db2", "a", 3)
+        cache.invalidate("db1", "a")
+        assert cache.get("db1", "a") is None
+        cache.invalidate("db1")
+        assert cache.get("db1", "b") is None
+        assert cache.get("db2", "a") == 3
+        cache.invalidate()
+        assert len(cache) == 0
+
+    def test_get_table_columns_cached(self):
+        """测试重复获取表列信息只查询一次"""
+        schema_cache.invalidate("dfs://cache_db", "t")
+        session = CountingSession()
+        cols = get_table_columns(session, "dfs://cache_db", "t")
+        cols["pd_dtype"] = "x"
+        cols = get_table_columns(session, "dfs://cache_db", "t")
+        info = get_table_info(session, "dfs://cache_db", "t")
+        assert session.schema_calls == 1
+        assert "pd_dtype" not in cols.columns
+        assert info["partition_columns"] == "date"
+        get_table_columns(session, "dfs://cache_db", "t", use_cache=False)
+        assert session.schema_calls == 2
+        schema_cache.invalidate("dfs://cache_db", "t")
+
+    def test_add_columns_invalidates(self, session, test_db):
+        """测试添加列后缓存失效"""
+        test_table_name = "test_add_columns"
+        try:
+            create_table(
+                session,
+                test_db,
+                test_table_name,
+                [
+                    DbColumn(name="date", dtype="DATE"),
+                    DbColumn(name="code", dtype="SYMBOL"),
+                ],
+                partition_by="date, code",
+                sortColumns="`code,`date",
+            )
+            assert "price" not in get_table_columns(session, test_db, test_table_name).index
+            add_columns(session, test_db, test_table_name, DbColumn("price", "DOUBLE", "价格"))
+            assert "price" in get_table_columns(session, test_db, test_table_name).index
+        finally:
+            session.run(f'drop table "{test_db}"."{test_table_name}"')
+
+
+class PlanSession:
+    """按脚本内容返回表存在情况的占位会话"""
+
+    def __init__(self, tables, errors=None):
+        self.tables = tables
+        self.errors = errors or {}
+        self.scripts = []
+        self.undefined = []
+
+    def undef(self, name, var_type="VAR"):
+        self.undefined.append(name)
+
+    def run(self, script):
+        self.scripts.append(script)
+        if "existsTable" in script:
+            tables = script.rsplit("[", 1)[1].split("]")[0]
+            targets = [("dfs://plan", name) for name in tables.replace('"', "").split(", ")]
+            return [
+                [target in self.tables, self.tables.get(target, [])]
+                for target in targets
+            ]
+        n = script.count("try {")
+        return [self.errors.get(i, "") for i in range(n)]
+
+
+class TestSchemaPlan:
+    """测试批量表结构变更"""
+
+    def _plan(self):
+        return (
+            SchemaPlan()
+            .create_table(
+                "dfs://plan",
+                "bars",
+                [DbColumn("date", "DATE"), DbColumn("code", "SYMBOL")],
+                partition_by="date",
+            )
+            .add_columns("dfs://plan", "bars", [DbColumn("price", "DOUBLE", "价格")])
+            .create_attribute_table("dfs://plan", "attr_a")
+            .add_columns("dfs://plan", "old", [DbColumn("a", "INT"), DbColumn("b", "INT")])
+            .delete_table("dfs://plan", "gone")
+            .add_columns("dfs://plan", "missing", DbColumn("x", "INT"))
+        )
+
+    def test_apply(self):
+        """测试一次检查、一次执行并返回逐项报告"""
+        session = PlanSession({("dfs://plan", "attr_a"): ["datetime"], ("dfs://plan", "old"): ["a"]})
+        report = self._plan().apply(session)
+        assert len(session.scripts) == 2
+        assert " = " not in session.scripts[0]
+        assert session.undefined == ["ddbtools_plan_errors"]
+        assert list(report["status"]) == ["applied", "applied", "skipped", "applied", "skipped", "failed"]
+        assert report.loc[3, "columns"] == "b"
+        script = report.attrs["script"]
+        assert script.count("try {") == 3
+        assert 'create table "dfs://plan"."bars"' in script
+        assert 'addColumn(loadTable("dfs://plan", "old"), ["b"], [INT])' in script
+
+    def test_apply_live(self, session, test_db):
+        """测试在服务器上批量建表、加列与删表"""
+        plan = (
+            SchemaPlan()
+            .create_table(
+                test_db,
+                "test_plan",
+                [DbColumn("date", "DATE"), DbColumn("code", "SYMBOL")],
+                partition_by="date, code",
+                sortColumns="`code,`date",
+            )
+            .add_columns(test_db, "test_plan", DbColumn("price", "DOUBLE", "价格"))
+        )
+        try:
+            report = plan.apply(session)
+            assert list(report["status"]) == ["applied", "applied"]
+            assert "price" in get_table_columns(session, test_db, "test_plan").index
+            assert list(plan.apply(session)["status"]) == ["skipped", "skipped"]
+        finally:
+            assert "成功" in delete_table(session, test_db, "test_plan")
+
+    def test_failed_and_dry_run(self):
+        """测试服务器端失败与只检查模式"""
+        tables = {("dfs://plan", "gone"): ["a"]}
+        report = self._plan().apply(PlanSession(tables, errors={0: "boom"}))
+        assert report.loc[0, "status"] == "failed"
+        assert report.loc[0, "message"] == "boom"
+        assert report.loc[4, "status"] == "applied"
+
+        session = PlanSession(tables)
+        report = self._plan().apply(session, dry_run=True)
+        assert len(session.scripts) == 1
+        assert (report["status"] == "planned").sum() == 4
@@ -0,0 +1,137 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from ddbtools import BaseCRUD, Comparator, DBDf, Filter, clear_templates
+
+
+class BarCRUD(BaseCRUD):
+    key_cols = ["code", "date"]
+
+
+class TemplateSession:
+    """记录脚本与函数调用参数的占位会话"""
+
+    def __init__(self, result):
+        self.result = result
+        self.scripts = []
+        self.calls = []
+        self.undefined = []
+
+    def run(self, script, *args):
+        if args:
+            self.calls.append((script, args))
+            return self.result
+        self.scripts.append(script)
+
+    def undef(self, name, var_type):
+        self.undefined.append((name, var_type))
+
+
+class ViewSession(TemplateSession):
+    """共享同一组函数视图的节点会话"""
+
+    def __init__(self, result, views, host):
+        super().__init__(result)
+        self.views = views
+        self.host = host
+        self.port = 8848
+
+    def run(self, script, *args):
+        super().run(script, *args)
+        if "getFunctionViews()" in script:
+            return script.split('"')[1] in self.views
+        if script.startswith("addFunctionView("):
+            self.views.add(script[len("addFunctionView("):-1])
+        return self.result
+
+
+class TestQueryTemplate:
+    """测试参数化查询模板"""
+
+    def test_define_once(self):
+        """测试模板只定义一次并按参数调用"""
+        crud = BarCRUD("dfs://db", "bars")
+        template = crud.template(
+            [
+                Filter("code", Comparator.isin),
+                ("date", Comparator.gt),
+                ("name", Comparator.like),
+            ]
+        )
+        assert template.script.endswith(
+            'return select * from loadTable("dfs://db", "bars") '
+            'where code in p0, date >= p1, name like "%" + p2 + "%"\n}'
+        )
+        session = TemplateSession(pd.DataFrame({"code": ["A"]}))
+        for _ in range(3):
+            result = template(session, ["A", "B"], datetime(2023, 1, 1), "x")
+        assert len(result) == 1
+        assert session.scripts == [template.script]
+        name, args = session.calls[0]
+        assert name == template.name
+        assert list(args[0]) == ["A", "B"]
+        assert args[1] == np.datetime64("2023-01-01")
+        assert crud.template([("code", Comparator.isin)]).name != template.name
+        with pytest.raises(ValueError):
+            template(session, ["A"])
+        clear_templates(session)
+        assert session.undefined == [(template.name, "DEF")]
+
+    def test_function_view(self):
+        """测试函数视图在集群中只注册一次, 其他会话直接调用"""
+        crud = BarCRUD("dfs://db", "bars_view")
+        template = crud.template([("code", Comparator.eq)], function_view=True)
+        views = set()
+        data = pd.DataFrame({"code": ["A"]})
+        first = ViewSession(data, views, "node1")
+        template(first, "A")
+        assert first.scripts[1:] == [template.script, f"addFunctionView({template.name})"]
+        assert first.undefined == [(template.name, "DEF")]
+        assert views == {template.name}
+
+        second = ViewSession(data, views, "node2")
+        for _ in range(2):
+            assert len(template(second, "A")) == 1
+        assert len(second.scripts) == 1 and "getFunctionViews()" in second.scripts[0]
+        assert second.calls == [(template.name, ("A",))] * 2
+
+        third = ViewSession(data, views, "node1")
+        template(third, "A")
+        assert third.scripts == []
+
+    def test_panel(self, attr_crud):
+        """测试属性表面板模板"""
+        template = attr_crud.template([("attribute", Comparator.eq)])
+        assert "pivot by datetime, code, attribute" in template.script
+        data = pd.DataFrame(
+            {
+                "datetime": pd.to_datetime(["2023-01-02", "2023-01-01"]),
+                "code": ["A", "A"],
+                "close": [2.0, 1.0],
+            }
+        )
+        result = template(TemplateSession(data), "close")
+        assert list(result.index.names) == ["datetime", "code"]
+        assert list(result["close"]) == [1.0, 2.0]
+
+    def test_live(self, session, test_db, test_table):
+        """测试在服务器上调用模板"""
+        data = pd.DataFrame({
+            "date": [pd.Timestamp("2023-01-01"), pd.Timestamp("2023-01-02")],
+            "code": ["AAPL", "MSFT"],
+            "price": [150.0, 200.0],
+            "volume": [1000000, 2000000]
+        })
+        crud = BarCRUD(test_db, test_table)
+        crud.upsert(session, DBDf(session, test_db, test_table, data))
+        template = crud.template([("code", Comparator.isin), ("date", Comparator.gt)])
+        result = template(session, ["AAPL", "MSFT"], datetime(2023, 1, 2))
+        expected = crud.get(
+            session,
+            [
+                Filter("code", Comparator.isin, ["AAPL", "MSFT"]),
+                Filter("date", Comparator.gt, datetime(2023, 1, 2)),
+            ],
+        )
+        assert len(result) == len(expected)
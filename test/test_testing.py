@@ -0,0 +1,73 @@
+import pytest
+import pandas as pd
+from datetime import datetime
+from ddbtools import (
+    Filter,
+    Comparator,
+    DBDf,
+    get_all_dbs,
+    get_catalog,
+    get_table_info,
+)
+from ddbtools.testing import patch_table_upserter
+
+
+class TestFakeSession:
+    """测试离线会话替身"""
+
+    def test_get_panel(self, attr_crud, attr_session):
+        """测试属性表面板查询"""
+        panel = attr_crud.get(attr_session)
+        assert panel.shape == (15, 2)
+        assert list(panel.index.names) == ["datetime", "code"]
+
+    def test_get_filters(self, attr_crud, attr_session):
+        """测试过滤条件"""
+        result = attr_crud.get(
+            attr_session,
+            [
+                Filter("datetime", Comparator.gt, datetime(2020, 1, 4)),
+                Filter("code", Comparator.isin, ["000001.SZ"]),
+                Filter("attribute", value="attr1"),
+            ],
+            panel=False,
+        )
+        assert len(result) == 2
+        assert attr_session.scripts == []
+
+    def test_iter_get(self, attr_crud, attr_session):
+        """测试分块读取"""
+        chunks = list(attr_crud.iter_get(attr_session, time_column="datetime", freq="2D", panel=False))
+        assert [len(chunk) for chunk in chunks] == [12, 18]
+        chunks = list(attr_crud.iter_get(attr_session, chunk_rows=10, panel=False))
+        assert [len(chunk) for chunk in chunks] == [10, 10, 10]
+        assert list(chunks[1].index) == list(range(10))
+        assert len(pd.concat(chunks).drop_duplicates()) == 30
+        with pytest.raises(ValueError):
+            list(attr_crud.iter_get(attr_session, chunk_rows=10))
+
+    def test_schema_and_catalog(self, attr_session):
+        """测试表结构与数据库目录"""
+        info = get_table_info(attr_session, "dfs://fake", "attr_fake")
+        assert info["partition_columns"] == ["datetime", "attribute"]
+        assert info["col_defs"].loc["datetime", "typeString"] == "DATE"
+        assert list(get_all_dbs(attr_session)["dbpath"]) == ["dfs://fake"]
+        _, col_defs = get_catalog(attr_session)
+        assert len(col_defs) == 4
+
+    def test_unknown_script(self, attr_session):
+        """测试未识别的脚本报错, 不静默返回 None"""
+        with pytest.raises(NotImplementedError):
+            attr_session.run("addFunctionView(f)")
+        assert attr_session.scripts[-1] == "addFunctionView(f)"
+
+    def test_upsert(self, attr_crud, attr_session):
+        """测试按主键合并写入"""
+        data = attr_crud.get(attr_session, panel=False).head(2).assign(value=0.0)
+        with patch_table_upserter():
+            attr_crud.upsert(attr_session, DBDf(attr_session, "dfs://fake", "attr_fake", data))
+        result = attr_crud.get(attr_session, panel=False)
+        assert len(result) == 30
+        assert (result["value"] == 0.0).sum() == 2
+        assert attr_session.rows_written == 2
+
@@ -0,0 +1,147 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from ddbtools import Comparator, Filter, SessionPool, export_table, import_table
+from ddbtools import transfer
+from ddbtools.testing import FakeSession, make_attribute_frame, patch_table_upserter
+
+
+def _target(source, bounds=None):
+    session = FakeSession()
+    partition_columns = None
+    if bounds is not None:
+        session.add_database("dfs://fake", "RANGE", partition_schema=_dates(bounds))
+        partition_columns = ["datetime"]
+    empty = source.table_data("dfs://fake", "attr_fake").iloc[:0]
+    session.add_table(
+        "dfs://fake",
+        "attr_fake",
+        empty,
+        col_types={"datetime": "DATE"},
+        partition_columns=partition_columns,
+    )
+    return session
+
+
+def _dates(bounds):
+    return np.array(bounds, dtype="datetime64[D]")
+
+
+def _sorted(data):
+    return data.sort_values(["datetime", "code", "attribute"]).reset_index(drop=True)
+
+
+class TestTransfer:
+    """测试表与Parquet目录之间的导出与导入"""
+
+    def test_export_import(self, attr_table, tmp_path):
+        """测试按分区导出后导入, 数据一致"""
+        source = attr_table(n_dates=4)
+        with SessionPool(lambda: source, size=2) as pool:
+            summary = export_table(pool, "dfs://fake", "attr_fake", tmp_path, chunk_rows=5)
+        assert summary.parts == 4
+        assert summary.rows == 24
+        manifest = json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8"))
+        assert manifest["partition_column"] == "datetime"
+        assert manifest["schema"]["sort_columns"] == ["code", "datetime"]
+        assert [col["dtype"] for col in manifest["schema"]["columns"]][0] == "DATE"
+        assert len(list(tmp_path.glob("*.parquet"))) == 4
+
+        target = _target(source)
+        with SessionPool(lambda: target, size=2) as pool, patch_table_upserter():
+            summary = import_table(pool, tmp_path, chunk_rows=4)
+            assert summary.rows == 24
+            again = import_table(pool, tmp_path, resume=False)
+        assert again.rows == 24
+        result = target.table_data("dfs://fake", "attr_fake")
+        expected = source.table_data("dfs://fake", "attr_fake")
+        pd.testing.assert_frame_equal(
+            _sorted(result), _sorted(expected), check_dtype=False
+        )
+
+    def test_partition_scheme(self, attr_table, tmp_path):
+        """测试按数据库分区导出, 并按目标表分区分组导入"""
+        source = FakeSession()
+        source.add_database(
+            "dfs://fake", "RANGE", partition_schema=_dates(["2020-01-01", "2020-01-03", "2020-01-05"])
+        )
+        attr_table(source, n_dates=4)
+        with SessionPool(lambda: source, size=2) as pool:
+            summary = export_table(pool, "dfs://fake", "attr_fake", tmp_path)
+        assert (summary.parts, summary.rows) == (2, 24)
+        manifest = json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8"))
+        assert manifest["partition_scheme"] == "datetime: RANGE"
+        assert all(info["rows"] == 12 for info in manifest["parts"].values())
+
+        _, pq = transfer._import_parquet()
+        files = {label: info["file"] for label, info in manifest["parts"].items()}
+        for bounds, n_groups in [
+            (["2020-01-01", "2020-01-03", "2020-01-05"], 2),
+            (["2020-01-01", "2020-02-01"], 1),
+        ]:
+            target = _target(source, bounds)
+            scheme = transfer.get_partition_scheme(target, "dfs://fake", "attr_fake")
+            groups = transfer._import_groups(target, scheme, tmp_path, files, pq)
+            assert len(groups) == n_groups
+            assert sorted(sum(groups, [])) == sorted(files)
+
+        with SessionPool(lambda: target, size=2) as pool, patch_table_upserter():
+            assert import_table(pool, tmp_path).rows == 24
+        pd.testing.assert_frame_equal(
+            _sorted(target.table_data("dfs://fake", "attr_fake")),
+            _sorted(source.table_data("dfs://fake", "attr_fake")),
+            check_dtype=False,
+        )
+
+    def test_resume(self, attr_table, tmp_path):
+        """测试跳过已完成的分区"""
+        source = attr_table(n_dates=4)
+        with SessionPool(lambda: source, size=2) as pool:
+            export_table(pool, "dfs://fake", "attr_fake", tmp_path)
+            manifest = json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8"))
+            label = next(iter(manifest["parts"]))
+            del manifest["parts"][label]
+            (tmp_path / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+            summary = export_table(pool, "dfs://fake", "attr_fake", tmp_path)
+            assert (summary.parts, summary.skipped, summary.rows) == (4, 3, 6)
+            with pytest.raises(ValueError):
+                export_table(pool, "dfs://fake", "attr_fake", tmp_path, partition_column="code")
+            with pytest.raises(ValueError):
+                export_table(
+                    pool, "dfs://fake", "attr_fake", tmp_path, Filter("code", Comparator.eq, "000000.SZ")
+                )
+
+        target = _target(source)
+        with SessionPool(lambda: target, size=2) as pool, patch_table_upserter():
+            import_table(pool, tmp_path)
+            summary = import_table(pool, tmp_path)
+        assert (summary.skipped, summary.rows) == (4, 0)
+
+    def test_olap_key_cols(self, tmp_path):
+        """测试没有排序列的 OLAP 表默认以所有列为主键, 导入不合并同一分区的行"""
+        source = FakeSession()
+        source.add_table(
+            "dfs://fake",
+            "attr_fake",
+            make_attribute_frame(n_dates=2, n_codes=3, n_attributes=2),
+            col_types={"datetime": "DATE"},
+            partition_columns=["datetime"],
+        )
+        with SessionPool(lambda: source, size=2) as pool:
+            export_table(pool, "dfs://fake", "attr_fake", tmp_path)
+        target = _target(source)
+        with SessionPool(lambda: target, size=2) as pool, patch_table_upserter():
+            assert import_table(pool, tmp_path).rows == 12
+        assert len(target.table_data("dfs://fake", "attr_fake")) == 12
+
+    def test_cli(self, attr_table, tmp_path, monkeypatch, capsys):
+        """测试命令行入口"""
+        source = attr_table(n_dates=4)
+        monkeypatch.setattr(
+            transfer.SessionPool,
+            "connect",
+            lambda *args, size=4, **kwargs: SessionPool(lambda: source, size=size),
+        )
+        assert transfer.main(["export", "dfs://fake", "attr_fake", str(tmp_path), "--workers", "2"]) == 0
+        assert "24 行" in capsys.readouterr().out
@@ -0,0 +1,130 @@
+import threading
+import pytest
+import pandas as pd
+from ddbtools import BaseCRUD, BufferedWriter
+
+
+class RecordingUpserter:
+    """记录每次写入的占位 upserter"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def upsert(self, data):
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("boom")
+        self.batches.append(data)
+
+
+class RecordingCRUD(BaseCRUD):
+    key_cols = ["code"]
+
+    def __init__(self, upserter):
+        super().__init__("dfs://db", "t")
+        self.upserter = upserter
+
+    def _upserter(self, session):
+        return self.upserter
+
+
+def frame(n, start=0):
+    return pd.DataFrame({"code": [f"c{i}" for i in range(start, start + n)]})
+
+
+class TestBufferedWriter:
+    """测试BufferedWriter"""
+
+    def test_flush_on_size(self):
+        """测试达到行数阈值后批量写入"""
+        upserter = RecordingUpserter()
+        crud = RecordingCRUD(upserter)
+        with crud.writer(None, max_rows=10, flush_interval=60) as writer:
+            for i in range(4):
+                writer.write(frame(5, i * 5))
+            assert writer.flush(timeout=5)
+        assert sum(len(batch) for batch in upserter.batches) == 20
+        # 最后一批可能由 flush 写出, 不受行数阈值约束
+        assert all(len(batch) >= 10 for batch in upserter.batches[:-1])
+        stats = writer.stats()
+        assert stats.flushed_rows == 20
+        assert stats.queued_rows == 0
+
+    def test_flush_on_close(self):
+        """测试关闭时写出剩余数据"""
+        upserter = RecordingUpserter()
+        writer = BufferedWriter(RecordingCRUD(upserter), None, max_rows=100, flush_interval=60)
+        writer.write(frame(3))
+        writer.close()
+        assert len(upserter.batches) == 1
+        with pytest.raises(RuntimeError):
+            writer.write(frame(1))
+
+    def test_backpressure(self):
+        """测试缓冲区满时阻塞写入"""
+        upserter = RecordingUpserter()
+        upserter.release.clear()
+        writer = BufferedWriter(
+            RecordingCRUD(upserter),
+            None,
+            max_rows=5,
+            max_buffer_rows=10,
+            flush_interval=60,
+            block_timeout=0.1,
+        )
+        writer.write(frame(5))
+        writer.write(frame(5))
+        with pytest.raises(TimeoutError):
+            writer.write(frame(5))
+        upserter.release.set()
+        assert writer.flush(timeout=5)
+        writer.write(frame(5))
+        writer.close()
+        assert writer.stats().flushed_rows == 15
+
+    def test_failure(self):
+        """测试写入失败统计"""
+        upserter = RecordingUpserter(fail=True)
+        writer = BufferedWriter(RecordingCRUD(upserter), None, max_rows=100, flush_interval=60)
+        writer.write(frame(3))
+        assert not writer.flush(timeout=5)
+        stats = writer.stats()
+        assert stats.failures == 1
+        assert stats.last_error == "boom"
+        assert len(writer.failed_batches[0]) == 3
+
+        upserter.fail = False
+        assert writer.retry_failed() == 3
+        assert writer.flush(timeout=5)
+        assert not writer.failed_batches
+        assert len(upserter.batches[0]) == 3
+        assert writer.close()
+
+    def test_failed_batches_capped(self):
+        """测试失败批次数量有上限, 超出时丢弃最早的批次"""
+        upserter = RecordingUpserter(fail=True)
+        writer = BufferedWriter(
+            RecordingCRUD(upserter), None, max_rows=100, flush_interval=60, max_failed_batches=2
+        )
+        for i in range(3):
+            writer.write(frame(i + 1))
+            writer.flush(timeout=5)
+        assert [len(data) for data in writer.failed_batches] == [2, 3]
+        assert writer.stats().dropped_rows == 1
+        assert [len(data) for data in writer.drain_failed()] == [2, 3]
+        assert not writer.failed_batches
+        writer.close()
+
+    def test_close_timeout(self):
+        """测试关闭超时时返回 False"""
+        upserter = RecordingUpserter()
+        upserter.release.clear()
+        writer = BufferedWriter(RecordingCRUD(upserter), None, max_rows=100, flush_interval=60)
+        writer.write(frame(3))
+        assert not writer.close(timeout=0.1)
+        upserter.release.set()
+        assert writer.close(timeout=5)
+        assert writer.stats().flushed_rows == 3